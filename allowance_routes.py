@@ -1,20 +1,31 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from typing import Dict, List, Optional
 import pyodbc
 from datetime import datetime
-from database import get_db_connection
+from database import get_db_connection, run_in_db_executor
+from query_utils import (
+    update_returning, build_page_query, set_next_cursor, parse_fields, select_list, shape_response,
+    parse_ids, fetch_by_ids, filter_conditions, parse_sort, row_dicts
+)
+from import_utils import import_rows, IMPORT_FORMAT_PATTERN
+from import_models import ImportResult
 from allowance_models import Allowance, AllowanceCreate, AllowanceUpdate
 
 router = APIRouter(prefix="/allowances", tags=["Allowances"])
 
+# Columns ?sort= accepts besides the primary key
+SORT_COLUMNS = ("EmployeeID", "AllowanceType", "Amount")
+
 # ---------------- Create ----------------
 @router.post("/", response_model=Allowance)
-async def create_allowance(allowance: AllowanceCreate):
+@run_in_db_executor
+def create_allowance(allowance: AllowanceCreate):
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
         query = """
         INSERT INTO dbo.Allowances (EmployeeID, AllowanceType, Amount, IsActive, Frequency)
+        OUTPUT INSERTED.*
         VALUES (?, ?, ?, ?, ?)
         """
         cursor.execute(query, (
@@ -24,10 +35,8 @@ async def create_allowance(allowance: AllowanceCreate):
             allowance.IsActive,
             allowance.Frequency
         ))
-        conn.commit()
-
-        cursor.execute("SELECT * FROM dbo.Allowances WHERE AllowanceID = @@IDENTITY")
         row = cursor.fetchone()
+        conn.commit()
 
         if row:
             return dict(zip([column[0] for column in cursor.description], row))
@@ -39,19 +48,57 @@ async def create_allowance(allowance: AllowanceCreate):
         cursor.close()
         conn.close()
 
+# ---------------- Import ----------------
+@router.post("/import", response_model=ImportResult)
+async def import_allowances(request: Request, fmt: str = Query("csv", alias="format", pattern=IMPORT_FORMAT_PATTERN)):
+    return await import_rows(request, fmt, AllowanceCreate, "dbo.Allowances")
+
 # ---------------- Read all ----------------
 @router.get("/", response_model=List[Allowance])
-async def get_all_allowances(skip: int = 0, limit: int = 100):
+@run_in_db_executor
+def get_all_allowances(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[str] = None,
+    fields: Optional[str] = None,
+    sort: Optional[str] = None,
+    employee_id: Optional[str] = None,
+    allowance_type: Optional[str] = None,
+    is_active: Optional[str] = None,
+    frequency: Optional[str] = None
+):
+    columns = parse_fields(fields, Allowance, "AllowanceID")
+    order = parse_sort(sort, SORT_COLUMNS, "AllowanceID")
+    conditions, params = filter_conditions({
+        "EmployeeID": employee_id, "AllowanceType": allowance_type, "IsActive": is_active, "Frequency": frequency
+    })
+    query, params = build_page_query("dbo.Allowances", "AllowanceID", skip, limit, after, conditions, params, columns, order)
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute(f"""
-            SELECT * FROM dbo.Allowances
-            ORDER BY AllowanceID
-            OFFSET {skip} ROWS FETCH NEXT {limit} ROWS ONLY
-        """)
+        cursor.execute(query, params)
         rows = cursor.fetchall()
-        return [dict(zip([column[0] for column in cursor.description], row)) for row in rows]
+        results = row_dicts(cursor, rows)
+        set_next_cursor(response, results, "AllowanceID", limit, order)
+        return shape_response(results, columns, response, List[Allowance])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        cursor.close()
+        conn.close()
+
+# ---------------- Read batch ----------------
+@router.get("/batch", response_model=Dict[str, Allowance])
+@run_in_db_executor
+def get_allowances_batch(ids: str, fields: Optional[str] = None):
+    keys = parse_ids(ids, int)
+    columns = parse_fields(fields, Allowance, "AllowanceID")
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        rows = fetch_by_ids(cursor, "dbo.Allowances", "AllowanceID", keys, columns)
+        return shape_response(rows, columns, model=Dict[str, Allowance])
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
@@ -60,14 +107,16 @@ async def get_all_allowances(skip: int = 0, limit: int = 100):
 
 # ---------------- Read single ----------------
 @router.get("/{allowance_id}", response_model=Allowance)
-async def get_allowance(allowance_id: int):
+@run_in_db_executor
+def get_allowance(allowance_id: int, fields: Optional[str] = None):
+    columns = parse_fields(fields, Allowance, "AllowanceID")
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute("SELECT * FROM dbo.Allowances WHERE AllowanceID = ?", allowance_id)
+        cursor.execute(f"SELECT {select_list(columns)} FROM dbo.Allowances WHERE AllowanceID = ?", allowance_id)
         row = cursor.fetchone()
         if row:
-            return dict(zip([column[0] for column in cursor.description], row))
+            return shape_response(dict(zip([column[0] for column in cursor.description], row)), columns)
         else:
             raise HTTPException(status_code=404, detail="Allowance not found")
     except Exception as e:
@@ -77,57 +126,41 @@ async def get_allowance(allowance_id: int):
         conn.close()
 
 # ---------------- Update ----------------
-@router.put("/{allowance_id}", response_model=Allowance)
-async def update_allowance(allowance_id: int, allowance: AllowanceUpdate):
+def _update_allowance(allowance_id: int, fields: dict):
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute("SELECT AllowanceID FROM dbo.Allowances WHERE AllowanceID = ?", allowance_id)
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="Allowance not found")
-
-        update_fields = []
-        params = []
-
-        if allowance.EmployeeID is not None:
-            update_fields.append("EmployeeID = ?")
-            params.append(allowance.EmployeeID)
-        if allowance.AllowanceType is not None:
-            update_fields.append("AllowanceType = ?")
-            params.append(allowance.AllowanceType)
-        if allowance.Amount is not None:
-            update_fields.append("Amount = ?")
-            params.append(allowance.Amount)
-        if allowance.IsActive is not None:
-            update_fields.append("IsActive = ?")
-            params.append(allowance.IsActive)
-        if allowance.Frequency is not None:
-            update_fields.append("Frequency = ?")
-            params.append(allowance.Frequency)
-
-        if not update_fields:
+        if not fields:
             raise HTTPException(status_code=400, detail="No fields to update")
 
-        params.append(allowance_id)
-        query = f"UPDATE dbo.Allowances SET {', '.join(update_fields)} WHERE AllowanceID = ?"
-        cursor.execute(query, params)
-        conn.commit()
+        row = update_returning(cursor, "dbo.Allowances", "AllowanceID", allowance_id, fields)
+        if not row:
+            raise HTTPException(status_code=404, detail="Allowance not found")
 
-        cursor.execute("SELECT * FROM dbo.Allowances WHERE AllowanceID = ?", allowance_id)
-        row = cursor.fetchone()
-        if row:
-            return dict(zip([column[0] for column in cursor.description], row))
-        else:
-            raise HTTPException(status_code=404, detail="Allowance not found after update")
+        conn.commit()
+        return row
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         cursor.close()
         conn.close()
 
+@router.put("/{allowance_id}", response_model=Allowance)
+@run_in_db_executor
+def update_allowance(allowance_id: int, allowance: AllowanceUpdate):
+    return _update_allowance(allowance_id, allowance.dict(exclude_none=True))
+
+@router.patch("/{allowance_id}", response_model=Allowance)
+@run_in_db_executor
+def patch_allowance(allowance_id: int, allowance: AllowanceUpdate):
+    return _update_allowance(allowance_id, allowance.dict(exclude_unset=True))
+
 # ---------------- Delete ----------------
 @router.delete("/{allowance_id}")
-async def delete_allowance(allowance_id: int):
+@run_in_db_executor
+def delete_allowance(allowance_id: int):
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
@@ -0,0 +1,169 @@
+import os
+import threading
+import time
+from bisect import bisect_right
+from datetime import date, datetime
+from typing import Dict, Optional
+
+from fastapi import HTTPException
+
+from database import get_db_connection
+from query_utils import decode_cursor, row_dicts, cursor_value
+
+# Seconds a loaded table is served before the next read goes back to the database
+REFERENCE_CACHE_TTL = float(os.getenv("REFERENCE_CACHE_TTL", "300"))
+
+
+def cache_key(value) -> str:
+    # Path parameters arrive as text or dates; a datetime column reads back with a time part
+    if isinstance(value, datetime):
+        value = value.date()
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
+
+
+class TableCache:
+    """Whole-table read-through cache for a small reference table, ordered by its key column.
+
+    Writers call invalidate() (or apply()/discard() to patch the snapshot in place)
+    after commit; the version counter lets a load that raced with a write be thrown
+    away instead of cached.
+    """
+
+    def __init__(self, table: str, key_column: str, ttl: float = REFERENCE_CACHE_TTL):
+        self.table = table
+        self.key_column = key_column
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._snapshot = None  # (rows, cursor positions, rows by cache_key(key))
+        self._loaded_at = 0.0
+        self._version = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def version(self) -> int:
+        with self._lock:
+            return self._version
+
+    def invalidate(self):
+        with self._lock:
+            self._snapshot = None
+            self._version += 1
+            self.invalidations += 1
+
+    def _build(self, rows):
+        positions = [cursor_value(row[self.key_column]) for row in rows]
+        return rows, positions, {cache_key(row[self.key_column]): row for row in rows}
+
+    def _load(self, cursor):
+        cursor.execute(f"SELECT * FROM {self.table} ORDER BY {self.key_column}")
+        return self._build(row_dicts(cursor, cursor.fetchall()))
+
+    def _swap(self, key, row=None):
+        # Copy-on-write: readers keep whichever snapshot they already hold
+        with self._lock:
+            self._version += 1
+            if self._snapshot is None:
+                return
+            rows = dict(self._snapshot[2])
+            if row is None:
+                rows.pop(cache_key(key), None)
+            else:
+                rows[cache_key(key)] = row
+            ordered = sorted(rows.values(), key=lambda item: cursor_value(item[self.key_column]))
+            self._snapshot = self._build(ordered)
+
+    def apply(self, row: dict):
+        """Swap in a committed insert/update without reloading the table."""
+        self._swap(row[self.key_column], row)
+
+    def discard(self, key):
+        self._swap(key)
+
+    def _ensure_loaded(self, cursor=None):
+        with self._lock:
+            if self._snapshot is not None and time.monotonic() - self._loaded_at < self.ttl:
+                self.hits += 1
+                return self._snapshot
+            self.misses += 1
+            version = self._version
+
+        if cursor is not None:
+            snapshot = self._load(cursor)
+        else:
+            conn = get_db_connection()
+            own_cursor = conn.cursor()
+            try:
+                snapshot = self._load(own_cursor)
+            finally:
+                own_cursor.close()
+                conn.close()
+
+        with self._lock:
+            # A write that landed while we were loading wins; don't cache what may be stale
+            if version == self._version:
+                self._snapshot = snapshot
+                self._loaded_at = time.monotonic()
+        return snapshot
+
+    def rows(self, cursor=None):
+        return list(self._ensure_loaded(cursor)[0])
+
+    def snapshot(self, cursor=None):
+        # The current (rows, positions, by key) tuple; replaced, never mutated, on writes
+        return self._ensure_loaded(cursor)
+
+    def get(self, key, cursor=None) -> Optional[dict]:
+        return self._ensure_loaded(cursor)[2].get(cache_key(key))
+
+    def page(self, skip: int, limit: int, after: Optional[str] = None, cursor=None):
+        # Same contract as build_page_query: ?after= seeks past the key, otherwise ?skip= offsets
+        rows, positions, _ = self._ensure_loaded(cursor)
+        start = skip
+        if after is not None:
+            position = decode_cursor(after)
+            try:
+                start = bisect_right(positions, position)
+            except TypeError:
+                # A cursor of the wrong type for this key (e.g. from another endpoint), same as decode_cursor
+                raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+        return rows[start:start + limit]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "version": self._version,
+                "loaded": self._snapshot is not None,
+                "rows": len(self._snapshot[0]) if self._snapshot is not None else 0,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+            }
+
+
+class ReferenceCache:
+    def __init__(self, tables: Dict[str, str], ttl: float = REFERENCE_CACHE_TTL):
+        self._tables = {table: TableCache(table, key_column, ttl) for table, key_column in tables.items()}
+
+    def __getitem__(self, table: str) -> TableCache:
+        return self._tables[table]
+
+    def invalidate(self, table: Optional[str] = None):
+        for name, cache in self._tables.items():
+            if table is None or name == table:
+                cache.invalidate()
+
+    def stats(self):
+        return {name: cache.stats() for name, cache in self._tables.items()}
+
+
+reference_cache = ReferenceCache({
+    "dbo.Departments": "DepartmentID",
+    "GazettedHolidays": "HolidayDate",
+    "LeaveQuota": "UID",
+    "TaxSlabs": "SlabID",
+    "dbo.Configuration": "UID",
+})
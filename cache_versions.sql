@@ -0,0 +1,33 @@
+-- Per-table version counters polled by every API worker (see invalidation_bus.py).
+-- API writes bump their table's counter in a short transaction of its own right after
+-- they commit. Writes made outside the API should do the same, e.g.
+--   UPDATE dbo.CacheVersions SET Version = Version + 1 WHERE TableName = 'EmployeeLeaves';
+-- or workers keep serving what they cached until the next write or restart.
+--
+-- There are deliberately no triggers: SQL Server rejects OUTPUT without INTO on a table
+-- with an enabled trigger (error 334), which the write routes use, and a trigger would
+-- hold the counter row's lock until each writing transaction ends.
+
+IF OBJECT_ID('dbo.CacheVersions', 'U') IS NULL
+    CREATE TABLE dbo.CacheVersions (
+        TableName NVARCHAR(128) NOT NULL PRIMARY KEY,
+        Version BIGINT NOT NULL DEFAULT 0
+    );
+GO
+
+INSERT INTO dbo.CacheVersions (TableName, Version)
+SELECT name, 0
+FROM (VALUES ('Employee'), ('EmployeeLeaves'), ('TaxSlabs'), ('LeaveQuota'),
+             ('GazettedHolidays'), ('Departments'), ('Configuration')) AS watched (name)
+WHERE NOT EXISTS (SELECT 1 FROM dbo.CacheVersions WHERE TableName = watched.name);
+GO
+
+-- Remove the triggers earlier versions of this script created
+DROP TRIGGER IF EXISTS dbo.trg_Employee_CacheVersion;
+DROP TRIGGER IF EXISTS dbo.trg_EmployeeLeaves_CacheVersion;
+DROP TRIGGER IF EXISTS dbo.trg_TaxSlabs_CacheVersion;
+DROP TRIGGER IF EXISTS dbo.trg_LeaveQuota_CacheVersion;
+DROP TRIGGER IF EXISTS dbo.trg_GazettedHolidays_CacheVersion;
+DROP TRIGGER IF EXISTS dbo.trg_Departments_CacheVersion;
+DROP TRIGGER IF EXISTS dbo.trg_Configuration_CacheVersion;
+GO
@@ -1,30 +1,40 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
+from fastapi import APIRouter, HTTPException, Response
+from typing import List, Optional
 import pyodbc
-from database import get_db_connection
+from database import get_db_connection, run_in_db_executor
+from invalidation_bus import invalidation_bus
+from query_utils import update_returning, set_next_cursor
+from cache import reference_cache
+from configuration_service import configuration_service
 from configuration_models import Configuration, ConfigurationCreate, ConfigurationUpdate
 
 router = APIRouter(prefix="/configurations", tags=["Configurations"])
 
+configuration_cache = reference_cache["dbo.Configuration"]
+
 # ---------------- Create ----------------
 @router.post("/", response_model=Configuration)
-async def create_configuration(config: ConfigurationCreate):
+@run_in_db_executor
+def create_configuration(config: ConfigurationCreate):
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
         query = """
         INSERT INTO dbo.Configuration (ConfigKey, ConfigValue)
+        OUTPUT INSERTED.*
         VALUES (?, ?)
         """
         cursor.execute(query, (config.ConfigKey, config.ConfigValue))
-        conn.commit()
-
-        cursor.execute("SELECT * FROM dbo.Configuration WHERE UID = @@IDENTITY")
         row = cursor.fetchone()
+        conn.commit()
 
         if row:
-            return dict(zip([column[0] for column in cursor.description], row))
+            created = dict(zip([column[0] for column in cursor.description], row))
+            configuration_service.apply(created)
+            invalidation_bus.publish("Configuration", conn)
+            return created
         else:
+            configuration_cache.invalidate()
             raise HTTPException(status_code=500, detail="Failed to create configuration")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -34,84 +44,79 @@ async def create_configuration(config: ConfigurationCreate):
 
 # ---------------- Read all ----------------
 @router.get("/", response_model=List[Configuration])
-async def get_all_configurations(skip: int = 0, limit: int = 100):
-    conn = get_db_connection()
-    cursor = conn.cursor()
+@run_in_db_executor
+def get_all_configurations(response: Response, skip: int = 0, limit: int = 100, after: Optional[str] = None):
     try:
-        cursor.execute(f"""
-            SELECT * FROM dbo.Configuration
-            ORDER BY UID
-            OFFSET {skip} ROWS FETCH NEXT {limit} ROWS ONLY
-        """)
-        rows = cursor.fetchall()
-        return [dict(zip([column[0] for column in cursor.description], row)) for row in rows]
+        results = configuration_cache.page(skip, limit, after)
+        set_next_cursor(response, results, "UID", limit)
+        return results
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        cursor.close()
-        conn.close()
+
+# ---------------- Read by key ----------------
+@router.get("/key/{config_key}", response_model=Configuration)
+@run_in_db_executor
+def get_configuration_by_key(config_key: str):
+    try:
+        row = configuration_service.snapshot().row(config_key)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if row is None:
+        raise HTTPException(status_code=404, detail="Configuration not found")
+    return row
 
 # ---------------- Read single ----------------
 @router.get("/{uid}", response_model=Configuration)
-async def get_configuration(uid: int):
-    conn = get_db_connection()
-    cursor = conn.cursor()
+@run_in_db_executor
+def get_configuration(uid: int):
     try:
-        cursor.execute("SELECT * FROM dbo.Configuration WHERE UID = ?", uid)
-        row = cursor.fetchone()
-        if row:
-            return dict(zip([column[0] for column in cursor.description], row))
-        else:
-            raise HTTPException(status_code=404, detail="Configuration not found")
+        row = configuration_cache.get(uid)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        cursor.close()
-        conn.close()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Configuration not found")
+    return row
 
 # ---------------- Update ----------------
-@router.put("/{uid}", response_model=Configuration)
-async def update_configuration(uid: int, config: ConfigurationUpdate):
+def _update_configuration(uid: int, fields: dict):
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute("SELECT UID FROM dbo.Configuration WHERE UID = ?", uid)
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="Configuration not found")
-
-        update_fields = []
-        params = []
-
-        if config.ConfigKey is not None:
-            update_fields.append("ConfigKey = ?")
-            params.append(config.ConfigKey)
-        if config.ConfigValue is not None:
-            update_fields.append("ConfigValue = ?")
-            params.append(config.ConfigValue)
-
-        if not update_fields:
+        if not fields:
             raise HTTPException(status_code=400, detail="No fields to update")
 
-        params.append(uid)
-        query = f"UPDATE dbo.Configuration SET {', '.join(update_fields)} WHERE UID = ?"
-        cursor.execute(query, params)
-        conn.commit()
+        row = update_returning(cursor, "dbo.Configuration", "UID", uid, fields)
+        if not row:
+            raise HTTPException(status_code=404, detail="Configuration not found")
 
-        cursor.execute("SELECT * FROM dbo.Configuration WHERE UID = ?", uid)
-        row = cursor.fetchone()
-        if row:
-            return dict(zip([column[0] for column in cursor.description], row))
-        else:
-            raise HTTPException(status_code=404, detail="Configuration not found after update")
+        conn.commit()
+        configuration_service.apply(row)
+        invalidation_bus.publish("Configuration", conn)
+        return row
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         cursor.close()
         conn.close()
 
+@router.put("/{uid}", response_model=Configuration)
+@run_in_db_executor
+def update_configuration(uid: int, config: ConfigurationUpdate):
+    return _update_configuration(uid, config.dict(exclude_none=True))
+
+@router.patch("/{uid}", response_model=Configuration)
+@run_in_db_executor
+def patch_configuration(uid: int, config: ConfigurationUpdate):
+    return _update_configuration(uid, config.dict(exclude_unset=True))
+
 # ---------------- Delete ----------------
 @router.delete("/{uid}")
-async def delete_configuration(uid: int):
+@run_in_db_executor
+def delete_configuration(uid: int):
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
@@ -119,6 +124,8 @@ async def delete_configuration(uid: int):
         conn.commit()
         if cursor.rowcount == 0:
             raise HTTPException(status_code=404, detail="Configuration not found")
+        configuration_service.discard(uid)
+        invalidation_bus.publish("Configuration", conn)
         return {"message": "Configuration deleted successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,101 @@
+import threading
+from types import MappingProxyType
+from typing import Optional
+
+from cache import reference_cache
+
+_TRUE = {"true", "yes", "on"}
+_FALSE = {"false", "no", "off"}
+
+
+def _coerce(raw: Optional[str]):
+    # ConfigValue is NVARCHAR; numbers and booleans are parsed once, when the snapshot is built
+    if raw is None:
+        return None
+    value = raw.strip()
+    if value.lower() in _TRUE:
+        return True
+    if value.lower() in _FALSE:
+        return False
+    for kind in (int, float):
+        try:
+            return kind(value)
+        except ValueError:
+            pass
+    return raw
+
+
+class ConfigurationSnapshot:
+    """Immutable ConfigKey -> value view of dbo.Configuration; a write builds a new one."""
+
+    __slots__ = ("_rows", "_values")
+
+    def __init__(self, rows):
+        # Rows arrive in UID order, so a duplicated key resolves to its newest row
+        by_key = {row["ConfigKey"]: row for row in rows if row.get("ConfigKey") is not None}
+        self._rows = MappingProxyType(by_key)
+        self._values = MappingProxyType({key: _coerce(row.get("ConfigValue")) for key, row in by_key.items()})
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._values
+
+    def row(self, key: str) -> Optional[dict]:
+        return self._rows.get(key)
+
+    def get(self, key: str, default=None):
+        value = self._values.get(key)
+        return default if value is None else value
+
+    def get_str(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        row = self._rows.get(key)
+        return default if row is None or row.get("ConfigValue") is None else row["ConfigValue"]
+
+    def get_int(self, key: str, default: Optional[int] = None) -> Optional[int]:
+        value = self._values.get(key)
+        return value if isinstance(value, int) and not isinstance(value, bool) else default
+
+    def get_float(self, key: str, default: Optional[float] = None) -> Optional[float]:
+        value = self._values.get(key)
+        return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else default
+
+    def get_bool(self, key: str, default: Optional[bool] = None) -> Optional[bool]:
+        value = self._values.get(key)
+        if isinstance(value, bool):
+            return value
+        # Bit-style "1"/"0" were parsed as ints by _coerce
+        if isinstance(value, int) and value in (0, 1):
+            return bool(value)
+        return default
+
+
+class ConfigurationService:
+    """Typed settings for server code, rebuilt only when the cached Configuration table changes."""
+
+    def __init__(self, table_cache):
+        self._table = table_cache
+        self._lock = threading.Lock()
+        self._source = None
+        self._snapshot: Optional[ConfigurationSnapshot] = None
+
+    def load(self, cursor=None):
+        self._table.invalidate()
+        return self.snapshot(cursor)
+
+    def snapshot(self, cursor=None) -> ConfigurationSnapshot:
+        source = self._table.snapshot(cursor)
+        with self._lock:
+            if source is not self._source:
+                self._snapshot, self._source = ConfigurationSnapshot(source[0]), source
+            return self._snapshot
+
+    def get(self, key: str, default=None):
+        return self.snapshot().get(key, default)
+
+    def apply(self, row: dict):
+        self._table.apply(row)
+
+    def discard(self, uid: int):
+        self._table.discard(uid)
+
+
+configuration_service = ConfigurationService(reference_cache["dbo.Configuration"])
@@ -1,12 +1,310 @@
-import pyodbc
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 
+import pyodbc
+
+CONNECTION_STRING = (
+    'DRIVER={ODBC Driver 17 for SQL Server};'
+    'SERVER=172.20.228.2;'
+    'DATABASE=Payroll;'
+    'UID=sa;'
+    'PWD=Pakistan@786'
+)
+
+# Pool sizing (per uvicorn worker)
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+POOL_MAX_OVERFLOW = int(os.getenv("DB_POOL_MAX_OVERFLOW", "5"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+POOL_IDLE_TIMEOUT = float(os.getenv("DB_POOL_IDLE_TIMEOUT", "300"))
+POOL_PING_AFTER = float(os.getenv("DB_POOL_PING_AFTER", "30"))
+
+
+class PoolTimeoutError(Exception):
+    pass
+
+
+class PooledConnection:
+    """Borrowed pool connection; close() hands it back to the pool instead of logging out."""
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+
+    def close(self):
+        if self._raw is not None:
+            raw, self._raw = self._raw, None
+            self._pool.release(raw)
+
+    def __getattr__(self, name):
+        if self._raw is None:
+            raise pyodbc.ProgrammingError("Connection already returned to pool")
+        return getattr(self._raw, name)
+
+
+class ConnectionPool:
+    def __init__(self, connection_string, size=POOL_SIZE, max_overflow=POOL_MAX_OVERFLOW,
+                 timeout=POOL_TIMEOUT, idle_timeout=POOL_IDLE_TIMEOUT, ping_after=POOL_PING_AFTER):
+        self.connection_string = connection_string
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.ping_after = ping_after
+
+        self._idle = deque()  # (raw connection, last used monotonic time)
+        self._checked_out = 0
+        self._lock = threading.Condition()
+        self._closed = False
+        self.pid = os.getpid()
+
+    @property
+    def max_connections(self):
+        return self.size + self.max_overflow
+
+    def _connect(self):
+        return pyodbc.connect(self.connection_string)
+
+    @staticmethod
+    def _discard(raw):
+        try:
+            raw.close()
+        except pyodbc.Error:
+            pass
+
+    @staticmethod
+    def _ping(raw):
+        try:
+            cursor = raw.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            cursor.close()
+            return True
+        except pyodbc.Error:
+            return False
+
+    def _evict_idle_locked(self, now):
+        while self._idle and now - self._idle[0][1] > self.idle_timeout:
+            raw, _ = self._idle.popleft()
+            self._discard(raw)
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        with self._lock:
+            while True:
+                if self._closed:
+                    raise pyodbc.ProgrammingError("Connection pool is closed")
+
+                now = time.monotonic()
+                self._evict_idle_locked(now)
+
+                if self._idle:
+                    # Most recently used first, so the tail of the deque ages out
+                    raw, last_used = self._idle.pop()
+                    self._checked_out += 1
+                    break
+
+                if self._checked_out + len(self._idle) < self.max_connections:
+                    raw, last_used = None, now
+                    self._checked_out += 1
+                    break
+
+                remaining = deadline - now
+                if remaining <= 0:
+                    raise PoolTimeoutError(
+                        f"Timed out waiting for a database connection "
+                        f"({self.max_connections} in use)"
+                    )
+                self._lock.wait(remaining)
+
+        # Connect / health-check outside the lock so slow logins don't block other borrowers
+        try:
+            if raw is not None and time.monotonic() - last_used > self.ping_after and not self._ping(raw):
+                self._discard(raw)
+                raw = None
+            if raw is None:
+                raw = self._connect()
+        except Exception:
+            with self._lock:
+                self._checked_out -= 1
+                self._lock.notify()
+            raise
+
+        return PooledConnection(self, raw)
+
+    def release(self, raw):
+        # Never hand out a connection with a half-finished transaction
+        try:
+            raw.rollback()
+            healthy = True
+        except pyodbc.Error:
+            healthy = False
+
+        with self._lock:
+            self._checked_out -= 1
+            if healthy and not self._closed and len(self._idle) < self.size:
+                self._idle.append((raw, time.monotonic()))
+                raw = None
+            self._lock.notify()
+
+        if raw is not None:
+            self._discard(raw)
+
+    def warm(self, count):
+        for _ in range(min(count, self.size)):
+            raw = self._connect()
+            with self._lock:
+                self._idle.append((raw, time.monotonic()))
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+            self._lock.notify_all()
+        for raw, _ in idle:
+            self._discard(raw)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": self.size,
+                "max_overflow": self.max_overflow,
+                "checked_out": self._checked_out,
+                "idle": len(self._idle),
+            }
+
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def init_pool(warm: int = 0) -> ConnectionPool:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+        _pool = ConnectionPool(CONNECTION_STRING)
+    if warm:
+        _pool.warm(warm)
+    return _pool
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+def get_pool() -> ConnectionPool:
+    global _pool
+    with _pool_lock:
+        # Pools must not be shared across forked workers
+        if _pool is None or _pool.pid != os.getpid():
+            _pool = ConnectionPool(CONNECTION_STRING)
+        return _pool
+
+
 def get_db_connection():
-    connection = pyodbc.connect(
-        'DRIVER={ODBC Driver 17 for SQL Server};'
-        'SERVER=172.20.228.2;'
-        'DATABASE=Payroll;'
-        'UID=sa;'
-        'PWD=Pakistan@786'
-    )
-    return connection
\ No newline at end of file
+    return get_pool().acquire()
+
+
+class DBExecutor:
+    """Dedicated thread pool for blocking pyodbc work, sized to the connection pool."""
+
+    def __init__(self, max_workers):
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="db")
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.peak_queue_depth = 0
+        self.total_wait = 0.0
+        self.pid = os.getpid()
+
+    def _invoke(self, submitted_at, ctx, func, args, kwargs):
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+            self.total_wait += time.monotonic() - submitted_at
+        try:
+            return ctx.run(func, *args, **kwargs)
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+
+    async def run(self, func, *args, **kwargs):
+        with self._lock:
+            self.queued += 1
+            self.peak_queue_depth = max(self.peak_queue_depth, self.queued)
+        loop = asyncio.get_running_loop()
+        ctx = contextvars.copy_context()
+        return await loop.run_in_executor(
+            self._executor, self._invoke, time.monotonic(), ctx, func, args, kwargs
+        )
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "queued": self.queued,
+                "running": self.running,
+                "completed": self.completed,
+                "peak_queue_depth": self.peak_queue_depth,
+                "avg_wait_ms": round(self.total_wait / self.completed * 1000, 3) if self.completed else 0.0,
+            }
+
+
+_executor: Optional[DBExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def init_db_executor() -> DBExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown()
+        _executor = DBExecutor(get_pool().max_connections)
+        return _executor
+
+
+def shutdown_db_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown()
+            _executor = None
+
+
+def get_db_executor() -> DBExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None or _executor.pid != os.getpid():
+            _executor = DBExecutor(get_pool().max_connections)
+        return _executor
+
+
+async def run_db(func, *args, **kwargs):
+    return await get_db_executor().run(func, *args, **kwargs)
+
+
+def run_in_db_executor(func):
+    """Expose a blocking handler as async, running its body on the DB executor."""
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await run_db(func, *args, **kwargs)
+
+    return wrapper
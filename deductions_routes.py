@@ -1,19 +1,30 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from typing import Dict, List, Optional
 import pyodbc
-from database import get_db_connection
+from database import get_db_connection, run_in_db_executor
+from query_utils import (
+    update_returning, build_page_query, set_next_cursor, parse_fields, select_list, shape_response,
+    parse_ids, fetch_by_ids, filter_conditions, parse_sort, row_dicts
+)
+from import_utils import import_rows, IMPORT_FORMAT_PATTERN
+from import_models import ImportResult
 from deductions_models import Deduction, DeductionCreate, DeductionUpdate
 
 router = APIRouter(prefix="/deductions", tags=["Deductions"])
 
+# Columns ?sort= accepts besides the primary key
+SORT_COLUMNS = ("EmployeeID", "DeductionType", "Amount")
+
 # ---------------- Create ----------------
 @router.post("/", response_model=Deduction)
-async def create_deduction(deduction: DeductionCreate):
+@run_in_db_executor
+def create_deduction(deduction: DeductionCreate):
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
         query = """
         INSERT INTO dbo.Deductions (EmployeeID, DeductionType, Amount, IsActive, Frequency)
+        OUTPUT INSERTED.*
         VALUES (?, ?, ?, ?, ?)
         """
         cursor.execute(query, (
@@ -23,10 +34,8 @@ async def create_deduction(deduction: DeductionCreate):
             deduction.IsActive,
             deduction.Frequency
         ))
-        conn.commit()
-
-        cursor.execute("SELECT * FROM dbo.Deductions WHERE DeductionID = @@IDENTITY")
         row = cursor.fetchone()
+        conn.commit()
 
         if row:
             return dict(zip([column[0] for column in cursor.description], row))
@@ -38,19 +47,57 @@ async def create_deduction(deduction: DeductionCreate):
         cursor.close()
         conn.close()
 
+# ---------------- Import ----------------
+@router.post("/import", response_model=ImportResult)
+async def import_deductions(request: Request, fmt: str = Query("csv", alias="format", pattern=IMPORT_FORMAT_PATTERN)):
+    return await import_rows(request, fmt, DeductionCreate, "dbo.Deductions")
+
 # ---------------- Read all ----------------
 @router.get("/", response_model=List[Deduction])
-async def get_all_deductions(skip: int = 0, limit: int = 100):
+@run_in_db_executor
+def get_all_deductions(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[str] = None,
+    fields: Optional[str] = None,
+    sort: Optional[str] = None,
+    employee_id: Optional[str] = None,
+    deduction_type: Optional[str] = None,
+    is_active: Optional[str] = None,
+    frequency: Optional[str] = None
+):
+    columns = parse_fields(fields, Deduction, "DeductionID")
+    order = parse_sort(sort, SORT_COLUMNS, "DeductionID")
+    conditions, params = filter_conditions({
+        "EmployeeID": employee_id, "DeductionType": deduction_type, "IsActive": is_active, "Frequency": frequency
+    })
+    query, params = build_page_query("dbo.Deductions", "DeductionID", skip, limit, after, conditions, params, columns, order)
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute(f"""
-            SELECT * FROM dbo.Deductions
-            ORDER BY DeductionID
-            OFFSET {skip} ROWS FETCH NEXT {limit} ROWS ONLY
-        """)
+        cursor.execute(query, params)
         rows = cursor.fetchall()
-        return [dict(zip([column[0] for column in cursor.description], row)) for row in rows]
+        results = row_dicts(cursor, rows)
+        set_next_cursor(response, results, "DeductionID", limit, order)
+        return shape_response(results, columns, response, List[Deduction])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        cursor.close()
+        conn.close()
+
+# ---------------- Read batch ----------------
+@router.get("/batch", response_model=Dict[str, Deduction])
+@run_in_db_executor
+def get_deductions_batch(ids: str, fields: Optional[str] = None):
+    keys = parse_ids(ids, int)
+    columns = parse_fields(fields, Deduction, "DeductionID")
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        rows = fetch_by_ids(cursor, "dbo.Deductions", "DeductionID", keys, columns)
+        return shape_response(rows, columns, model=Dict[str, Deduction])
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
@@ -59,14 +106,16 @@ async def get_all_deductions(skip: int = 0, limit: int = 100):
 
 # ---------------- Read single ----------------
 @router.get("/{deduction_id}", response_model=Deduction)
-async def get_deduction(deduction_id: int):
+@run_in_db_executor
+def get_deduction(deduction_id: int, fields: Optional[str] = None):
+    columns = parse_fields(fields, Deduction, "DeductionID")
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute("SELECT * FROM dbo.Deductions WHERE DeductionID = ?", deduction_id)
+        cursor.execute(f"SELECT {select_list(columns)} FROM dbo.Deductions WHERE DeductionID = ?", deduction_id)
         row = cursor.fetchone()
         if row:
-            return dict(zip([column[0] for column in cursor.description], row))
+            return shape_response(dict(zip([column[0] for column in cursor.description], row)), columns)
         else:
             raise HTTPException(status_code=404, detail="Deduction not found")
     except Exception as e:
@@ -76,57 +125,41 @@ async def get_deduction(deduction_id: int):
         conn.close()
 
 # ---------------- Update ----------------
-@router.put("/{deduction_id}", response_model=Deduction)
-async def update_deduction(deduction_id: int, deduction: DeductionUpdate):
+def _update_deduction(deduction_id: int, fields: dict):
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute("SELECT DeductionID FROM dbo.Deductions WHERE DeductionID = ?", deduction_id)
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="Deduction not found")
-
-        update_fields = []
-        params = []
-
-        if deduction.EmployeeID is not None:
-            update_fields.append("EmployeeID = ?")
-            params.append(deduction.EmployeeID)
-        if deduction.DeductionType is not None:
-            update_fields.append("DeductionType = ?")
-            params.append(deduction.DeductionType)
-        if deduction.Amount is not None:
-            update_fields.append("Amount = ?")
-            params.append(deduction.Amount)
-        if deduction.IsActive is not None:
-            update_fields.append("IsActive = ?")
-            params.append(deduction.IsActive)
-        if deduction.Frequency is not None:
-            update_fields.append("Frequency = ?")
-            params.append(deduction.Frequency)
-
-        if not update_fields:
+        if not fields:
             raise HTTPException(status_code=400, detail="No fields to update")
 
-        params.append(deduction_id)
-        query = f"UPDATE dbo.Deductions SET {', '.join(update_fields)} WHERE DeductionID = ?"
-        cursor.execute(query, params)
-        conn.commit()
+        row = update_returning(cursor, "dbo.Deductions", "DeductionID", deduction_id, fields)
+        if not row:
+            raise HTTPException(status_code=404, detail="Deduction not found")
 
-        cursor.execute("SELECT * FROM dbo.Deductions WHERE DeductionID = ?", deduction_id)
-        row = cursor.fetchone()
-        if row:
-            return dict(zip([column[0] for column in cursor.description], row))
-        else:
-            raise HTTPException(status_code=404, detail="Deduction not found after update")
+        conn.commit()
+        return row
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         cursor.close()
         conn.close()
 
+@router.put("/{deduction_id}", response_model=Deduction)
+@run_in_db_executor
+def update_deduction(deduction_id: int, deduction: DeductionUpdate):
+    return _update_deduction(deduction_id, deduction.dict(exclude_none=True))
+
+@router.patch("/{deduction_id}", response_model=Deduction)
+@run_in_db_executor
+def patch_deduction(deduction_id: int, deduction: DeductionUpdate):
+    return _update_deduction(deduction_id, deduction.dict(exclude_unset=True))
+
 # ---------------- Delete ----------------
 @router.delete("/{deduction_id}")
-async def delete_deduction(deduction_id: int):
+@run_in_db_executor
+def delete_deduction(deduction_id: int):
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
@@ -1,23 +1,31 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
+from fastapi import APIRouter, Header, HTTPException, Response
+from typing import List, Optional
 import pyodbc
-from database import get_db_connection
+from database import get_db_connection, run_in_db_executor
+from invalidation_bus import invalidation_bus
+from query_utils import update_returning, set_next_cursor
+from cache import reference_cache
+from etag_utils import conditional, etag_for, not_modified, require_match
+from json_utils import model_response
 from departments_models import Department, DepartmentCreate, DepartmentUpdate
 
 router = APIRouter(prefix="/departments", tags=["Departments"])
 
+department_cache = reference_cache["dbo.Departments"]
+
 # ---------------- Create ----------------
 @router.post("/", response_model=Department)
-async def create_department(department: DepartmentCreate):
+@run_in_db_executor
+def create_department(department: DepartmentCreate):
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        query = "INSERT INTO dbo.Departments (DepartmentName) VALUES (?)"
+        query = "INSERT INTO dbo.Departments (DepartmentName) OUTPUT INSERTED.* VALUES (?)"
         cursor.execute(query, department.DepartmentName)
-        conn.commit()
-
-        cursor.execute("SELECT * FROM dbo.Departments WHERE DepartmentID = @@IDENTITY")
         row = cursor.fetchone()
+        conn.commit()
+        department_cache.invalidate()
+        invalidation_bus.publish("Departments", conn)
         if row:
             return dict(zip([column[0] for column in cursor.description], row))
         else:
@@ -30,89 +38,93 @@ async def create_department(department: DepartmentCreate):
 
 # ---------------- Read all ----------------
 @router.get("/", response_model=List[Department])
-async def get_all_departments(skip: int = 0, limit: int = 100):
-    conn = get_db_connection()
-    cursor = conn.cursor()
+@run_in_db_executor
+def get_all_departments(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None)
+):
     try:
-        cursor.execute(f"""
-            SELECT * FROM dbo.Departments
-            ORDER BY DepartmentID
-            OFFSET {skip} ROWS FETCH NEXT {limit} ROWS ONLY
-        """)
-        rows = cursor.fetchall()
-        return [dict(zip([column[0] for column in cursor.description], row)) for row in rows]
+        results = department_cache.page(skip, limit, after)
+        set_next_cursor(response, results, "DepartmentID", limit)
+        return conditional(model_response(results, List[Department], response), if_none_match)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        cursor.close()
-        conn.close()
 
 # ---------------- Read single ----------------
 @router.get("/{department_id}", response_model=Department)
-async def get_department(department_id: int):
-    conn = get_db_connection()
-    cursor = conn.cursor()
+@run_in_db_executor
+def get_department(department_id: int, response: Response, if_none_match: Optional[str] = Header(None)):
     try:
-        cursor.execute("SELECT * FROM dbo.Departments WHERE DepartmentID = ?", department_id)
-        row = cursor.fetchone()
-        if row:
-            return dict(zip([column[0] for column in cursor.description], row))
-        else:
-            raise HTTPException(status_code=404, detail="Department not found")
+        row = department_cache.get(department_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        cursor.close()
-        conn.close()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Department not found")
+    return not_modified(row, response, if_none_match) or row
 
 # ---------------- Update ----------------
-@router.put("/{department_id}", response_model=Department)
-async def update_department(department_id: int, department: DepartmentUpdate):
+def _update_department(department_id: int, fields: dict, response: Response, if_match: Optional[str]):
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute("SELECT DepartmentID FROM dbo.Departments WHERE DepartmentID = ?", department_id)
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="Department not found")
-
-        update_fields = []
-        params = []
+        if not fields:
+            raise HTTPException(status_code=400, detail="No fields to update")
 
-        if department.DepartmentName is not None:
-            update_fields.append("DepartmentName = ?")
-            params.append(department.DepartmentName)
+        require_match(cursor, "dbo.Departments", "DepartmentID", department_id, if_match)
 
-        if not update_fields:
-            raise HTTPException(status_code=400, detail="No fields to update")
+        row = update_returning(cursor, "dbo.Departments", "DepartmentID", department_id, fields)
+        if not row:
+            raise HTTPException(status_code=404, detail="Department not found")
 
-        params.append(department_id)
-        query = f"UPDATE dbo.Departments SET {', '.join(update_fields)} WHERE DepartmentID = ?"
-        cursor.execute(query, params)
         conn.commit()
-
-        cursor.execute("SELECT * FROM dbo.Departments WHERE DepartmentID = ?", department_id)
-        row = cursor.fetchone()
-        if row:
-            return dict(zip([column[0] for column in cursor.description], row))
-        else:
-            raise HTTPException(status_code=404, detail="Department not found after update")
+        department_cache.invalidate()
+        invalidation_bus.publish("Departments", conn)
+        response.headers["ETag"] = etag_for(row)
+        return row
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         cursor.close()
         conn.close()
 
+@router.put("/{department_id}", response_model=Department)
+@run_in_db_executor
+def update_department(
+    department_id: int, department: DepartmentUpdate, response: Response, if_match: Optional[str] = Header(None)
+):
+    return _update_department(department_id, department.dict(exclude_none=True), response, if_match)
+
+@router.patch("/{department_id}", response_model=Department)
+@run_in_db_executor
+def patch_department(
+    department_id: int, department: DepartmentUpdate, response: Response, if_match: Optional[str] = Header(None)
+):
+    return _update_department(department_id, department.dict(exclude_unset=True), response, if_match)
+
 # ---------------- Delete ----------------
 @router.delete("/{department_id}")
-async def delete_department(department_id: int):
+@run_in_db_executor
+def delete_department(department_id: int, if_match: Optional[str] = Header(None)):
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
+        require_match(cursor, "dbo.Departments", "DepartmentID", department_id, if_match)
         cursor.execute("DELETE FROM dbo.Departments WHERE DepartmentID = ?", department_id)
         conn.commit()
+        department_cache.invalidate()
+        invalidation_bus.publish("Departments", conn)
         if cursor.rowcount == 0:
             raise HTTPException(status_code=404, detail="Department not found")
         return {"message": "Department deleted successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
@@ -1,16 +1,19 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
+from fastapi import APIRouter, HTTPException, Response
+from typing import List, Optional
 import pyodbc
-from database import get_db_connection
+from database import get_db_connection, run_in_db_executor
+from query_utils import update_returning, build_page_query, set_next_cursor, row_dicts
 from employee_leave_summary_models import (
     EmployeeLeaveSummary, EmployeeLeaveSummaryCreate, EmployeeLeaveSummaryUpdate
 )
 
-router = APIRouter(prefix="/leave-summary", tags=["EmployeeLeaveSummary"])
+# Superseded by /leave-balance, which derives balances for any year from LeaveQuota and approved leaves
+router = APIRouter(prefix="/leave-summary", tags=["EmployeeLeaveSummary"], deprecated=True)
 
 # ✅ Create
 @router.post("/", response_model=EmployeeLeaveSummary)
-async def create_leave_summary(summary: EmployeeLeaveSummaryCreate):
+@run_in_db_executor
+def create_leave_summary(summary: EmployeeLeaveSummaryCreate):
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
@@ -20,7 +23,9 @@ async def create_leave_summary(summary: EmployeeLeaveSummaryCreate):
             TotalYear2023, RemainingYear2023, 
             TotalYear2024, RemainingYear2024,
             TotalAllYears, RemainingAllYears
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        )
+        OUTPUT INSERTED.*
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
         """
         cursor.execute(query, (
             summary.EmployeeID, summary.TotalYear2022, summary.RemainingYear2022,
@@ -28,10 +33,8 @@ async def create_leave_summary(summary: EmployeeLeaveSummaryCreate):
             summary.TotalYear2024, summary.RemainingYear2024,
             summary.TotalAllYears, summary.RemainingAllYears
         ))
-        conn.commit()
-
-        cursor.execute("SELECT TOP 1 * FROM EmployeeLeaveSummary2024 WHERE EmployeeID = ? ORDER BY EmployeeID DESC", summary.EmployeeID)
         row = cursor.fetchone()
+        conn.commit()
         if row:
             return dict(zip([column[0] for column in cursor.description], row))
         else:
@@ -42,21 +45,25 @@ async def create_leave_summary(summary: EmployeeLeaveSummaryCreate):
 
 # ✅ Read All
 @router.get("/", response_model=List[EmployeeLeaveSummary])
-async def get_all_leave_summaries(skip: int = 0, limit: int = 100):
+@run_in_db_executor
+def get_all_leave_summaries(response: Response, skip: int = 0, limit: int = 100, after: Optional[str] = None):
+    query, params = build_page_query("EmployeeLeaveSummary2024", "EmployeeID", skip, limit, after)
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        query = "SELECT * FROM EmployeeLeaveSummary2024 ORDER BY EmployeeID OFFSET ? ROWS FETCH NEXT ? ROWS ONLY"
-        cursor.execute(query, (skip, limit))
+        cursor.execute(query, params)
         rows = cursor.fetchall()
-        return [dict(zip([column[0] for column in cursor.description], row)) for row in rows]
+        results = row_dicts(cursor, rows)
+        set_next_cursor(response, results, "EmployeeID", limit)
+        return results
     finally:
         cursor.close()
         conn.close()
 
 # ✅ Read One
 @router.get("/{employee_id}", response_model=EmployeeLeaveSummary)
-async def get_leave_summary(employee_id: int):
+@run_in_db_executor
+def get_leave_summary(employee_id: int):
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
@@ -71,36 +78,37 @@ async def get_leave_summary(employee_id: int):
         conn.close()
 
 # ✅ Update
-@router.put("/{employee_id}", response_model=EmployeeLeaveSummary)
-async def update_leave_summary(employee_id: int, summary: EmployeeLeaveSummaryUpdate):
+def _update_leave_summary(employee_id: int, fields: dict):
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        fields = summary.dict(exclude_unset=True)
         if not fields:
             raise HTTPException(status_code=400, detail="No fields to update")
 
-        update_fields = ", ".join([f"{key} = ?" for key in fields.keys()])
-        params = list(fields.values())
-        params.append(employee_id)
+        row = update_returning(cursor, "EmployeeLeaveSummary2024", "EmployeeID", employee_id, fields)
+        if not row:
+            raise HTTPException(status_code=404, detail="Record not found")
 
-        query = f"UPDATE EmployeeLeaveSummary2024 SET {update_fields} WHERE EmployeeID = ?"
-        cursor.execute(query, params)
         conn.commit()
-
-        cursor.execute("SELECT * FROM EmployeeLeaveSummary2024 WHERE EmployeeID = ?", employee_id)
-        row = cursor.fetchone()
-        if row:
-            return dict(zip([column[0] for column in cursor.description], row))
-        else:
-            raise HTTPException(status_code=404, detail="Record not found after update")
+        return row
     finally:
         cursor.close()
         conn.close()
 
+@router.put("/{employee_id}", response_model=EmployeeLeaveSummary)
+@run_in_db_executor
+def update_leave_summary(employee_id: int, summary: EmployeeLeaveSummaryUpdate):
+    return _update_leave_summary(employee_id, summary.dict(exclude_unset=True))
+
+@router.patch("/{employee_id}", response_model=EmployeeLeaveSummary)
+@run_in_db_executor
+def patch_leave_summary(employee_id: int, summary: EmployeeLeaveSummaryUpdate):
+    return _update_leave_summary(employee_id, summary.dict(exclude_unset=True))
+
 # ✅ Delete
 @router.delete("/{employee_id}")
-async def delete_leave_summary(employee_id: int):
+@run_in_db_executor
+def delete_leave_summary(employee_id: int):
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
@@ -1,29 +1,33 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
+from fastapi import APIRouter, HTTPException, Response
+from typing import List, Optional
 import pyodbc
-from database import get_db_connection
+from database import get_db_connection, run_in_db_executor
+from query_utils import update_returning, build_page_query, set_next_cursor, filter_conditions, parse_sort, row_dicts
+from json_utils import model_response
 from employee_tax_models import EmployeeTax, EmployeeTaxCreate, EmployeeTaxUpdate
 
 router = APIRouter(prefix="/employee-tax", tags=["EmployeeTax"])
 
+# Columns ?sort= accepts besides the primary key
+SORT_COLUMNS = ("EmployeeID", "SalaryYear", "TaxAmount")
+
 # ✅ Create
 @router.post("/", response_model=EmployeeTax)
-async def create_tax_record(tax: EmployeeTaxCreate):
+@run_in_db_executor
+def create_tax_record(tax: EmployeeTaxCreate):
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
         query = """
         INSERT INTO EmployeeTax (EmployeeID, SalaryYear, SalaryMonth, SlabID, TaxAmount)
+        OUTPUT INSERTED.*
         VALUES (?, ?, ?, ?, ?)
         """
         cursor.execute(query, (
             tax.EmployeeID, tax.SalaryYear, tax.SalaryMonth, tax.SlabID, tax.TaxAmount
         ))
-        conn.commit()
-
-        # Last inserted row fetch karein
-        cursor.execute("SELECT TOP 1 * FROM EmployeeTax ORDER BY TaxID DESC")
         row = cursor.fetchone()
+        conn.commit()
         if row:
             return dict(zip([column[0] for column in cursor.description], row))
         else:
@@ -34,21 +38,36 @@ async def create_tax_record(tax: EmployeeTaxCreate):
 
 # ✅ Read All
 @router.get("/", response_model=List[EmployeeTax])
-async def get_all_tax_records(skip: int = 0, limit: int = 100):
+@run_in_db_executor
+def get_all_tax_records(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[str] = None,
+    sort: Optional[str] = None,
+    employee_id: Optional[str] = None,
+    salary_year: Optional[int] = None,
+    salary_month: Optional[str] = None
+):
+    order = parse_sort(sort, SORT_COLUMNS, "TaxID")
+    conditions, params = filter_conditions({"EmployeeID": employee_id, "SalaryYear": salary_year, "SalaryMonth": salary_month})
+    query, params = build_page_query("EmployeeTax", "TaxID", skip, limit, after, conditions, params, sort=order)
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        query = "SELECT * FROM EmployeeTax ORDER BY TaxID OFFSET ? ROWS FETCH NEXT ? ROWS ONLY"
-        cursor.execute(query, (skip, limit))
+        cursor.execute(query, params)
         rows = cursor.fetchall()
-        return [dict(zip([column[0] for column in cursor.description], row)) for row in rows]
+        results = row_dicts(cursor, rows)
+        set_next_cursor(response, results, "TaxID", limit, order)
+        return model_response(results, List[EmployeeTax], response)
     finally:
         cursor.close()
         conn.close()
 
 # ✅ Read One
 @router.get("/{tax_id}", response_model=EmployeeTax)
-async def get_tax_record(tax_id: int):
+@run_in_db_executor
+def get_tax_record(tax_id: int):
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
@@ -63,36 +82,37 @@ async def get_tax_record(tax_id: int):
         conn.close()
 
 # ✅ Update
-@router.put("/{tax_id}", response_model=EmployeeTax)
-async def update_tax_record(tax_id: int, tax: EmployeeTaxUpdate):
+def _update_tax_record(tax_id: int, fields: dict):
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        fields = tax.dict(exclude_unset=True)
         if not fields:
             raise HTTPException(status_code=400, detail="No fields to update")
 
-        update_fields = ", ".join([f"{key} = ?" for key in fields.keys()])
-        params = list(fields.values())
-        params.append(tax_id)
+        row = update_returning(cursor, "EmployeeTax", "TaxID", tax_id, fields)
+        if not row:
+            raise HTTPException(status_code=404, detail="Tax record not found")
 
-        query = f"UPDATE EmployeeTax SET {update_fields} WHERE TaxID = ?"
-        cursor.execute(query, params)
         conn.commit()
-
-        cursor.execute("SELECT * FROM EmployeeTax WHERE TaxID = ?", tax_id)
-        row = cursor.fetchone()
-        if row:
-            return dict(zip([column[0] for column in cursor.description], row))
-        else:
-            raise HTTPException(status_code=404, detail="Record not found after update")
+        return row
     finally:
         cursor.close()
         conn.close()
 
+@router.put("/{tax_id}", response_model=EmployeeTax)
+@run_in_db_executor
+def update_tax_record(tax_id: int, tax: EmployeeTaxUpdate):
+    return _update_tax_record(tax_id, tax.dict(exclude_unset=True))
+
+@router.patch("/{tax_id}", response_model=EmployeeTax)
+@run_in_db_executor
+def patch_tax_record(tax_id: int, tax: EmployeeTaxUpdate):
+    return _update_tax_record(tax_id, tax.dict(exclude_unset=True))
+
 # ✅ Delete
 @router.delete("/{tax_id}")
-async def delete_tax_record(tax_id: int):
+@run_in_db_executor
+def delete_tax_record(tax_id: int):
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
@@ -1,6 +1,11 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import date
+from leaves_models import EmployeeLeave
+from allowance_models import Allowance
+from deductions_models import Deduction
+from promotion_models import Promotion
+from salary_payment_models import SalaryPayment
 
 class EmployeeBase(BaseModel):
     EmployeeID: str
@@ -37,4 +42,21 @@ class Employee(EmployeeBase):
     uid: int
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class EmployeeBulkError(BaseModel):
+    EmployeeID: Optional[str] = None
+    Detail: str
+
+class EmployeeBulkResult(BaseModel):
+    Inserted: int
+    Updated: int
+    Failed: int
+    Errors: List[EmployeeBulkError]
+
+class EmployeeProfile(Employee):
+    Leaves: Optional[List[EmployeeLeave]] = None
+    Allowances: Optional[List[Allowance]] = None
+    Deductions: Optional[List[Deduction]] = None
+    Promotions: Optional[List[Promotion]] = None
+    Payments: Optional[List[SalaryPayment]] = None
@@ -1,14 +1,49 @@
-from fastapi import APIRouter, HTTPException
-from typing import List, Optional
+from fastapi import APIRouter, Header, HTTPException, Query, Response
+from typing import Dict, List, Optional
 import pyodbc
-from datetime import datetime
-from database import get_db_connection
-from employees_models import Employee, EmployeeCreate, EmployeeUpdate
+from datetime import date, datetime
+from database import get_db_connection, run_in_db_executor
+from invalidation_bus import invalidation_bus
+from export_utils import export_response, EXPORT_FORMAT_PATTERN
+from etag_utils import conditional, etag_for, not_modified, require_match
+from query_utils import (
+    update_returning, build_page_query, set_next_cursor, parse_fields, select_list, shape_response,
+    parse_ids, fetch_by_ids, filter_conditions, parse_sort, row_dicts
+)
+from employees_models import Employee, EmployeeCreate, EmployeeUpdate, EmployeeBulkResult, EmployeeProfile
+from leave_coverage import leave_coverage
+from leave_balance import leave_balance
+from leave_stats import leave_stats
 
 router = APIRouter(prefix="/employees", tags=["Employees"])
 
+# Columns ?sort= accepts besides the primary key
+SORT_COLUMNS = ("EmployeeID", "EmployeeName", "Department", "Designation", "DateOfJoining")
+
+# Columns staged and merged by /employees/bulk, in EmployeeCreate order
+EMPLOYEE_COLUMNS = tuple(EmployeeCreate.model_fields)
+
+# include= name -> (EmployeeProfile field, table, ORDER BY) for related collections
+EMPLOYEE_INCLUDES = {
+    "leaves": ("Leaves", "EmployeeLeaves", "StartDate DESC"),
+    "allowances": ("Allowances", "dbo.Allowances", "AllowanceID"),
+    "deductions": ("Deductions", "dbo.Deductions", "DeductionID"),
+    "promotions": ("Promotions", "Promotions", "EffectiveDate DESC"),
+    "payments": ("Payments", "dbo.SalaryPayments", "SalaryYear DESC, PaymentID DESC"),
+}
+
+def _parse_includes(include: Optional[str]):
+    if not include:
+        return []
+    requested = list(dict.fromkeys(name.strip().lower() for name in include.split(",") if name.strip()))
+    unknown = [name for name in requested if name not in EMPLOYEE_INCLUDES]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown include: {', '.join(unknown)}")
+    return requested
+
 @router.post("/", response_model=Employee)
-async def create_employee(employee: EmployeeCreate):
+@run_in_db_executor
+def create_employee(employee: EmployeeCreate):
     conn = get_db_connection()
     cursor = conn.cursor()
     
@@ -20,7 +55,9 @@ async def create_employee(employee: EmployeeCreate):
             ModifiedBy, ModifiedOn, Details, Project, CarryForwardLeaves, 
             Year2022, Year2023, AdjustedAjusted, Year2024, CarryForwardLeaves1, 
             Year2023New, BasicSalary, ApplyTax
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        )
+        OUTPUT INSERTED.*
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """
         
         cursor.execute(query, (
@@ -34,12 +71,12 @@ async def create_employee(employee: EmployeeCreate):
             employee.BasicSalary, employee.ApplyTax
         ))
         
-        conn.commit()
-        
-        cursor.execute("SELECT * FROM Employee WHERE uid = @@IDENTITY")
         row = cursor.fetchone()
+        conn.commit()
         
         if row:
+            leave_stats.set_department(employee.EmployeeID, employee.Department)
+            invalidation_bus.publish("Employee", conn)
             return dict(zip([column[0] for column in cursor.description], row))
         else:
             raise HTTPException(status_code=500, detail="Failed to create employee")
@@ -54,164 +91,290 @@ async def create_employee(employee: EmployeeCreate):
         cursor.close()
         conn.close()
 
+def _bulk_error(errors, employee_id, e):
+    errors.append({"EmployeeID": employee_id, "Detail": f"Database error: {str(e)}"})
+
+def _stage_employees(cursor, staging, batch, errors):
+    # One array insert; if the driver rejects any row, restage one by one so only that row is reported
+    cursor.execute("SAVE TRANSACTION employee_stage")
+    cursor.fast_executemany = True
+    try:
+        cursor.executemany(
+            staging, [tuple(getattr(employee, column) for column in EMPLOYEE_COLUMNS) for employee in batch.values()]
+        )
+        return list(batch)
+    except pyodbc.Error:
+        cursor.execute("ROLLBACK TRANSACTION employee_stage")
+    
+    staged = []
+    for employee_id, employee in batch.items():
+        try:
+            cursor.execute(staging, tuple(getattr(employee, column) for column in EMPLOYEE_COLUMNS))
+            staged.append(employee_id)
+        except pyodbc.Error as e:
+            _bulk_error(errors, employee_id, e)
+    return staged
+
+def _merge_employees(cursor, merge, staged, modified_on, errors):
+    # Set-based MERGE first; a constraint or trigger rejection falls back to one MERGE per staged row
+    if not staged:
+        return []
+    cursor.execute("SAVE TRANSACTION employee_merge")
+    try:
+        cursor.execute(merge.format(where=""), modified_on)
+        return cursor.fetchall()
+    except pyodbc.Error:
+        cursor.execute("ROLLBACK TRANSACTION employee_merge")
+    
+    actions = []
+    for employee_id in staged:
+        try:
+            cursor.execute(merge.format(where=" WHERE EmployeeID = ?"), employee_id, modified_on)
+            actions.extend(cursor.fetchall())
+        except pyodbc.Error as e:
+            _bulk_error(errors, employee_id, e)
+    return actions
+
+@router.post("/bulk", response_model=EmployeeBulkResult)
+@run_in_db_executor
+def bulk_upsert_employees(employees: List[EmployeeCreate]):
+    errors = []
+    batch = {}
+    for employee in employees:
+        if employee.EmployeeID in batch:
+            errors.append({"EmployeeID": employee.EmployeeID, "Detail": "Duplicate EmployeeID in batch"})
+        else:
+            batch[employee.EmployeeID] = employee
+    
+    if not batch:
+        return {"Inserted": 0, "Updated": 0, "Failed": len(errors), "Errors": errors}
+    
+    column_list = ", ".join(EMPLOYEE_COLUMNS)
+    # Missing values never overwrite what's stored, same as PUT /employees/{employee_id}
+    assignments = ", ".join(
+        f"t.{column} = COALESCE(s.{column}, t.{column})" for column in EMPLOYEE_COLUMNS
+        if column not in ("EmployeeID", "ModifiedOn")
+    )
+    staging = f"INSERT INTO #EmployeeStage ({column_list}) VALUES ({', '.join('?' for _ in EMPLOYEE_COLUMNS)})"
+    # HOLDLOCK keeps two overlapping batches from both taking the NOT MATCHED branch for the same key
+    merge = f"""
+    MERGE Employee WITH (HOLDLOCK) AS t
+    USING (SELECT {column_list} FROM #EmployeeStage{{where}}) AS s ON t.EmployeeID = s.EmployeeID
+    WHEN MATCHED THEN
+        UPDATE SET {assignments}, t.ModifiedOn = ?
+    WHEN NOT MATCHED BY TARGET THEN
+        INSERT ({column_list}) VALUES ({", ".join(f"s.{column}" for column in EMPLOYEE_COLUMNS)})
+    OUTPUT $action, inserted.EmployeeID;
+    """
+    
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute("DROP TABLE IF EXISTS #EmployeeStage")
+        # Autocommit is off, so this opens the implicit transaction the savepoints below need
+        cursor.execute(f"SELECT TOP 0 {column_list} INTO #EmployeeStage FROM Employee")
+        
+        staged = _stage_employees(cursor, staging, batch, errors)
+        actions = _merge_employees(cursor, merge, staged, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), errors)
+        cursor.execute("DROP TABLE #EmployeeStage")
+        conn.commit()
+        
+        merged_ids = {employee_id for _, employee_id in actions}
+        updated_ids = [employee_id for action, employee_id in actions if action == "UPDATE"]
+        for employee_id in updated_ids:
+            leave_balance.invalidate_employee(employee_id)
+        for employee in batch.values():
+            if employee.Department is not None and employee.EmployeeID in merged_ids:
+                leave_stats.set_department(employee.EmployeeID, employee.Department)
+        if updated_ids:
+            leave_coverage.invalidate()
+        if actions:
+            invalidation_bus.publish("Employee", conn)
+        
+        return {
+            "Inserted": sum(1 for action, _ in actions if action == "INSERT"),
+            "Updated": len(updated_ids),
+            "Failed": len(errors),
+            "Errors": errors
+        }
+    except pyodbc.Error as e:
+        raise HTTPException(status_code=400, detail=f"Database error: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        cursor.close()
+        conn.close()
+
 @router.get("/", response_model=List[Employee])
-async def get_all_employees(skip: int = 0, limit: int = 100):
+@run_in_db_executor
+def get_all_employees(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[str] = None,
+    fields: Optional[str] = None,
+    sort: Optional[str] = None,
+    employee_id: Optional[str] = None,
+    department: Optional[str] = None,
+    designation: Optional[str] = None,
+    employee_status: Optional[str] = None,
+    project: Optional[str] = None,
+    joined_from: Optional[date] = None,
+    joined_to: Optional[date] = None,
+    if_none_match: Optional[str] = Header(None)
+):
+    columns = parse_fields(fields, Employee, "uid")
+    order = parse_sort(sort, SORT_COLUMNS, "uid")
+    conditions, params = filter_conditions(
+        {
+            "EmployeeID": employee_id, "Department": department, "Designation": designation,
+            "EmployeeStatus": employee_status, "Project": project
+        },
+        {"DateOfJoining": (joined_from, joined_to)}
+    )
+    query, params = build_page_query("Employee", "uid", skip, limit, after, conditions, params, columns, order)
     conn = get_db_connection()
     cursor = conn.cursor()
     
     try:
-        cursor.execute(f"SELECT * FROM Employee ORDER BY uid OFFSET {skip} ROWS FETCH NEXT {limit} ROWS ONLY")
+        cursor.execute(query, params)
         rows = cursor.fetchall()
         
-        employees = []
-        for row in rows:
-            employees.append(dict(zip([column[0] for column in cursor.description], row)))
+        employees = row_dicts(cursor, rows)
         
-        return employees
+        set_next_cursor(response, employees, "uid", limit, order)
+        return conditional(shape_response(employees, columns, response, List[Employee]), if_none_match, weak=bool(columns))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         cursor.close()
         conn.close()
 
-@router.get("/{employee_id}", response_model=Employee)
-async def get_employee(employee_id: str):
+@router.get("/export")
+async def export_employees(fmt: str = Query("ndjson", alias="format", pattern=EXPORT_FORMAT_PATTERN)):
+    return export_response("Employee", "uid", fmt, "employees")
+
+@router.get("/batch", response_model=Dict[str, Employee])
+@run_in_db_executor
+def get_employees_batch(ids: str, fields: Optional[str] = None):
+    keys = parse_ids(ids)
+    columns = parse_fields(fields, Employee, "EmployeeID")
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        rows = fetch_by_ids(cursor, "Employee", "EmployeeID", keys, columns)
+        return shape_response(rows, columns, model=Dict[str, Employee])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        cursor.close()
+        conn.close()
+
+@router.get("/{employee_id}", response_model=EmployeeProfile, response_model_exclude_unset=True)
+@run_in_db_executor
+def get_employee(
+    employee_id: str,
+    response: Response,
+    fields: Optional[str] = None,
+    include: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None)
+):
+    columns = parse_fields(fields, Employee, "uid")
+    includes = _parse_includes(include)
     conn = get_db_connection()
     cursor = conn.cursor()
     
     try:
-        cursor.execute("SELECT * FROM Employee WHERE EmployeeID = ?", employee_id)
+        # Employee row plus every requested collection in one batch, read back with nextset()
+        statements = [f"SELECT {select_list(columns)} FROM Employee WHERE EmployeeID = ?"]
+        for name in includes:
+            _, table, order_by = EMPLOYEE_INCLUDES[name]
+            statements.append(f"SELECT * FROM {table} WHERE EmployeeID = ? ORDER BY {order_by}")
+        cursor.execute(";\n".join(statements), [employee_id] * len(statements))
         row = cursor.fetchone()
         
         if row:
-            return dict(zip([column[0] for column in cursor.description], row))
+            employee = dict(zip([column[0] for column in cursor.description], row))
+            for name in includes:
+                cursor.nextset()
+                employee[EMPLOYEE_INCLUDES[name][0]] = row_dicts(cursor, cursor.fetchall())
+            return not_modified(employee, response, if_none_match, weak=bool(columns or includes)) or shape_response(employee, columns, response)
         else:
             raise HTTPException(status_code=404, detail="Employee not found")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         cursor.close()
         conn.close()
 
-@router.put("/{employee_id}", response_model=Employee)
-async def update_employee(employee_id: str, employee: EmployeeUpdate):
+def _update_employee(employee_id: str, fields: dict, response: Response, if_match: Optional[str]):
     conn = get_db_connection()
     cursor = conn.cursor()
     
     try:
-        cursor.execute("SELECT uid FROM Employee WHERE EmployeeID = ?", employee_id)
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="Employee not found")
-        
-        update_fields = []
-        params = []
-        
-        if employee.EmployeeName is not None:
-            update_fields.append("EmployeeName = ?")
-            params.append(employee.EmployeeName)
-        if employee.CNIC is not None:
-            update_fields.append("CNIC = ?")
-            params.append(employee.CNIC)
-        if employee.FatherName is not None:
-            update_fields.append("FatherName = ?")
-            params.append(employee.FatherName)
-        if employee.DOB is not None:
-            update_fields.append("DOB = ?")
-            params.append(employee.DOB)
-        if employee.MobileNo is not None:
-            update_fields.append("MobileNo = ?")
-            params.append(employee.MobileNo)
-        if employee.Department is not None:
-            update_fields.append("Department = ?")
-            params.append(employee.Department)
-        if employee.Designation is not None:
-            update_fields.append("Designation = ?")
-            params.append(employee.Designation)
-        if employee.DateOfJoining is not None:
-            update_fields.append("DateOfJoining = ?")
-            params.append(employee.DateOfJoining)
-        if employee.EmployeeStatus is not None:
-            update_fields.append("EmployeeStatus = ?")
-            params.append(employee.EmployeeStatus)
-        if employee.ModifiedBy is not None:
-            update_fields.append("ModifiedBy = ?")
-            params.append(employee.ModifiedBy)
-        if employee.ModifiedOn is not None:
-            update_fields.append("ModifiedOn = ?")
-            params.append(employee.ModifiedOn)
-        if employee.Details is not None:
-            update_fields.append("Details = ?")
-            params.append(employee.Details)
-        if employee.Project is not None:
-            update_fields.append("Project = ?")
-            params.append(employee.Project)
-        if employee.CarryForwardLeaves is not None:
-            update_fields.append("CarryForwardLeaves = ?")
-            params.append(employee.CarryForwardLeaves)
-        if employee.Year2022 is not None:
-            update_fields.append("Year2022 = ?")
-            params.append(employee.Year2022)
-        if employee.Year2023 is not None:
-            update_fields.append("Year2023 = ?")
-            params.append(employee.Year2023)
-        if employee.AdjustedAjusted is not None:
-            update_fields.append("AdjustedAjusted = ?")
-            params.append(employee.AdjustedAjusted)
-        if employee.Year2024 is not None:
-            update_fields.append("Year2024 = ?")
-            params.append(employee.Year2024)
-        if employee.CarryForwardLeaves1 is not None:
-            update_fields.append("CarryForwardLeaves1 = ?")
-            params.append(employee.CarryForwardLeaves1)
-        if employee.Year2023New is not None:
-            update_fields.append("Year2023New = ?")
-            params.append(employee.Year2023New)
-        if employee.BasicSalary is not None:
-            update_fields.append("BasicSalary = ?")
-            params.append(employee.BasicSalary)
-        if employee.ApplyTax is not None:
-            update_fields.append("ApplyTax = ?")
-            params.append(employee.ApplyTax)
-        
-        if not update_fields:
+        if not fields:
             raise HTTPException(status_code=400, detail="No fields to update")
         
-        update_fields.append("ModifiedOn = ?")
-        params.append(datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
-        
-        params.append(employee_id)
+        require_match(cursor, "Employee", "EmployeeID", employee_id, if_match)
         
-        query = f"UPDATE Employee SET {', '.join(update_fields)} WHERE EmployeeID = ?"
-        cursor.execute(query, params)
-        conn.commit()
+        fields["ModifiedOn"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         
-        cursor.execute("SELECT * FROM Employee WHERE EmployeeID = ?", employee_id)
-        row = cursor.fetchone()
+        row = update_returning(cursor, "Employee", "EmployeeID", employee_id, fields)
+        if not row:
+            raise HTTPException(status_code=404, detail="Employee not found")
         
-        if row:
-            return dict(zip([column[0] for column in cursor.description], row))
-        else:
-            raise HTTPException(status_code=404, detail="Employee not found after update")
+        conn.commit()
+        invalidation_bus.publish("Employee", conn)
+        if "Department" in fields:
+            leave_coverage.invalidate()
+            leave_stats.set_department(employee_id, fields["Department"])
+        if "CarryForwardLeaves" in fields or "DateOfJoining" in fields:
+            leave_balance.invalidate_employee(employee_id)
+        response.headers["ETag"] = etag_for(row)
+        return row
             
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         cursor.close()
         conn.close()
 
+@router.put("/{employee_id}", response_model=Employee)
+@run_in_db_executor
+def update_employee(employee_id: str, employee: EmployeeUpdate, response: Response, if_match: Optional[str] = Header(None)):
+    return _update_employee(employee_id, employee.dict(exclude_none=True, exclude={"EmployeeID"}), response, if_match)
+
+@router.patch("/{employee_id}", response_model=Employee)
+@run_in_db_executor
+def patch_employee(employee_id: str, employee: EmployeeUpdate, response: Response, if_match: Optional[str] = Header(None)):
+    return _update_employee(employee_id, employee.dict(exclude_unset=True, exclude={"EmployeeID"}), response, if_match)
+
 @router.delete("/{employee_id}")
-async def delete_employee(employee_id: str):
+@run_in_db_executor
+def delete_employee(employee_id: str, if_match: Optional[str] = Header(None)):
     conn = get_db_connection()
     cursor = conn.cursor()
     
     try:
+        require_match(cursor, "Employee", "EmployeeID", employee_id, if_match)
         cursor.execute("DELETE FROM Employee WHERE EmployeeID = ?", employee_id)
         conn.commit()
         
         if cursor.rowcount == 0:
             raise HTTPException(status_code=404, detail="Employee not found")
         
+        leave_coverage.invalidate()
+        leave_balance.invalidate_employee(employee_id)
+        leave_stats.set_department(employee_id, None)
+        invalidation_bus.publish("Employee", conn)
         return {"message": "Employee deleted successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
@@ -0,0 +1,65 @@
+import hashlib
+import json
+from typing import Optional
+
+from fastapi import HTTPException, Response
+from fastapi.encoders import jsonable_encoder
+
+
+def etag_for(content) -> str:
+    # Strong validator over the canonical JSON of the representation, identical on every worker
+    body = json.dumps(jsonable_encoder(content), sort_keys=True, separators=(",", ":"), default=str)
+    return '"' + hashlib.sha256(body.encode()).hexdigest()[:32] + '"'
+
+
+def _matches(header: str, etag: str, weak: bool) -> bool:
+    tags = [tag.strip() for tag in header.split(",")]
+    if weak:
+        # If-None-Match uses weak comparison: W/"x" matches "x"
+        tags = [tag[2:] if tag.startswith("W/") else tag for tag in tags]
+    return "*" in tags or etag in tags
+
+
+def _unchanged(headers) -> Response:
+    unchanged = Response(status_code=304)
+    for name, value in headers.items():
+        if name not in ("content-length", "content-type"):
+            unchanged.headers[name] = value
+    return unchanged
+
+
+def not_modified(content, response: Response, if_none_match: Optional[str], weak: bool = False) -> Optional[Response]:
+    """Tag the response; return a bodiless 304 when the client already holds this representation.
+
+    Pass weak=True for ?fields= projections and ?include= expansions: their tag
+    still revalidates GETs, but it is not the stored row's, so If-Match (strong
+    comparison) must not be offered it.
+    """
+    etag = etag_for(content)
+    response.headers["ETag"] = ("W/" if weak else "") + etag
+    if if_none_match is None or not _matches(if_none_match, etag, weak=True):
+        return None
+    return _unchanged(response.headers)
+
+
+def conditional(rendered: Response, if_none_match: Optional[str], weak: bool = False) -> Response:
+    """Tag an already rendered response from its body bytes; 304 when the client holds this representation.
+
+    For list GETs: hashing the bytes being sent is one sha256 pass, where
+    etag_for() would encode the whole page a second time.
+    """
+    etag = '"' + hashlib.sha256(rendered.body).hexdigest()[:32] + '"'
+    rendered.headers["ETag"] = ("W/" if weak else "") + etag
+    if if_none_match is None or not _matches(if_none_match, etag, weak=True):
+        return rendered
+    return _unchanged(rendered.headers)
+
+
+def require_match(cursor, table: str, key_column: str, key, if_match: Optional[str]):
+    # Optimistic concurrency for PUT/PATCH/DELETE: lock the row, then compare its current ETag
+    if if_match is None:
+        return
+    cursor.execute(f"SELECT * FROM {table} WITH (UPDLOCK, HOLDLOCK) WHERE {key_column} = ?", key)
+    row = cursor.fetchone()
+    if row is None or not _matches(if_match, etag_for(dict(zip([column[0] for column in cursor.description], row))), weak=False):
+        raise HTTPException(status_code=412, detail="Resource has been modified")
@@ -0,0 +1,80 @@
+import asyncio
+import csv
+import io
+import json
+
+from fastapi.responses import StreamingResponse
+from database import get_db_connection, run_db
+from json_utils import json_default
+
+EXPORT_BATCH_SIZE = 1000
+EXPORT_FORMAT_PATTERN = "^(ndjson|csv)$"
+
+
+def _encode_ndjson(columns, rows):
+    return "".join(json.dumps(dict(zip(columns, row)), default=json_default) + "\n" for row in rows)
+
+
+def _encode_csv(rows):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+
+# Cleanups still running after their generator was cancelled, kept referenced until they finish
+_cleanups = set()
+
+
+def _close(cursor, conn):
+    if cursor is not None:
+        cursor.close()
+    conn.close()
+
+
+async def _close_when_done(pending, cursor, conn):
+    # Let the in-flight ODBC call finish in its thread before closing its cursor, then release off the event loop
+    if pending is not None:
+        await asyncio.wait([pending])
+        if conn is None and not pending.cancelled() and pending.exception() is None:
+            conn = pending.result()
+    if conn is not None:
+        await run_db(_close, cursor, conn)
+
+
+async def _stream_rows(query, params, fmt):
+    # Each blocking ODBC call goes through the DB executor; only one batch is held in memory.
+    # Calls are shielded so a client disconnect cancels the generator, never the call under it.
+    conn = cursor = None
+    pending = asyncio.ensure_future(run_db(get_db_connection))
+    try:
+        conn = await asyncio.shield(pending)
+        cursor = conn.cursor()
+        pending = asyncio.ensure_future(run_db(cursor.execute, query, params))
+        await asyncio.shield(pending)
+        columns = [column[0] for column in cursor.description]
+        if fmt == "csv":
+            yield _encode_csv([columns])
+
+        while True:
+            pending = asyncio.ensure_future(run_db(cursor.fetchmany, EXPORT_BATCH_SIZE))
+            rows = await asyncio.shield(pending)
+            if not rows:
+                break
+            yield _encode_csv(rows) if fmt == "csv" else _encode_ndjson(columns, rows)
+    finally:
+        cleanup = asyncio.ensure_future(_close_when_done(pending, cursor, conn))
+        _cleanups.add(cleanup)
+        cleanup.add_done_callback(_cleanups.discard)
+        await asyncio.shield(cleanup)
+
+
+def export_response(table, key_column, fmt, filename, conditions=None, params=None):
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    query = f"SELECT * FROM {table}{where} ORDER BY {key_column}"
+
+    if fmt == "csv":
+        media_type = "text/csv"
+    else:
+        media_type = "application/x-ndjson"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'}
+    return StreamingResponse(_stream_rows(query, list(params or []), fmt), media_type=media_type, headers=headers)
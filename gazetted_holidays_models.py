@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import date
 
 class GazettedHolidayBase(BaseModel):
@@ -16,3 +16,10 @@ class GazettedHoliday(GazettedHolidayBase):
 
     class Config:
         from_attributes = True
+
+class WorkingDays(BaseModel):
+    StartDate: date
+    EndDate: date
+    CalendarDays: int
+    WorkingDays: int
+    Holidays: List[date] = []
@@ -1,26 +1,41 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
+from fastapi import APIRouter, Header, HTTPException, Response
+from typing import List, Optional
+from datetime import date
 import pyodbc
-from database import get_db_connection
-from gazetted_holidays_models import GazettedHoliday, GazettedHolidayCreate, GazettedHolidayUpdate
+from database import get_db_connection, run_in_db_executor
+from invalidation_bus import invalidation_bus
+from query_utils import update_returning, set_next_cursor
+from cache import reference_cache
+from etag_utils import conditional, etag_for, not_modified, require_match
+from json_utils import model_response
+from gazetted_holidays_models import GazettedHoliday, GazettedHolidayCreate, GazettedHolidayUpdate, WorkingDays
+from holiday_calendar import holiday_calendar
 
 router = APIRouter(prefix="/gazetted-holidays", tags=["GazettedHolidays"])
 
+holiday_cache = reference_cache["GazettedHolidays"]
+
+# Longest /working-days range, in calendar days (about ten years)
+WORKING_DAYS_MAX_SPAN = 3660
+
 # ✅ Create
 @router.post("/", response_model=GazettedHoliday)
-async def create_holiday(holiday: GazettedHolidayCreate):
+@run_in_db_executor
+def create_holiday(holiday: GazettedHolidayCreate):
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
         query = """
         INSERT INTO GazettedHolidays (HolidayDate, Description)
+        OUTPUT INSERTED.*
         VALUES (?, ?)
         """
         cursor.execute(query, (holiday.HolidayDate, holiday.Description))
-        conn.commit()
-
-        cursor.execute("SELECT * FROM GazettedHolidays WHERE HolidayDate = ?", holiday.HolidayDate)
         row = cursor.fetchone()
+        conn.commit()
+        holiday_cache.invalidate()
+        holiday_calendar.invalidate()
+        invalidation_bus.publish("GazettedHolidays", conn)
         if row:
             return dict(zip([column[0] for column in cursor.description], row))
         else:
@@ -31,70 +46,94 @@ async def create_holiday(holiday: GazettedHolidayCreate):
 
 # ✅ Read All
 @router.get("/", response_model=List[GazettedHoliday])
-async def get_all_holidays(skip: int = 0, limit: int = 100):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
-        query = "SELECT * FROM GazettedHolidays ORDER BY HolidayDate OFFSET ? ROWS FETCH NEXT ? ROWS ONLY"
-        cursor.execute(query, (skip, limit))
-        rows = cursor.fetchall()
-        return [dict(zip([column[0] for column in cursor.description], row)) for row in rows]
-    finally:
-        cursor.close()
-        conn.close()
+@run_in_db_executor
+def get_all_holidays(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None)
+):
+    results = holiday_cache.page(skip, limit, after)
+    set_next_cursor(response, results, "HolidayDate", limit)
+    return conditional(model_response(results, List[GazettedHoliday], response), if_none_match)
+
+# ✅ Working days in a date range
+@router.get("/working-days", response_model=WorkingDays)
+@run_in_db_executor
+def get_working_days(start_date: date, end_date: date):
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="end_date must not be before start_date")
+    if (end_date - start_date).days + 1 > WORKING_DAYS_MAX_SPAN:
+        raise HTTPException(status_code=400, detail=f"Date range must not exceed {WORKING_DAYS_MAX_SPAN} days")
+    return {
+        "StartDate": start_date,
+        "EndDate": end_date,
+        "CalendarDays": (end_date - start_date).days + 1,
+        "WorkingDays": holiday_calendar.working_days(start_date, end_date),
+        "Holidays": holiday_calendar.holidays_between(start_date, end_date)
+    }
 
 # ✅ Read One
 @router.get("/{holiday_date}", response_model=GazettedHoliday)
-async def get_holiday(holiday_date: str):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute("SELECT * FROM GazettedHolidays WHERE HolidayDate = ?", holiday_date)
-        row = cursor.fetchone()
-        if row:
-            return dict(zip([column[0] for column in cursor.description], row))
-        else:
-            raise HTTPException(status_code=404, detail="Holiday not found")
-    finally:
-        cursor.close()
-        conn.close()
+@run_in_db_executor
+def get_holiday(holiday_date: date, response: Response, if_none_match: Optional[str] = Header(None)):
+    row = holiday_cache.get(holiday_date)
+    if row is None:
+        raise HTTPException(status_code=404, detail="Holiday not found")
+    return not_modified(row, response, if_none_match) or row
 
 # ✅ Update
-@router.put("/{holiday_date}", response_model=GazettedHoliday)
-async def update_holiday(holiday_date: str, holiday: GazettedHolidayUpdate):
+def _update_holiday(holiday_date: date, fields: dict, response: Response, if_match: Optional[str]):
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        fields = holiday.dict(exclude_unset=True)
         if not fields:
             raise HTTPException(status_code=400, detail="No fields to update")
 
-        update_fields = ", ".join([f"{key} = ?" for key in fields.keys()])
-        params = list(fields.values())
-        params.append(holiday_date)
+        require_match(cursor, "GazettedHolidays", "HolidayDate", holiday_date, if_match)
 
-        query = f"UPDATE GazettedHolidays SET {update_fields} WHERE HolidayDate = ?"
-        cursor.execute(query, params)
-        conn.commit()
+        row = update_returning(cursor, "GazettedHolidays", "HolidayDate", holiday_date, fields)
+        if not row:
+            raise HTTPException(status_code=404, detail="Holiday not found")
 
-        cursor.execute("SELECT * FROM GazettedHolidays WHERE HolidayDate = ?", holiday_date)
-        row = cursor.fetchone()
-        if row:
-            return dict(zip([column[0] for column in cursor.description], row))
-        else:
-            raise HTTPException(status_code=404, detail="Holiday not found after update")
+        conn.commit()
+        holiday_cache.invalidate()
+        holiday_calendar.invalidate()
+        invalidation_bus.publish("GazettedHolidays", conn)
+        response.headers["ETag"] = etag_for(row)
+        return row
     finally:
         cursor.close()
         conn.close()
 
+@router.put("/{holiday_date}", response_model=GazettedHoliday)
+@run_in_db_executor
+def update_holiday(
+    holiday_date: date, holiday: GazettedHolidayUpdate, response: Response, if_match: Optional[str] = Header(None)
+):
+    return _update_holiday(holiday_date, holiday.dict(exclude_unset=True), response, if_match)
+
+@router.patch("/{holiday_date}", response_model=GazettedHoliday)
+@run_in_db_executor
+def patch_holiday(
+    holiday_date: date, holiday: GazettedHolidayUpdate, response: Response, if_match: Optional[str] = Header(None)
+):
+    return _update_holiday(holiday_date, holiday.dict(exclude_unset=True), response, if_match)
+
 # ✅ Delete
 @router.delete("/{holiday_date}")
-async def delete_holiday(holiday_date: str):
+@run_in_db_executor
+def delete_holiday(holiday_date: date, if_match: Optional[str] = Header(None)):
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
+        require_match(cursor, "GazettedHolidays", "HolidayDate", holiday_date, if_match)
         cursor.execute("DELETE FROM GazettedHolidays WHERE HolidayDate = ?", holiday_date)
         conn.commit()
+        holiday_cache.invalidate()
+        holiday_calendar.invalidate()
+        invalidation_bus.publish("GazettedHolidays", conn)
         if cursor.rowcount == 0:
             raise HTTPException(status_code=404, detail="Holiday not found")
         return {"message": "Holiday deleted successfully"}
@@ -0,0 +1,119 @@
+import os
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Dict, Optional, Set
+
+from database import get_db_connection
+
+# date.weekday() values treated as non-working (Saturday, Sunday)
+WEEKEND_DAYS = frozenset({5, 6})
+# Year bitmaps kept, least recently used dropped first
+CALENDAR_CACHE_YEARS = int(os.getenv("CALENDAR_CACHE_YEARS", "32"))
+
+
+class YearCalendar:
+    """Working-day bitmap for one year with prefix sums, so any range count is O(1)."""
+
+    def __init__(self, year: int, holidays: Set[date], weekend_days=WEEKEND_DAYS):
+        first = date(year, 1, 1)
+        self.year = year
+        self.first_ordinal = first.toordinal()
+        length = date(year + 1, 1, 1).toordinal() - self.first_ordinal
+
+        self.working = bytearray(length)
+        self.prefix = [0] * (length + 1)
+        for offset in range(length):
+            day = date.fromordinal(self.first_ordinal + offset)
+            is_working = day.weekday() not in weekend_days and day not in holidays
+            self.working[offset] = is_working
+            self.prefix[offset + 1] = self.prefix[offset] + is_working
+
+    def count(self, start: date, end: date) -> int:
+        return self.prefix[end.toordinal() - self.first_ordinal + 1] - self.prefix[start.toordinal() - self.first_ordinal]
+
+
+class HolidayCalendar:
+    def __init__(self, weekend_days=WEEKEND_DAYS, max_years: int = CALENDAR_CACHE_YEARS):
+        self.weekend_days = weekend_days
+        self.max_years = max_years
+        self._lock = threading.Lock()
+        self._holidays: Optional[Dict[int, Set[date]]] = None
+        self._years: "OrderedDict[int, YearCalendar]" = OrderedDict()
+        self._generation = 0
+
+    def invalidate(self):
+        with self._lock:
+            self._holidays = None
+            self._years = OrderedDict()
+            self._generation += 1
+
+    @staticmethod
+    def _load(cursor):
+        cursor.execute("SELECT HolidayDate FROM GazettedHolidays")
+        holidays = {}
+        for (holiday_date,) in cursor.fetchall():
+            if isinstance(holiday_date, datetime):
+                holiday_date = holiday_date.date()
+            holidays.setdefault(holiday_date.year, set()).add(holiday_date)
+        return holidays
+
+    def _ensure_loaded(self, cursor=None):
+        with self._lock:
+            if self._holidays is not None:
+                return self._holidays
+            generation = self._generation
+
+        if cursor is not None:
+            holidays = self._load(cursor)
+        else:
+            conn = get_db_connection()
+            own_cursor = conn.cursor()
+            try:
+                holidays = self._load(own_cursor)
+            finally:
+                own_cursor.close()
+                conn.close()
+
+        with self._lock:
+            if generation == self._generation:
+                self._holidays = holidays
+        return holidays
+
+    def _year(self, year: int, holidays) -> YearCalendar:
+        with self._lock:
+            calendar = self._years.get(year)
+            if calendar is not None:
+                self._years.move_to_end(year)
+        if calendar is None:
+            calendar = YearCalendar(year, holidays.get(year, set()), self.weekend_days)
+            with self._lock:
+                if self._holidays is holidays:
+                    self._years[year] = calendar
+                    while len(self._years) > self.max_years:
+                        self._years.popitem(last=False)
+        return calendar
+
+    def working_days(self, start: date, end: date, cursor=None) -> int:
+        if end < start:
+            return 0
+        holidays = self._ensure_loaded(cursor)
+        total = 0
+        for year in range(start.year, end.year + 1):
+            calendar = self._year(year, holidays)
+            total += calendar.count(max(start, date(year, 1, 1)), min(end, date(year, 12, 31)))
+        return total
+
+    def holidays_between(self, start: date, end: date, cursor=None):
+        holidays = self._ensure_loaded(cursor)
+        return sorted(
+            day for year in range(start.year, end.year + 1)
+            for day in holidays.get(year, ()) if start <= day <= end
+        )
+
+
+holiday_calendar = HolidayCalendar()
+
+
+def leave_total_days(start: date, end: date, add_days=None, exclude_days=None, cursor=None) -> float:
+    return holiday_calendar.working_days(start, end, cursor) + (add_days or 0) - (exclude_days or 0)
@@ -0,0 +1,11 @@
+from pydantic import BaseModel
+from typing import List
+
+class ImportRowError(BaseModel):
+    Row: int
+    Detail: str
+
+class ImportResult(BaseModel):
+    Inserted: int
+    Failed: int
+    Errors: List[ImportRowError]
@@ -0,0 +1,150 @@
+import codecs
+import csv
+import tempfile
+import zipfile
+from datetime import date, datetime
+
+import pyodbc
+from fastapi import HTTPException, Request
+from pydantic import ValidationError
+from database import get_db_connection, run_db
+
+try:
+    import openpyxl
+except ImportError:  # XLSX import is optional
+    openpyxl = None
+
+IMPORT_BATCH_SIZE = 500
+IMPORT_FORMAT_PATTERN = "^(csv|xlsx)$"
+# Uploads larger than this are spooled to a temporary file instead of memory
+IMPORT_SPOOL_SIZE = 1024 * 1024
+# Row errors listed in the response; Failed always has the full count
+IMPORT_MAX_ERRORS = 1000
+
+
+async def _spool_body(request: Request):
+    spool = tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_SIZE)
+    async for chunk in request.stream():
+        spool.write(chunk)
+    spool.seek(0)
+    return spool
+
+
+def _cell(value):
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    value = str(value).strip()
+    return value or None
+
+
+def _csv_rows(spool):
+    reader = csv.reader(codecs.getreader("utf-8-sig")(spool))
+    yield from reader
+
+
+def _xlsx_rows(spool):
+    if openpyxl is None:
+        raise HTTPException(status_code=415, detail="XLSX import requires the openpyxl package")
+    workbook = openpyxl.load_workbook(spool, read_only=True, data_only=True)
+    try:
+        yield from workbook.worksheets[0].iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def _map_header(header, model):
+    fields = {name.lower(): name for name in model.model_fields}
+    positions = {}
+    for position, title in enumerate(header):
+        name = fields.get((_cell(title) or "").lower())
+        if name is not None:
+            positions[name] = position
+    missing = [name for name, field in model.model_fields.items() if field.is_required() and name not in positions]
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Missing required columns: {', '.join(missing)}")
+    return positions
+
+
+def _insert_batch(cursor, query, batch, result):
+    # One executemany for the batch; if the database rejects it, undo the partial batch and retry row by row
+    cursor.execute("SAVE TRANSACTION import_batch")
+    try:
+        cursor.executemany(query, [values for _, values in batch])
+        result["Inserted"] += len(batch)
+    except pyodbc.Error:
+        cursor.execute("ROLLBACK TRANSACTION import_batch")
+        for row_number, values in batch:
+            try:
+                cursor.execute(query, values)
+                result["Inserted"] += 1
+            except pyodbc.Error as e:
+                _record_error(result, row_number, f"Database error: {str(e)}")
+
+
+def _record_error(result, row_number, detail):
+    result["Failed"] += 1
+    if len(result["Errors"]) < IMPORT_MAX_ERRORS:
+        result["Errors"].append({"Row": row_number, "Detail": detail})
+
+
+def _import_file(spool, fmt, model, table):
+    rows = _xlsx_rows(spool) if fmt == "xlsx" else _csv_rows(spool)
+    header = next(rows, None)
+    if header is None:
+        raise HTTPException(status_code=400, detail="File is empty")
+    positions = _map_header(header, model)
+    columns = list(positions)
+    query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})"
+
+    result = {"Inserted": 0, "Failed": 0, "Errors": []}
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        # Autocommit is off, so this opens the driver's implicit transaction (SAVE TRANSACTION
+        # cannot, error 628) and fails fast if the table doesn't have the mapped columns
+        cursor.execute(f"SELECT TOP 0 {', '.join(columns)} FROM {table}")
+        cursor.fast_executemany = True
+        batch = []
+        # Row 1 is the header, so data rows are numbered as they appear in the spreadsheet
+        for row_number, row in enumerate(rows, start=2):
+            values = {name: _cell(row[position]) if position < len(row) else None for name, position in positions.items()}
+            if not any(value is not None for value in values.values()):
+                continue
+            try:
+                record = model(**values)
+            except ValidationError as e:
+                _record_error(result, row_number, "; ".join(
+                    f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors()
+                ))
+                continue
+
+            batch.append((row_number, tuple(getattr(record, name) for name in columns)))
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                _insert_batch(cursor, query, batch, result)
+                batch = []
+
+        if batch:
+            _insert_batch(cursor, query, batch, result)
+        conn.commit()
+        return result
+    finally:
+        cursor.close()
+        conn.close()
+
+
+async def import_rows(request: Request, fmt: str, model, table):
+    spool = await _spool_body(request)
+    try:
+        return await run_db(_import_file, spool, fmt, model, table)
+    except HTTPException:
+        raise
+    except (csv.Error, UnicodeDecodeError, zipfile.BadZipFile) as e:
+        raise HTTPException(status_code=400, detail=f"Could not read {fmt.upper()} file: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        spool.close()
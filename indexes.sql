@@ -0,0 +1,66 @@
+-- Nonclustered indexes backing the list filters, sorts and keyset cursors.
+-- Each statement is guarded, so the script can be re-run safely.
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_EmployeeLeaves_EmployeeID_StartDate')
+    CREATE NONCLUSTERED INDEX IX_EmployeeLeaves_EmployeeID_StartDate
+    ON dbo.EmployeeLeaves (EmployeeID, StartDate)
+    INCLUDE (EndDate, Status, LeaveTypeName, TotalDays, Year);
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_EmployeeLeaves_Status_Year')
+    CREATE NONCLUSTERED INDEX IX_EmployeeLeaves_Status_Year
+    ON dbo.EmployeeLeaves (Status, Year);
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_EmployeeLeaves_StartDate')
+    CREATE NONCLUSTERED INDEX IX_EmployeeLeaves_StartDate
+    ON dbo.EmployeeLeaves (StartDate)
+    INCLUDE (EndDate, EmployeeID, LeaveTypeName, Status);
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Employee_Department')
+    CREATE NONCLUSTERED INDEX IX_Employee_Department
+    ON dbo.Employee (Department);
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Employee_EmployeeName')
+    CREATE NONCLUSTERED INDEX IX_Employee_EmployeeName
+    ON dbo.Employee (EmployeeName);
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_SalaryPayments_EmployeeID_Period')
+    CREATE NONCLUSTERED INDEX IX_SalaryPayments_EmployeeID_Period
+    ON dbo.SalaryPayments (EmployeeID, SalaryYear, SalaryMonth);
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_SalaryPayments_Period')
+    CREATE NONCLUSTERED INDEX IX_SalaryPayments_Period
+    ON dbo.SalaryPayments (SalaryYear, SalaryMonth);
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_SalaryPayments_PaymentDate')
+    CREATE NONCLUSTERED INDEX IX_SalaryPayments_PaymentDate
+    ON dbo.SalaryPayments (PaymentDate);
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Allowances_EmployeeID')
+    CREATE NONCLUSTERED INDEX IX_Allowances_EmployeeID
+    ON dbo.Allowances (EmployeeID)
+    INCLUDE (AllowanceType, Amount, IsActive, Frequency);
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Deductions_EmployeeID')
+    CREATE NONCLUSTERED INDEX IX_Deductions_EmployeeID
+    ON dbo.Deductions (EmployeeID)
+    INCLUDE (DeductionType, Amount, IsActive, Frequency);
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Promotions_EmployeeID_EffectiveDate')
+    CREATE NONCLUSTERED INDEX IX_Promotions_EmployeeID_EffectiveDate
+    ON dbo.Promotions (EmployeeID, EffectiveDate);
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_EmployeeTax_EmployeeID_Period')
+    CREATE NONCLUSTERED INDEX IX_EmployeeTax_EmployeeID_Period
+    ON dbo.EmployeeTax (EmployeeID, SalaryYear, SalaryMonth);
+GO
@@ -0,0 +1,173 @@
+import asyncio
+import os
+import sqlite3
+import threading
+from typing import Callable, Dict, List
+
+from database import get_db_connection, run_db
+
+# Upper bound, in seconds, on how long another worker's write can go unseen
+CACHE_POLL_INTERVAL = float(os.getenv("CACHE_POLL_INTERVAL", "2"))
+# Set to a file path to share versions through SQLite instead of SQL Server (local runs)
+CACHE_VERSIONS_SQLITE = os.getenv("CACHE_VERSIONS_SQLITE")
+
+
+class SqlServerVersionSource:
+    """Reads and bumps dbo.CacheVersions (cache_versions.sql)."""
+
+    def fetch(self) -> Dict[str, int]:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT TableName, Version FROM dbo.CacheVersions")
+            return {table: int(version) for table, version in cursor.fetchall()}
+        finally:
+            cursor.close()
+            conn.close()
+
+    def bump(self, table: str, conn=None):
+        # On the writer's connection after its commit, so the counter row is locked only for this statement
+        own = conn is None
+        if own:
+            conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                "UPDATE dbo.CacheVersions SET Version = Version + 1 OUTPUT INSERTED.Version WHERE TableName = ?", table
+            )
+            row = cursor.fetchone()
+            conn.commit()
+            return int(row[0]) if row else None
+        finally:
+            cursor.close()
+            if own:
+                conn.close()
+
+
+class SqliteVersionSource:
+    """File-backed stand-in for dbo.CacheVersions, shared by every worker on one host."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS CacheVersions (TableName TEXT PRIMARY KEY, Version INTEGER NOT NULL)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=5)
+
+    def fetch(self) -> Dict[str, int]:
+        conn = self._connect()
+        try:
+            return dict(conn.execute("SELECT TableName, Version FROM CacheVersions").fetchall())
+        finally:
+            conn.close()
+
+    def bump(self, table: str, conn=None):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT INTO CacheVersions (TableName, Version) VALUES (?, 1) "
+                    "ON CONFLICT(TableName) DO UPDATE SET Version = Version + 1",
+                    (table,)
+                )
+                return conn.execute("SELECT Version FROM CacheVersions WHERE TableName = ?", (table,)).fetchone()[0]
+        finally:
+            conn.close()
+
+
+class InvalidationBus:
+    """Polls per-table version counters and evicts the caches subscribed to any table that moved.
+
+    A worker's own publish() advances its recorded version when nothing else
+    wrote in between, so its incrementally patched caches survive the next poll.
+    """
+
+    def __init__(self, source, interval: float = CACHE_POLL_INTERVAL):
+        self.source = source
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._subscribers: Dict[str, List[Callable[[], None]]] = {}
+        self._versions: Dict[str, int] = {}
+        self._primed = False
+        self.polls = 0
+        self.failures = 0
+        self.publish_failures = 0
+        self.own_writes = 0
+        self.evictions = 0
+
+    def subscribe(self, table: str, invalidate: Callable[[], None]):
+        with self._lock:
+            self._subscribers.setdefault(table, []).append(invalidate)
+
+    def _evict(self, tables):
+        with self._lock:
+            callbacks = [callback for table in tables for callback in self._subscribers.get(table, ())]
+            self.evictions += len(tables)
+        for callback in callbacks:
+            callback()
+
+    def publish(self, table: str, conn=None):
+        # Local caches are already patched by the writer; this only tells the other workers.
+        # Called after commit (pass the writer's connection to reuse it), so a failure is
+        # counted rather than turning the write into a 500
+        try:
+            version = self.source.bump(table, conn)
+        except Exception:
+            with self._lock:
+                self.publish_failures += 1
+            return
+        with self._lock:
+            # Straight after the version this worker already holds means nobody else wrote in
+            # between: record it so the next poll doesn't evict what the writer just patched.
+            # Any gap is left for poll() to find and evict.
+            if version is not None and self._primed and self._versions.get(table, 0) == version - 1:
+                self._versions[table] = version
+                self.own_writes += 1
+
+    def poll(self):
+        try:
+            versions = self.source.fetch()
+        except Exception:
+            # Pool timeouts included: a missed poll only delays eviction until the next one
+            with self._lock:
+                self.failures += 1
+            return
+
+        with self._lock:
+            self.polls += 1
+            primed, self._primed = self._primed, True
+            # Counters only grow; a lower value is a read that raced this worker's own publish()
+            versions = {table: max(version, self._versions.get(table, version)) for table, version in versions.items()}
+            changed = [table for table, version in versions.items() if self._versions.get(table) != version]
+            self._versions = versions
+        # The first poll only records the baseline; nothing was cached against older versions
+        if primed and changed:
+            self._evict(changed)
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await run_db(self.poll)
+            except Exception:
+                # e.g. the executor refusing work; the poller must outlive any single failure
+                with self._lock:
+                    self.failures += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "interval": self.interval,
+                "polls": self.polls,
+                "failures": self.failures,
+                "publish_failures": self.publish_failures,
+                "own_writes": self.own_writes,
+                "evictions": self.evictions,
+                "versions": dict(self._versions),
+            }
+
+
+invalidation_bus = InvalidationBus(
+    SqliteVersionSource(CACHE_VERSIONS_SQLITE) if CACHE_VERSIONS_SQLITE else SqlServerVersionSource()
+)
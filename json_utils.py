@@ -0,0 +1,67 @@
+import json
+import threading
+from datetime import date, datetime
+from decimal import Decimal
+
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the stdlib encoder is the fallback
+    orjson = None
+
+
+def json_default(value):
+    # Shared by the orjson and stdlib encoders here and by the NDJSON export
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=json_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        content, default=json_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson when it is installed."""
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+_adapters = {}
+_adapters_lock = threading.Lock()
+
+
+def _adapter(model) -> TypeAdapter:
+    # Building a TypeAdapter compiles its validator and serializer, so each response type is built once
+    adapter = _adapters.get(model)
+    if adapter is None:
+        with _adapters_lock:
+            adapter = _adapters.setdefault(model, TypeAdapter(model))
+    return adapter
+
+
+def model_response(content, model, response: Response = None) -> Response:
+    """Validate rows against the response model once and encode them to JSON in pydantic's core.
+
+    Returning a Response bypasses FastAPI's own response_model validation and
+    jsonable_encoder pass, so the route keeps response_model only for the schema.
+    Values are equal to FastJSONResponse's but the text can differ: pydantic
+    writes Decimal("1E+16") as 1e+16 where orjson writes 1e16.
+    """
+    adapter = _adapter(model)
+    fast = Response(content=adapter.dump_json(adapter.validate_python(content)), media_type="application/json")
+    if response is not None:
+        for name, value in response.headers.items():
+            if name != "content-length":
+                fast.headers[name] = value
+    return fast
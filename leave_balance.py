@@ -0,0 +1,222 @@
+import threading
+from datetime import date, datetime
+from typing import Dict, Optional
+
+from database import get_db_connection
+
+# Only leaves in these statuses consume quota
+APPROVED_STATUSES = ("APPROVED",)
+
+
+def is_approved(status: Optional[str]) -> bool:
+    return (status or "").strip().upper() in APPROVED_STATUSES
+
+
+def leave_year(year, start_date) -> Optional[str]:
+    """Normalised year a leave counts against: its Year column, else the year it starts in."""
+    if year is not None and str(year).strip():
+        return str(year).strip()
+    if isinstance(start_date, (date, datetime)):
+        return str(start_date.year)
+    return None
+
+
+def _year_key(year: str):
+    return (0, int(year), "") if year.isdigit() else (1, 0, year)
+
+
+class EmployeeLedger:
+    """Approved leave days of one employee, keyed by leave uid so a status change can be undone."""
+
+    def __init__(self, joining_year: Optional[int], opening_carry_forward: float):
+        self.joining_year = joining_year
+        self.opening_carry_forward = opening_carry_forward
+        self.entries: Dict[int, tuple] = {}  # uid -> (year, leave type, days)
+        self.used: Dict[str, Dict[str, float]] = {}  # year -> leave type -> days
+
+    def add(self, uid: int, year: str, leave_type: str, days: float):
+        self.discard(uid)
+        self.entries[uid] = (year, leave_type, days)
+        self._retotal(year)
+
+    def discard(self, uid: int):
+        entry = self.entries.pop(uid, None)
+        if entry is not None:
+            self._retotal(entry[0])
+
+    def _retotal(self, year: str):
+        # Summing from the entries avoids float drift from repeated add/subtract
+        by_type = {}
+        for entry_year, leave_type, days in self.entries.values():
+            if entry_year == year:
+                by_type[leave_type] = by_type.get(leave_type, 0.0) + days
+        if by_type:
+            self.used[year] = by_type
+        else:
+            self.used.pop(year, None)
+
+
+class LeaveBalanceEngine:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._quotas: Optional[Dict[str, Dict[str, float]]] = None  # year -> leave type -> quota
+        self._ledgers: Dict[str, EmployeeLedger] = {}
+        self._owners: Dict[int, str] = {}
+        self._generation = 0
+
+    def invalidate(self):
+        with self._lock:
+            self._quotas = None
+            self._ledgers = {}
+            self._owners = {}
+            self._generation += 1
+
+    def invalidate_quotas(self):
+        with self._lock:
+            self._quotas = None
+            self._generation += 1
+
+    def invalidate_employee(self, employee_id: str):
+        with self._lock:
+            ledger = self._ledgers.pop(employee_id, None)
+            if ledger is not None:
+                for uid in ledger.entries:
+                    self._owners.pop(uid, None)
+            self._generation += 1
+
+    @staticmethod
+    def _load_quotas(cursor):
+        cursor.execute("SELECT LeaveTypeName, TotalLeaves, Year FROM LeaveQuota")
+        quotas = {}
+        for leave_type, total, year in cursor.fetchall():
+            year = leave_year(year, None)
+            if year is None or leave_type is None:
+                continue
+            by_type = quotas.setdefault(year, {})
+            by_type[leave_type] = by_type.get(leave_type, 0.0) + float(total or 0)
+        return quotas
+
+    @staticmethod
+    def _load_ledger(cursor, employee_id: str) -> Optional[EmployeeLedger]:
+        cursor.execute("SELECT DateOfJoining, CarryForwardLeaves FROM Employee WHERE EmployeeID = ?", employee_id)
+        employee = cursor.fetchone()
+        if not employee:
+            return None
+        joined, carry_forward = employee
+        ledger = EmployeeLedger(joined.year if joined else None, float(carry_forward or 0))
+
+        placeholders = ", ".join("?" for _ in APPROVED_STATUSES)
+        cursor.execute(
+            "SELECT uid, Year, StartDate, LeaveTypeName, TotalDays FROM EmployeeLeaves "
+            f"WHERE EmployeeID = ? AND UPPER(COALESCE(Status, '')) IN ({placeholders})",
+            (employee_id, *APPROVED_STATUSES)
+        )
+        for uid, year, start_date, leave_type, total_days in cursor.fetchall():
+            year = leave_year(year, start_date)
+            if year is not None:
+                ledger.add(uid, year, leave_type or "", float(total_days or 0))
+        return ledger
+
+    def _snapshot(self, employee_id: str, cursor):
+        with self._lock:
+            quotas = self._quotas
+            ledger = self._ledgers.get(employee_id)
+            generation = self._generation
+        if quotas is not None and ledger is not None:
+            return quotas, ledger
+
+        if quotas is None:
+            quotas = self._load_quotas(cursor)
+        if ledger is None:
+            ledger = self._load_ledger(cursor, employee_id)
+
+        with self._lock:
+            # A write that landed while we were loading wins; don't cache what may be stale
+            if generation == self._generation:
+                self._quotas = quotas
+                if ledger is not None:
+                    self._ledgers[employee_id] = ledger
+                    for uid in ledger.entries:
+                        self._owners[uid] = employee_id
+        return quotas, ledger
+
+    def balances(self, employee_id: str, year: Optional[str] = None, cursor=None):
+        """Per-year balances, each year's unused days carried into the next; None if the employee doesn't exist."""
+        if cursor is not None:
+            snapshot = self._snapshot(employee_id, cursor)
+        else:
+            conn = get_db_connection()
+            own_cursor = conn.cursor()
+            try:
+                snapshot = self._snapshot(employee_id, own_cursor)
+            finally:
+                own_cursor.close()
+                conn.close()
+
+        quotas, ledger = snapshot
+        if ledger is None:
+            return None
+
+        with self._lock:
+            used = {year_used: dict(by_type) for year_used, by_type in ledger.used.items()}
+
+        years = sorted(set(quotas) | set(used), key=_year_key)
+        if ledger.joining_year is not None:
+            years = [y for y in years if not y.isdigit() or int(y) >= ledger.joining_year or y in used]
+
+        results = []
+        carry_forward = ledger.opening_carry_forward
+        for current in years:
+            year_quota = quotas.get(current, {})
+            year_used = used.get(current, {})
+            types = [
+                {
+                    "LeaveTypeName": leave_type,
+                    "Quota": year_quota.get(leave_type, 0.0),
+                    "Used": year_used.get(leave_type, 0.0),
+                    "Remaining": year_quota.get(leave_type, 0.0) - year_used.get(leave_type, 0.0)
+                }
+                for leave_type in sorted(set(year_quota) | set(year_used))
+            ]
+            total_quota = sum(year_quota.values())
+            total_used = sum(year_used.values())
+            remaining = carry_forward + total_quota - total_used
+            results.append({
+                "EmployeeID": employee_id,
+                "Year": current,
+                "CarryForward": carry_forward,
+                "TotalQuota": total_quota,
+                "Used": total_used,
+                "Remaining": remaining,
+                "Types": types
+            })
+            carry_forward = max(remaining, 0.0)
+
+        if year is not None:
+            results = [result for result in results if result["Year"] == str(year).strip()]
+        return results
+
+    def upsert(self, row: dict):
+        """Apply a committed insert/update (full EmployeeLeaves row): status changes add or release days."""
+        with self._lock:
+            self._generation += 1
+            previous = self._owners.pop(row["uid"], None)
+            if previous in self._ledgers:
+                self._ledgers[previous].discard(row["uid"])
+
+            ledger = self._ledgers.get(row.get("EmployeeID"))
+            year = leave_year(row.get("Year"), row.get("StartDate"))
+            if ledger is None or year is None or not is_approved(row.get("Status")):
+                return
+            ledger.add(row["uid"], year, row.get("LeaveTypeName") or "", float(row.get("TotalDays") or 0))
+            self._owners[row["uid"]] = row["EmployeeID"]
+
+    def remove(self, uid: int):
+        with self._lock:
+            self._generation += 1
+            employee_id = self._owners.pop(uid, None)
+            if employee_id in self._ledgers:
+                self._ledgers[employee_id].discard(uid)
+
+
+leave_balance = LeaveBalanceEngine()
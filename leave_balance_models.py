@@ -0,0 +1,17 @@
+from pydantic import BaseModel
+from typing import List
+
+class LeaveTypeBalance(BaseModel):
+    LeaveTypeName: str
+    Quota: float
+    Used: float
+    Remaining: float
+
+class LeaveBalance(BaseModel):
+    EmployeeID: str
+    Year: str
+    CarryForward: float
+    TotalQuota: float
+    Used: float
+    Remaining: float
+    Types: List[LeaveTypeBalance]
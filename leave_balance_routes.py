@@ -0,0 +1,20 @@
+from fastapi import APIRouter, HTTPException
+from typing import List, Optional
+from database import run_in_db_executor
+from leave_balance import leave_balance
+from leave_balance_models import LeaveBalance
+
+router = APIRouter(prefix="/leave-balance", tags=["Leave Balance"])
+
+# ✅ Read One
+@router.get("/{employee_id}", response_model=List[LeaveBalance])
+@run_in_db_executor
+def get_leave_balance(employee_id: str, year: Optional[str] = None):
+    try:
+        balances = leave_balance.balances(employee_id, year)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    if balances is None:
+        raise HTTPException(status_code=404, detail="Employee not found")
+    return balances
@@ -0,0 +1,138 @@
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import List, Tuple
+
+from database import get_db_connection
+from leave_index import RELEASED_STATUSES
+
+# Department-months kept in memory, least recently used evicted first
+COVERAGE_CACHE_SIZE = 512
+
+_RELEASED_PLACEHOLDERS = ", ".join("?" for _ in RELEASED_STATUSES)
+
+_COVERAGE_QUERY = f"""
+SELECT l.EmployeeID, l.StartDate, l.EndDate
+FROM EmployeeLeaves l
+JOIN Employee e ON e.EmployeeID = l.EmployeeID
+WHERE e.Department = ?
+  AND l.StartDate <= ? AND l.EndDate >= ?
+  AND UPPER(COALESCE(l.Status, '')) NOT IN ({_RELEASED_PLACEHOLDERS})
+"""
+
+
+def _as_date(value):
+    return value.date() if isinstance(value, datetime) else value
+
+
+def _month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def _next_month(day: date) -> date:
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+
+def daily_absences(leaves: List[Tuple[str, date, date]], start: date, end: date) -> List[int]:
+    """Number of distinct employees on leave for each day in [start, end].
+
+    Each employee's leaves are merged first so overlapping records count once,
+    then a difference array is swept: O(leaves + days).
+    """
+    days = (end - start).days + 1
+    diff = [0] * (days + 1)
+
+    current_employee, run_start, run_end = None, None, None
+    for employee_id, leave_start, leave_end in sorted(leaves):
+        leave_start, leave_end = max(leave_start, start), min(leave_end, end)
+        if leave_end < leave_start:
+            continue
+        if employee_id == current_employee and leave_start <= run_end + timedelta(days=1):
+            run_end = max(run_end, leave_end)
+            continue
+        if current_employee is not None:
+            diff[(run_start - start).days] += 1
+            diff[(run_end - start).days + 1] -= 1
+        current_employee, run_start, run_end = employee_id, leave_start, leave_end
+    if current_employee is not None:
+        diff[(run_start - start).days] += 1
+        diff[(run_end - start).days + 1] -= 1
+
+    counts = []
+    running = 0
+    for delta in diff[:days]:
+        running += delta
+        counts.append(running)
+    return counts
+
+
+class LeaveCoverageCache:
+    def __init__(self, max_entries: int = COVERAGE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._months: "OrderedDict[Tuple[str, date], List[int]]" = OrderedDict()
+        self._generation = 0
+
+    def invalidate(self):
+        with self._lock:
+            self._months.clear()
+            self._generation += 1
+
+    @staticmethod
+    def _load(cursor, department: str, start: date, end: date):
+        cursor.execute(_COVERAGE_QUERY, (department, end, start, *RELEASED_STATUSES))
+        return [
+            (employee_id, _as_date(leave_start), _as_date(leave_end))
+            for employee_id, leave_start, leave_end in cursor.fetchall()
+            if leave_start is not None and leave_end is not None
+        ]
+
+    def coverage(self, department: str, start: date, end: date, cursor=None) -> List[int]:
+        months = []
+        month = _month_start(start)
+        while month <= end:
+            months.append(month)
+            month = _next_month(month)
+
+        with self._lock:
+            found = {}
+            for month in months:
+                counts = self._months.get((department, month))
+                if counts is not None:
+                    self._months.move_to_end((department, month))
+                    found[month] = counts
+            generation = self._generation
+
+        missing = [month for month in months if month not in found]
+        if missing:
+            # One set-based fetch covering every month not yet cached
+            span_start, span_end = missing[0], _next_month(missing[-1]) - timedelta(days=1)
+            if cursor is not None:
+                leaves = self._load(cursor, department, span_start, span_end)
+            else:
+                conn = get_db_connection()
+                own_cursor = conn.cursor()
+                try:
+                    leaves = self._load(own_cursor, department, span_start, span_end)
+                finally:
+                    own_cursor.close()
+                    conn.close()
+
+            loaded = {
+                month: daily_absences(leaves, month, _next_month(month) - timedelta(days=1)) for month in missing
+            }
+            with self._lock:
+                # A write that landed while we were loading wins; don't cache what may be stale
+                if generation == self._generation:
+                    for month, counts in loaded.items():
+                        self._months[(department, month)] = counts
+                    while len(self._months) > self.max_entries:
+                        self._months.popitem(last=False)
+            found.update(loaded)
+
+        counts = [count for month in months for count in found[month]]
+        offset = (start - months[0]).days
+        return counts[offset:offset + (end - start).days + 1]
+
+
+leave_coverage = LeaveCoverageCache()
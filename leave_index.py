@@ -0,0 +1,171 @@
+import threading
+from bisect import bisect_right
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional
+
+from database import get_db_connection
+
+# Leaves in these statuses no longer hold their dates
+RELEASED_STATUSES = ("REJECTED", "CANCELLED", "CANCELED")
+
+LOAD_CHUNK_SIZE = 1000
+
+_COLUMNS = "uid, EmployeeID, LeaveTypeName, StartDate, EndDate, Status"
+
+
+def _as_date(value):
+    return value.date() if isinstance(value, datetime) else value
+
+
+def holds_dates(status: Optional[str]) -> bool:
+    return (status or "").strip().upper() not in RELEASED_STATUSES
+
+
+def _leave(uid, employee_id, leave_type, start, end, status):
+    return {
+        "uid": uid, "EmployeeID": employee_id, "LeaveTypeName": leave_type,
+        "StartDate": _as_date(start), "EndDate": _as_date(end), "Status": status
+    }
+
+
+def locked_conflicts(cursor, employee_id: str, start: date, end: date, exclude_uid: Optional[int] = None) -> List[dict]:
+    """Authoritative overlap check, run inside the write transaction.
+
+    UPDLOCK, HOLDLOCK range-locks the employee's leaves starting on or before
+    end until commit, so a concurrent writer on any worker waits here and then
+    sees this transaction's row instead of passing the same check.
+    """
+    query = f"SELECT {_COLUMNS} FROM EmployeeLeaves WITH (UPDLOCK, HOLDLOCK) WHERE EmployeeID = ? AND StartDate <= ? AND EndDate >= ?"
+    params = [employee_id, end, start]
+    if exclude_uid is not None:
+        query += " AND uid <> ?"
+        params.append(exclude_uid)
+    cursor.execute(query, params)
+    return [_leave(*row) for row in cursor.fetchall() if holds_dates(row[5])]
+
+
+class EmployeeIntervals:
+    """Immutable set of one employee's leaves sorted by StartDate, with a running max of EndDate.
+
+    The running max is non-decreasing, so an overlap scan walks left from the
+    last interval starting on or before the query end and stops as soon as no
+    earlier interval can reach the query start.
+    """
+
+    def __init__(self, leaves: Iterable[dict] = ()):
+        self.leaves = sorted(leaves, key=lambda leave: (leave["StartDate"], leave["uid"]))
+        self.starts = [leave["StartDate"] for leave in self.leaves]
+        self.max_end = []
+        running = None
+        for leave in self.leaves:
+            running = leave["EndDate"] if running is None else max(running, leave["EndDate"])
+            self.max_end.append(running)
+
+    def with_leave(self, leave: dict) -> "EmployeeIntervals":
+        return EmployeeIntervals([*self.without(leave["uid"]).leaves, leave])
+
+    def without(self, uid: int) -> "EmployeeIntervals":
+        return EmployeeIntervals(leave for leave in self.leaves if leave["uid"] != uid)
+
+    def overlapping(self, start: date, end: date, exclude_uid: Optional[int] = None) -> List[dict]:
+        conflicts = []
+        position = bisect_right(self.starts, end) - 1
+        while position >= 0 and self.max_end[position] >= start:
+            leave = self.leaves[position]
+            if leave["EndDate"] >= start and leave["uid"] != exclude_uid:
+                conflicts.append(leave)
+            position -= 1
+        conflicts.reverse()
+        return conflicts
+
+
+class LeaveIntervalIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._employees: Dict[str, EmployeeIntervals] = {}
+        self._owners: Dict[int, str] = {}
+        self._generation = 0
+
+    def invalidate(self):
+        with self._lock:
+            self._employees = {}
+            self._owners = {}
+            self._generation += 1
+
+    @staticmethod
+    def _load(cursor, employee_ids: List[str]):
+        grouped = {}
+        # Stay well under SQL Server's 2100 parameter limit
+        for offset in range(0, len(employee_ids), LOAD_CHUNK_SIZE):
+            chunk = employee_ids[offset:offset + LOAD_CHUNK_SIZE]
+            placeholders = ", ".join("?" for _ in chunk)
+            cursor.execute(f"SELECT {_COLUMNS} FROM EmployeeLeaves WHERE EmployeeID IN ({placeholders})", chunk)
+            for uid, employee_id, leave_type, start, end, status in cursor.fetchall():
+                if start is None or end is None or not holds_dates(status):
+                    continue
+                grouped.setdefault(employee_id, []).append(_leave(uid, employee_id, leave_type, start, end, status))
+        return grouped
+
+    def lookup(self, employee_ids: Iterable[str], cursor=None) -> Dict[str, EmployeeIntervals]:
+        """Intervals for each employee, loading the ones not yet indexed in a single query."""
+        with self._lock:
+            wanted = set(employee_ids)
+            found = {employee_id: self._employees[employee_id] for employee_id in wanted if employee_id in self._employees}
+            missing = sorted(wanted - found.keys())
+            generation = self._generation
+        if not missing:
+            return found
+
+        if cursor is not None:
+            grouped = self._load(cursor, missing)
+        else:
+            conn = get_db_connection()
+            own_cursor = conn.cursor()
+            try:
+                grouped = self._load(own_cursor, missing)
+            finally:
+                own_cursor.close()
+                conn.close()
+
+        loaded = {employee_id: EmployeeIntervals(grouped.get(employee_id, ())) for employee_id in missing}
+        with self._lock:
+            # A write that landed while we were loading wins; don't cache what may be stale
+            if generation == self._generation:
+                for employee_id, intervals in loaded.items():
+                    self._employees.setdefault(employee_id, intervals)
+                    for leave in intervals.leaves:
+                        self._owners[leave["uid"]] = employee_id
+        return {**found, **loaded}
+
+    def conflicts(self, employee_id: str, start: date, end: date, exclude_uid: Optional[int] = None, cursor=None):
+        return self.lookup([employee_id], cursor)[employee_id].overlapping(start, end, exclude_uid)
+
+    def _discard(self, uid: int):
+        employee_id = self._owners.pop(uid, None)
+        if employee_id in self._employees:
+            self._employees[employee_id] = self._employees[employee_id].without(uid)
+
+    def upsert(self, row: dict):
+        """Apply a committed insert/update (full EmployeeLeaves row) to the index."""
+        with self._lock:
+            self._generation += 1
+            self._discard(row["uid"])
+            employee_id = row.get("EmployeeID")
+            intervals = self._employees.get(employee_id)
+            if intervals is None or row.get("StartDate") is None or row.get("EndDate") is None:
+                return
+            if not holds_dates(row.get("Status")):
+                return
+            self._employees[employee_id] = intervals.with_leave({
+                "uid": row["uid"], "EmployeeID": employee_id, "LeaveTypeName": row.get("LeaveTypeName"),
+                "StartDate": _as_date(row["StartDate"]), "EndDate": _as_date(row["EndDate"]), "Status": row.get("Status")
+            })
+            self._owners[row["uid"]] = employee_id
+
+    def remove(self, uid: int):
+        with self._lock:
+            self._generation += 1
+            self._discard(uid)
+
+
+leave_index = LeaveIntervalIndex()
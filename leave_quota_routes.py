@@ -1,26 +1,35 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
+from fastapi import APIRouter, HTTPException, Response
+from typing import List, Optional
 import pyodbc
-from database import get_db_connection
+from database import get_db_connection, run_in_db_executor
+from invalidation_bus import invalidation_bus
+from query_utils import update_returning, set_next_cursor
+from cache import reference_cache
 from leave_quota_models import LeaveQuota, LeaveQuotaCreate, LeaveQuotaUpdate
+from leave_balance import leave_balance
 
 router = APIRouter(prefix="/leave-quota", tags=["LeaveQuota"])
 
+quota_cache = reference_cache["LeaveQuota"]
+
 # ✅ Create
 @router.post("/", response_model=LeaveQuota)
-async def create_quota(quota: LeaveQuotaCreate):
+@run_in_db_executor
+def create_quota(quota: LeaveQuotaCreate):
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
         query = """
         INSERT INTO LeaveQuota (LeaveTypeName, TotalLeaves, Year)
+        OUTPUT INSERTED.*
         VALUES (?, ?, ?)
         """
         cursor.execute(query, (quota.LeaveTypeName, quota.TotalLeaves, quota.Year))
-        conn.commit()
-
-        cursor.execute("SELECT TOP 1 * FROM LeaveQuota ORDER BY UID DESC")
         row = cursor.fetchone()
+        conn.commit()
+        quota_cache.invalidate()
+        leave_balance.invalidate_quotas()
+        invalidation_bus.publish("LeaveQuota", conn)
         if row:
             return dict(zip([column[0] for column in cursor.description], row))
         else:
@@ -31,72 +40,66 @@ async def create_quota(quota: LeaveQuotaCreate):
 
 # ✅ Read All
 @router.get("/", response_model=List[LeaveQuota])
-async def get_all_quotas(skip: int = 0, limit: int = 100):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
-        query = "SELECT * FROM LeaveQuota ORDER BY UID OFFSET ? ROWS FETCH NEXT ? ROWS ONLY"
-        cursor.execute(query, (skip, limit))
-        rows = cursor.fetchall()
-        return [dict(zip([column[0] for column in cursor.description], row)) for row in rows]
-    finally:
-        cursor.close()
-        conn.close()
+@run_in_db_executor
+def get_all_quotas(response: Response, skip: int = 0, limit: int = 100, after: Optional[str] = None):
+    results = quota_cache.page(skip, limit, after)
+    set_next_cursor(response, results, "UID", limit)
+    return results
 
 # ✅ Read One
 @router.get("/{uid}", response_model=LeaveQuota)
-async def get_quota(uid: int):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute("SELECT * FROM LeaveQuota WHERE UID = ?", uid)
-        row = cursor.fetchone()
-        if row:
-            return dict(zip([column[0] for column in cursor.description], row))
-        else:
-            raise HTTPException(status_code=404, detail="LeaveQuota not found")
-    finally:
-        cursor.close()
-        conn.close()
+@run_in_db_executor
+def get_quota(uid: int):
+    row = quota_cache.get(uid)
+    if row is None:
+        raise HTTPException(status_code=404, detail="LeaveQuota not found")
+    return row
 
 # ✅ Update
-@router.put("/{uid}", response_model=LeaveQuota)
-async def update_quota(uid: int, quota: LeaveQuotaUpdate):
+def _update_quota(uid: int, fields: dict):
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        fields = quota.dict(exclude_unset=True)
         if not fields:
             raise HTTPException(status_code=400, detail="No fields to update")
 
-        update_fields = ", ".join([f"{key} = ?" for key in fields.keys()])
-        params = list(fields.values())
-        params.append(uid)
+        row = update_returning(cursor, "LeaveQuota", "UID", uid, fields)
+        if not row:
+            raise HTTPException(status_code=404, detail="LeaveQuota not found")
 
-        query = f"UPDATE LeaveQuota SET {update_fields} WHERE UID = ?"
-        cursor.execute(query, params)
         conn.commit()
-
-        cursor.execute("SELECT * FROM LeaveQuota WHERE UID = ?", uid)
-        row = cursor.fetchone()
-        if row:
-            return dict(zip([column[0] for column in cursor.description], row))
-        else:
-            raise HTTPException(status_code=404, detail="LeaveQuota not found after update")
+        quota_cache.invalidate()
+        leave_balance.invalidate_quotas()
+        invalidation_bus.publish("LeaveQuota", conn)
+        return row
     finally:
         cursor.close()
         conn.close()
 
+@router.put("/{uid}", response_model=LeaveQuota)
+@run_in_db_executor
+def update_quota(uid: int, quota: LeaveQuotaUpdate):
+    return _update_quota(uid, quota.dict(exclude_unset=True))
+
+@router.patch("/{uid}", response_model=LeaveQuota)
+@run_in_db_executor
+def patch_quota(uid: int, quota: LeaveQuotaUpdate):
+    return _update_quota(uid, quota.dict(exclude_unset=True))
+
 # ✅ Delete
 @router.delete("/{uid}")
-async def delete_quota(uid: int):
+@run_in_db_executor
+def delete_quota(uid: int):
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
         cursor.execute("DELETE FROM LeaveQuota WHERE UID = ?", uid)
         conn.commit()
+        quota_cache.invalidate()
         if cursor.rowcount == 0:
             raise HTTPException(status_code=404, detail="LeaveQuota not found")
+        leave_balance.invalidate_quotas()
+        invalidation_bus.publish("LeaveQuota", conn)
         return {"message": "LeaveQuota deleted successfully"}
     finally:
         cursor.close()
@@ -0,0 +1,203 @@
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from database import get_db_connection
+
+# Rows pulled per round trip when materializing the store
+LOAD_BATCH_SIZE = 5000
+
+# (LeaveTypeName, Status, Year) within one employee
+TypeKey = Tuple[Optional[str], Optional[str], Optional[str]]
+
+
+def _type_key(row: dict) -> TypeKey:
+    return (row.get("LeaveTypeName"), row.get("Status"), row.get("Year"))
+
+
+def _type_rows(totals):
+    return sorted(
+        (
+            {"LeaveTypeName": leave_type, "TotalLeaves": count, "TotalDays": days, "Status": status, "Year": leave_year}
+            for (leave_type, status, leave_year), (count, days) in totals.items()
+        ),
+        key=lambda stat: (stat["LeaveTypeName"] or "", stat["Status"] or "", stat["Year"] or "")
+    )
+
+
+class _StatsState:
+    """Counters per EmployeeID -> (leave type, status, year), plus what each leave contributed."""
+
+    def __init__(self):
+        self.counters: Dict[Optional[str], Dict[TypeKey, list]] = {}  # -> [TotalLeaves, TotalDays]
+        self.contributions: Dict[int, Tuple[Optional[str], TypeKey, float]] = {}
+        self.departments: Dict[str, Optional[str]] = {}
+
+    def add(self, uid: int, employee_id, key: TypeKey, days: float):
+        counter = self.counters.setdefault(employee_id, {}).setdefault(key, [0, 0.0])
+        counter[0] += 1
+        counter[1] += days
+        self.contributions[uid] = (employee_id, key, days)
+
+    def move(self, uid: int, row: Optional[dict]):
+        previous = self.contributions.pop(uid, None)
+        if previous is not None:
+            employee_id, key, days = previous
+            by_type = self.counters.get(employee_id, {})
+            counter = by_type.get(key)
+            if counter is not None:
+                counter[0] -= 1
+                counter[1] -= days
+                if counter[0] <= 0:
+                    del by_type[key]
+                    if not by_type:
+                        del self.counters[employee_id]
+        if row is not None:
+            self.add(uid, row.get("EmployeeID"), _type_key(row), float(row.get("TotalDays") or 0))
+
+    def set_department(self, employee_id: str, department: Optional[str]):
+        self.departments[employee_id] = department
+
+
+class LeaveStatsStore:
+    """COUNT(*)/SUM(TotalDays) per employee x leave type x status x year, kept current from the leave write paths.
+
+    Each leave's contribution is remembered by uid so an update can move it
+    from its old counter to the new one without touching the database. Writes
+    that land while the table is loading are queued and replayed onto the
+    loaded state, so a busy write path never forces a reload.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._state: Optional[_StatsState] = None
+        self._pending: Optional[List[Callable[[_StatsState], None]]] = None
+        self._generation = 0
+
+    def invalidate(self):
+        with self._lock:
+            self._state = None
+            self._generation += 1
+
+    @staticmethod
+    def _load(cursor) -> _StatsState:
+        state = _StatsState()
+        cursor.execute("SELECT EmployeeID, Department FROM Employee")
+        state.departments = {employee_id: department for employee_id, department in cursor.fetchall()}
+
+        cursor.execute("SELECT uid, EmployeeID, LeaveTypeName, Status, Year, TotalDays FROM EmployeeLeaves")
+        while True:
+            rows = cursor.fetchmany(LOAD_BATCH_SIZE)
+            if not rows:
+                break
+            for uid, employee_id, leave_type, status, year, total_days in rows:
+                state.add(uid, employee_id, (leave_type, status, year), float(total_days or 0))
+        return state
+
+    def _load_state(self, cursor=None) -> _StatsState:
+        if cursor is not None:
+            return self._load(cursor)
+        conn = get_db_connection()
+        own_cursor = conn.cursor()
+        try:
+            return self._load(own_cursor)
+        finally:
+            own_cursor.close()
+            conn.close()
+
+    def _read(self, read, cursor=None):
+        with self._lock:
+            if self._state is not None:
+                return read(self._state)
+
+        # One loader at a time; requests that queued behind it read what it installed
+        with self._load_lock:
+            with self._lock:
+                if self._state is not None:
+                    return read(self._state)
+                generation, self._pending = self._generation, []
+            try:
+                state = self._load_state(cursor)
+            except Exception:
+                with self._lock:
+                    self._pending = None
+                raise
+
+            with self._lock:
+                for change in self._pending:
+                    change(state)
+                self._pending = None
+                # invalidate() during the load means the data may predate it: answer from it, don't keep it
+                if generation == self._generation:
+                    self._state = state
+                return read(state)
+
+    def _apply(self, change: Callable[[_StatsState], None]):
+        with self._lock:
+            if self._state is not None:
+                change(self._state)
+            if self._pending is not None:
+                self._pending.append(change)
+
+    def employee_stats(self, employee_id: str, year: Optional[str] = None, cursor=None):
+        def read(state):
+            return _type_rows({
+                key: tuple(counter)
+                for key, counter in state.counters.get(employee_id, {}).items()
+                if counter[0] and (not year or key[2] == year)
+            })
+        return self._read(read, cursor)
+
+    @staticmethod
+    def _totals(state, group, include_employee, year):
+        totals = {}
+        for employee_id, by_type in state.counters.items():
+            if not include_employee(employee_id):
+                continue
+            for key, (count, days) in by_type.items():
+                if not count or (year and key[2] != year):
+                    continue
+                total = totals.setdefault(group(employee_id, key), [0, 0.0])
+                total[0] += count
+                total[1] += days
+        return totals
+
+    def organisation_stats(self, year: Optional[str] = None, department: Optional[str] = None, cursor=None):
+        def read(state):
+            return _type_rows(self._totals(
+                state,
+                lambda employee_id, key: key,
+                lambda employee_id: not department or state.departments.get(employee_id) == department,
+                year
+            ))
+        return self._read(read, cursor)
+
+    def department_stats(self, year: Optional[str] = None, cursor=None):
+        def read(state):
+            return self._totals(
+                state, lambda employee_id, key: (state.departments.get(employee_id), *key), lambda employee_id: True, year
+            )
+        totals = self._read(read, cursor)
+        return sorted(
+            (
+                {
+                    "Department": department, "LeaveTypeName": leave_type, "TotalLeaves": count,
+                    "TotalDays": days, "Status": status, "Year": leave_year
+                }
+                for (department, leave_type, status, leave_year), (count, days) in totals.items()
+            ),
+            key=lambda stat: (stat["Department"] or "", stat["LeaveTypeName"] or "", stat["Status"] or "", stat["Year"] or "")
+        )
+
+    def upsert(self, row: dict):
+        """Apply a committed insert/update (full EmployeeLeaves row) to the counters."""
+        self._apply(lambda state: state.move(row["uid"], row))
+
+    def remove(self, uid: int):
+        self._apply(lambda state: state.move(uid, None))
+
+    def set_department(self, employee_id: str, department: Optional[str]):
+        self._apply(lambda state: state.set_department(employee_id, department))
+
+
+leave_stats = LeaveStatsStore()
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import date
 
 class EmployeeLeaveBase(BaseModel):
@@ -31,4 +31,50 @@ class EmployeeLeave(EmployeeLeaveBase):
     uid: int
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class LeaveRange(BaseModel):
+    EmployeeID: str
+    StartDate: date
+    EndDate: date
+    ExcludeLeaveID: Optional[int] = None
+
+class LeaveConflict(BaseModel):
+    uid: int
+    LeaveTypeName: Optional[str] = None
+    StartDate: date
+    EndDate: date
+    Status: Optional[str] = None
+
+class LeaveRangeConflicts(BaseModel):
+    EmployeeID: str
+    StartDate: date
+    EndDate: date
+    Conflicts: List[LeaveConflict]
+
+class LeaveCoverageDay(BaseModel):
+    Date: date
+    Absent: int
+
+class LeaveCoverage(BaseModel):
+    Department: str
+    StartDate: date
+    EndDate: date
+    PeakAbsent: int
+    Days: List[LeaveCoverageDay]
+
+class LeaveBulkStatus(BaseModel):
+    LeaveIDs: List[int]
+    Status: str
+    ApprovedBy: Optional[str] = None
+    ApprovedOn: Optional[date] = None
+    DepSupervisorComments: Optional[str] = None
+
+class LeaveBulkStatusResult(BaseModel):
+    uid: int
+    Updated: bool
+    Detail: Optional[str] = None
+
+class LeaveBulkStatusResponse(BaseModel):
+    Updated: int
+    Results: List[LeaveBulkStatusResult]
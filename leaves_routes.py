@@ -1,43 +1,108 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Header, HTTPException, Query, Response
 from typing import List, Optional
 import pyodbc
-from datetime import datetime
-from database import get_db_connection
-from leaves_models import EmployeeLeave, EmployeeLeaveCreate, EmployeeLeaveUpdate
+from datetime import date, timedelta
+from database import get_db_connection, run_in_db_executor
+from invalidation_bus import invalidation_bus
+from export_utils import export_response, EXPORT_FORMAT_PATTERN
+from etag_utils import conditional, etag_for, not_modified, require_match
+from query_utils import (
+    update_returning, build_page_query, set_next_cursor, parse_fields, select_list, shape_response,
+    filter_conditions, parse_sort, row_dicts
+)
+from json_utils import model_response
+from leaves_models import (
+    EmployeeLeave, EmployeeLeaveCreate, EmployeeLeaveUpdate, LeaveRange, LeaveRangeConflicts, LeaveCoverage,
+    LeaveBulkStatus, LeaveBulkStatusResponse
+)
+from holiday_calendar import leave_total_days
+from leave_index import leave_index, holds_dates, locked_conflicts
+from leave_coverage import leave_coverage
+from leave_balance import leave_balance
+from leave_stats import leave_stats
 
 router = APIRouter(prefix="/leaves", tags=["Employee Leaves"])
 
+# Fields that feed the server-side TotalDays calculation
+LEAVE_DAY_FIELDS = ("StartDate", "EndDate", "AddDays", "ExcludeDays")
+# Fields that decide which dates a leave occupies
+LEAVE_SPAN_FIELDS = ("EmployeeID", "StartDate", "EndDate", "Status")
+
+# Columns ?sort= accepts besides the primary key
+SORT_COLUMNS = ("EmployeeID", "LeaveTypeName", "StartDate", "EndDate", "Status", "AppliedDate")
+
+# Longest range /leaves/coverage will sweep in one request
+MAX_COVERAGE_DAYS = 366
+# IDs per IN (...) list in bulk statements, well under SQL Server's 2100 parameter limit
+BULK_CHUNK_SIZE = 1000
+
+_CURRENT_LEAVE_COLUMNS = ("EmployeeID", "StartDate", "EndDate", "AddDays", "ExcludeDays", "Status")
+
+def _sync_leave_caches(rows, conn):
+    # Call after commit with the full EmployeeLeaves rows that were written
+    for row in rows:
+        leave_index.upsert(row)
+        leave_balance.upsert(row)
+        leave_stats.upsert(row)
+    leave_coverage.invalidate()
+    invalidation_bus.publish("EmployeeLeaves", conn)
+
+def _raise_on_overlap(cursor, employee_id, start, end, status, exclude_uid=None):
+    if not holds_dates(status):
+        return
+    # The per-worker index can lag other workers by a poll interval, so it only
+    # rejects early; a clean result is confirmed under lock in the transaction
+    conflicts = leave_index.conflicts(employee_id, start, end, exclude_uid, cursor)
+    if not conflicts:
+        conflicts = locked_conflicts(cursor, employee_id, start, end, exclude_uid)
+    if conflicts:
+        overlaps = ", ".join(
+            f"uid {leave['uid']} ({leave['StartDate']} to {leave['EndDate']})" for leave in conflicts
+        )
+        raise HTTPException(status_code=409, detail=f"Leave overlaps existing leave(s): {overlaps}")
+
 @router.post("/", response_model=EmployeeLeave)
-async def create_employee_leave(leave: EmployeeLeaveCreate):
+@run_in_db_executor
+def create_employee_leave(leave: EmployeeLeaveCreate):
+    if leave.EndDate < leave.StartDate:
+        raise HTTPException(status_code=400, detail="EndDate must not be before StartDate")
+    
     conn = get_db_connection()
     cursor = conn.cursor()
     
     try:
+        _raise_on_overlap(cursor, leave.EmployeeID, leave.StartDate, leave.EndDate, leave.Status)
+        total_days = leave_total_days(leave.StartDate, leave.EndDate, leave.AddDays, leave.ExcludeDays, cursor)
+        
         query = """
         INSERT INTO EmployeeLeaves (
             EmployeeID, LeaveTypeName, StartDate, EndDate, TotalDays, 
             AddDays, ExcludeDays, Short_Adj, DepSupervisorComments, 
             Year, Status, ApprovedBy, ApprovedOn, AppliedDate
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        )
+        OUTPUT INSERTED.*
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """
         
         cursor.execute(query, (
             leave.EmployeeID, leave.LeaveTypeName, leave.StartDate, leave.EndDate,
-            leave.TotalDays, leave.AddDays, leave.ExcludeDays, leave.Short_Adj,
+            total_days, leave.AddDays, leave.ExcludeDays, leave.Short_Adj,
             leave.DepSupervisorComments, leave.Year, leave.Status, leave.ApprovedBy,
             leave.ApprovedOn, leave.AppliedDate
         ))
         
-        conn.commit()
-        
-        cursor.execute("SELECT * FROM EmployeeLeaves WHERE uid = @@IDENTITY")
         row = cursor.fetchone()
+        conn.commit()
         
         if row:
-            return dict(zip([column[0] for column in cursor.description], row))
+            created = dict(zip([column[0] for column in cursor.description], row))
+            _sync_leave_caches([created], conn)
+            return created
         else:
             raise HTTPException(status_code=500, detail="Failed to create leave record")
             
+    except HTTPException:
+        raise
     except pyodbc.Error as e:
         raise HTTPException(status_code=400, detail=f"Database error: {str(e)}")
     except Exception as e:
@@ -47,61 +112,248 @@ async def create_employee_leave(leave: EmployeeLeaveCreate):
         conn.close()
 
 @router.get("/", response_model=List[EmployeeLeave])
-async def get_all_employee_leaves(
+@run_in_db_executor
+def get_all_employee_leaves(
+    response: Response,
     skip: int = 0, 
     limit: int = 100,
+    after: Optional[str] = None,
+    fields: Optional[str] = None,
+    sort: Optional[str] = None,
     employee_id: Optional[str] = None,
     status: Optional[str] = None,
-    year: Optional[str] = None
+    year: Optional[str] = None,
+    leave_type: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    if_none_match: Optional[str] = Header(None)
 ):
+    conditions = []
+    params = []
+    
+    if employee_id:
+        conditions.append("EmployeeID = ?")
+        params.append(employee_id)
+    
+    if status:
+        conditions.append("Status = ?")
+        params.append(status)
+        
+    if year:
+        conditions.append("Year = ?")
+        params.append(year)
+        
+    # date_from/date_to keep leaves that overlap the window
+    conditions, params = filter_conditions(
+        {"LeaveTypeName": leave_type}, {"EndDate": (date_from, None), "StartDate": (None, date_to)}, conditions, params
+    )
+        
+    columns = parse_fields(fields, EmployeeLeave, "uid")
+    order = parse_sort(sort, SORT_COLUMNS, "uid")
+        
+    query, params = build_page_query("EmployeeLeaves", "uid", skip, limit, after, conditions, params, columns, order)
+    
     conn = get_db_connection()
     cursor = conn.cursor()
     
     try:
-        base_query = "SELECT * FROM EmployeeLeaves WHERE 1=1"
-        params = []
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
         
-        if employee_id:
-            base_query += " AND EmployeeID = ?"
-            params.append(employee_id)
+        leaves = row_dicts(cursor, rows)
         
-        if status:
-            base_query += " AND Status = ?"
-            params.append(status)
-            
-        if year:
-            base_query += " AND Year = ?"
-            params.append(year)
-            
-        base_query += f" ORDER BY uid OFFSET {skip} ROWS FETCH NEXT {limit} ROWS ONLY"
+        set_next_cursor(response, leaves, "uid", limit, order)
+        return conditional(shape_response(leaves, columns, response, List[EmployeeLeave]), if_none_match, weak=bool(columns))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        cursor.close()
+        conn.close()
+
+@router.post("/conflicts", response_model=List[LeaveRangeConflicts])
+@run_in_db_executor
+def check_leave_conflicts(ranges: List[LeaveRange]):
+    for proposed in ranges:
+        if proposed.EndDate < proposed.StartDate:
+            raise HTTPException(status_code=400, detail="EndDate must not be before StartDate")
+    
+    try:
+        intervals = leave_index.lookup(proposed.EmployeeID for proposed in ranges)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    return [
+        {
+            "EmployeeID": proposed.EmployeeID,
+            "StartDate": proposed.StartDate,
+            "EndDate": proposed.EndDate,
+            "Conflicts": intervals[proposed.EmployeeID].overlapping(
+                proposed.StartDate, proposed.EndDate, proposed.ExcludeLeaveID
+            )
+        }
+        for proposed in ranges
+    ]
+
+@router.post("/bulk-status", response_model=LeaveBulkStatusResponse)
+@run_in_db_executor
+def bulk_update_leave_status(change: LeaveBulkStatus):
+    leave_ids = list(dict.fromkeys(change.LeaveIDs))
+    if not leave_ids:
+        raise HTTPException(status_code=400, detail="No leave IDs supplied")
+    fields = change.dict(exclude_unset=True, exclude={"LeaveIDs"})
+    
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        current = {}
+        for offset in range(0, len(leave_ids), BULK_CHUNK_SIZE):
+            chunk = leave_ids[offset:offset + BULK_CHUNK_SIZE]
+            placeholders = ", ".join("?" for _ in chunk)
+            cursor.execute(
+                f"SELECT uid, EmployeeID, StartDate, EndDate, Status FROM EmployeeLeaves WITH (UPDLOCK) WHERE uid IN ({placeholders})",
+                chunk
+            )
+            for uid, employee_id, start, end, status in cursor.fetchall():
+                current[uid] = (employee_id, start, end, status)
         
-        cursor.execute(base_query, params)
-        rows = cursor.fetchall()
+        # Leaves coming back from rejected/cancelled must not land on dates already taken
+        failures = {}
+        claimed = {}
+        for uid in leave_ids:
+            if uid not in current:
+                failures[uid] = "Leave record not found"
+                continue
+            employee_id, start, end, status = current[uid]
+            if holds_dates(status) or not holds_dates(change.Status) or start is None or end is None:
+                continue
+            overlaps = leave_index.conflicts(employee_id, start, end, uid, cursor)
+            overlaps += [
+                other for other in claimed.get(employee_id, []) if other["StartDate"] <= end and other["EndDate"] >= start
+            ]
+            if not overlaps:
+                overlaps = locked_conflicts(cursor, employee_id, start, end, uid)
+            if overlaps:
+                failures[uid] = "Leave overlaps existing leave(s): " + ", ".join(f"uid {leave['uid']}" for leave in overlaps)
+            else:
+                claimed.setdefault(employee_id, []).append({"uid": uid, "StartDate": start, "EndDate": end})
+        
+        accepted = [uid for uid in leave_ids if uid not in failures]
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        updated_rows = []
+        for offset in range(0, len(accepted), BULK_CHUNK_SIZE):
+            chunk = accepted[offset:offset + BULK_CHUNK_SIZE]
+            placeholders = ", ".join("?" for _ in chunk)
+            cursor.execute(
+                f"UPDATE EmployeeLeaves SET {assignments} OUTPUT INSERTED.* WHERE uid IN ({placeholders})",
+                [*fields.values(), *chunk]
+            )
+            columns = [column[0] for column in cursor.description]
+            updated_rows.extend(dict(zip(columns, row)) for row in cursor.fetchall())
         
-        leaves = []
-        for row in rows:
-            leaves.append(dict(zip([column[0] for column in cursor.description], row)))
+        conn.commit()
+        _sync_leave_caches(updated_rows, conn)
         
-        return leaves
+        updated = {row["uid"] for row in updated_rows}
+        return {
+            "Updated": len(updated),
+            "Results": [
+                {"uid": uid, "Updated": uid in updated, "Detail": failures.get(uid)}
+                for uid in leave_ids
+            ]
+        }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         cursor.close()
         conn.close()
 
+@router.get("/coverage", response_model=LeaveCoverage)
+@run_in_db_executor
+def get_leave_coverage(department: str, start_date: date, end_date: date):
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="end_date must not be before start_date")
+    if (end_date - start_date).days >= MAX_COVERAGE_DAYS:
+        raise HTTPException(status_code=400, detail=f"Date range cannot exceed {MAX_COVERAGE_DAYS} days")
+    
+    try:
+        counts = leave_coverage.coverage(department, start_date, end_date)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    return {
+        "Department": department,
+        "StartDate": start_date,
+        "EndDate": end_date,
+        "PeakAbsent": max(counts),
+        "Days": [
+            {"Date": start_date + timedelta(days=offset), "Absent": count}
+            for offset, count in enumerate(counts)
+        ]
+    }
+
+@router.get("/stats")
+@run_in_db_executor
+def get_organisation_leave_stats(year: Optional[str] = None, department: Optional[str] = None):
+    try:
+        return leave_stats.organisation_stats(year, department)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/stats/departments")
+@run_in_db_executor
+def get_department_leave_stats(year: Optional[str] = None):
+    try:
+        return leave_stats.department_stats(year)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/export")
+async def export_employee_leaves(
+    fmt: str = Query("ndjson", alias="format", pattern=EXPORT_FORMAT_PATTERN),
+    employee_id: Optional[str] = None,
+    status: Optional[str] = None,
+    year: Optional[str] = None
+):
+    conditions = []
+    params = []
+    
+    if employee_id:
+        conditions.append("EmployeeID = ?")
+        params.append(employee_id)
+    
+    if status:
+        conditions.append("Status = ?")
+        params.append(status)
+        
+    if year:
+        conditions.append("Year = ?")
+        params.append(year)
+    
+    return export_response("EmployeeLeaves", "uid", fmt, "employee_leaves", conditions, params)
+
 @router.get("/{leave_id}", response_model=EmployeeLeave)
-async def get_employee_leave(leave_id: int):
+@run_in_db_executor
+def get_employee_leave(
+    leave_id: int, response: Response, fields: Optional[str] = None, if_none_match: Optional[str] = Header(None)
+):
+    columns = parse_fields(fields, EmployeeLeave, "uid")
     conn = get_db_connection()
     cursor = conn.cursor()
     
     try:
-        cursor.execute("SELECT * FROM EmployeeLeaves WHERE uid = ?", leave_id)
+        cursor.execute(f"SELECT {select_list(columns)} FROM EmployeeLeaves WHERE uid = ?", leave_id)
         row = cursor.fetchone()
         
         if row:
-            return dict(zip([column[0] for column in cursor.description], row))
+            leave = dict(zip([column[0] for column in cursor.description], row))
+            return not_modified(leave, response, if_none_match, weak=bool(columns)) or shape_response(leave, columns, response)
         else:
             raise HTTPException(status_code=404, detail="Leave record not found")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
@@ -109,7 +361,8 @@ async def get_employee_leave(leave_id: int):
         conn.close()
 
 @router.get("/employee/{employee_id}", response_model=List[EmployeeLeave])
-async def get_leaves_by_employee(employee_id: str):
+@run_in_db_executor
+def get_leaves_by_employee(employee_id: str):
     conn = get_db_connection()
     cursor = conn.cursor()
     
@@ -117,109 +370,100 @@ async def get_leaves_by_employee(employee_id: str):
         cursor.execute("SELECT * FROM EmployeeLeaves WHERE EmployeeID = ? ORDER BY StartDate DESC", employee_id)
         rows = cursor.fetchall()
         
-        leaves = []
-        for row in rows:
-            leaves.append(dict(zip([column[0] for column in cursor.description], row)))
+        leaves = row_dicts(cursor, rows)
         
-        return leaves
+        return model_response(leaves, List[EmployeeLeave])
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         cursor.close()
         conn.close()
 
-@router.put("/{leave_id}", response_model=EmployeeLeave)
-async def update_employee_leave(leave_id: int, leave: EmployeeLeaveUpdate):
+def _merged_leave(cursor, leave_id: int, fields: dict):
+    cursor.execute(
+        f"SELECT {', '.join(_CURRENT_LEAVE_COLUMNS)} FROM EmployeeLeaves WITH (UPDLOCK) WHERE uid = ?",
+        leave_id
+    )
+    row = cursor.fetchone()
+    if not row:
+        raise HTTPException(status_code=404, detail="Leave record not found")
+    leave = {**dict(zip(_CURRENT_LEAVE_COLUMNS, row)), **fields}
+    
+    if leave["StartDate"] is not None and leave["EndDate"] is not None and leave["EndDate"] < leave["StartDate"]:
+        raise HTTPException(status_code=400, detail="EndDate must not be before StartDate")
+    return leave
+
+def _update_employee_leave(leave_id: int, fields: dict, response: Response, if_match: Optional[str]):
     conn = get_db_connection()
     cursor = conn.cursor()
     
     try:
-        cursor.execute("SELECT uid FROM EmployeeLeaves WHERE uid = ?", leave_id)
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="Leave record not found")
-        
-        update_fields = []
-        params = []
-        
-        if leave.EmployeeID is not None:
-            update_fields.append("EmployeeID = ?")
-            params.append(leave.EmployeeID)
-        if leave.LeaveTypeName is not None:
-            update_fields.append("LeaveTypeName = ?")
-            params.append(leave.LeaveTypeName)
-        if leave.StartDate is not None:
-            update_fields.append("StartDate = ?")
-            params.append(leave.StartDate)
-        if leave.EndDate is not None:
-            update_fields.append("EndDate = ?")
-            params.append(leave.EndDate)
-        if leave.TotalDays is not None:
-            update_fields.append("TotalDays = ?")
-            params.append(leave.TotalDays)
-        if leave.AddDays is not None:
-            update_fields.append("AddDays = ?")
-            params.append(leave.AddDays)
-        if leave.ExcludeDays is not None:
-            update_fields.append("ExcludeDays = ?")
-            params.append(leave.ExcludeDays)
-        if leave.Short_Adj is not None:
-            update_fields.append("Short_Adj = ?")
-            params.append(leave.Short_Adj)
-        if leave.DepSupervisorComments is not None:
-            update_fields.append("DepSupervisorComments = ?")
-            params.append(leave.DepSupervisorComments)
-        if leave.Year is not None:
-            update_fields.append("Year = ?")
-            params.append(leave.Year)
-        if leave.Status is not None:
-            update_fields.append("Status = ?")
-            params.append(leave.Status)
-        if leave.ApprovedBy is not None:
-            update_fields.append("ApprovedBy = ?")
-            params.append(leave.ApprovedBy)
-        if leave.ApprovedOn is not None:
-            update_fields.append("ApprovedOn = ?")
-            params.append(leave.ApprovedOn)
-        if leave.AppliedDate is not None:
-            update_fields.append("AppliedDate = ?")
-            params.append(leave.AppliedDate)
-        
-        if not update_fields:
+        if not fields:
             raise HTTPException(status_code=400, detail="No fields to update")
         
-        params.append(leave_id)
+        require_match(cursor, "EmployeeLeaves", "uid", leave_id, if_match)
         
-        query = f"UPDATE EmployeeLeaves SET {', '.join(update_fields)} WHERE uid = ?"
-        cursor.execute(query, params)
-        conn.commit()
+        touched = fields.keys() & {"TotalDays", *LEAVE_DAY_FIELDS, *LEAVE_SPAN_FIELDS}
+        if touched:
+            leave = _merged_leave(cursor, leave_id, fields)
+            if touched & set(LEAVE_SPAN_FIELDS) and leave["StartDate"] is not None and leave["EndDate"] is not None:
+                _raise_on_overlap(cursor, leave["EmployeeID"], leave["StartDate"], leave["EndDate"], leave["Status"], leave_id)
+            # TotalDays is always derived from the dates, holidays and day adjustments
+            if touched & {"TotalDays", *LEAVE_DAY_FIELDS}:
+                fields["TotalDays"] = None if leave["StartDate"] is None or leave["EndDate"] is None else leave_total_days(
+                    leave["StartDate"], leave["EndDate"], leave["AddDays"], leave["ExcludeDays"], cursor
+                )
         
-        cursor.execute("SELECT * FROM EmployeeLeaves WHERE uid = ?", leave_id)
-        row = cursor.fetchone()
+        row = update_returning(cursor, "EmployeeLeaves", "uid", leave_id, fields)
+        if not row:
+            raise HTTPException(status_code=404, detail="Leave record not found")
         
-        if row:
-            return dict(zip([column[0] for column in cursor.description], row))
-        else:
-            raise HTTPException(status_code=404, detail="Leave record not found after update")
+        conn.commit()
+        _sync_leave_caches([row], conn)
+        response.headers["ETag"] = etag_for(row)
+        return row
             
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         cursor.close()
         conn.close()
 
+@router.put("/{leave_id}", response_model=EmployeeLeave)
+@run_in_db_executor
+def update_employee_leave(leave_id: int, leave: EmployeeLeaveUpdate, response: Response, if_match: Optional[str] = Header(None)):
+    return _update_employee_leave(leave_id, leave.dict(exclude_none=True), response, if_match)
+
+@router.patch("/{leave_id}", response_model=EmployeeLeave)
+@run_in_db_executor
+def patch_employee_leave(leave_id: int, leave: EmployeeLeaveUpdate, response: Response, if_match: Optional[str] = Header(None)):
+    return _update_employee_leave(leave_id, leave.dict(exclude_unset=True), response, if_match)
+
 @router.delete("/{leave_id}")
-async def delete_employee_leave(leave_id: int):
+@run_in_db_executor
+def delete_employee_leave(leave_id: int, if_match: Optional[str] = Header(None)):
     conn = get_db_connection()
     cursor = conn.cursor()
     
     try:
+        require_match(cursor, "EmployeeLeaves", "uid", leave_id, if_match)
         cursor.execute("DELETE FROM EmployeeLeaves WHERE uid = ?", leave_id)
         conn.commit()
         
         if cursor.rowcount == 0:
             raise HTTPException(status_code=404, detail="Leave record not found")
         
+        leave_index.remove(leave_id)
+        leave_coverage.invalidate()
+        leave_balance.remove(leave_id)
+        leave_stats.remove(leave_id)
+        invalidation_bus.publish("EmployeeLeaves", conn)
+        
         return {"message": "Leave record deleted successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
@@ -227,40 +471,9 @@ async def delete_employee_leave(leave_id: int):
         conn.close()
 
 @router.get("/stats/{employee_id}")
-async def get_leave_stats(employee_id: str, year: Optional[str] = None):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
+@run_in_db_executor
+def get_leave_stats(employee_id: str, year: Optional[str] = None):
     try:
-        base_query = """
-        SELECT 
-            LeaveTypeName,
-            COUNT(*) as TotalLeaves,
-            SUM(TotalDays) as TotalDays,
-            Status,
-            Year
-        FROM EmployeeLeaves 
-        WHERE EmployeeID = ?
-        """
-        
-        params = [employee_id]
-        
-        if year:
-            base_query += " AND Year = ?"
-            params.append(year)
-            
-        base_query += " GROUP BY LeaveTypeName, Status, Year ORDER BY LeaveTypeName"
-        
-        cursor.execute(base_query, params)
-        rows = cursor.fetchall()
-        
-        stats = []
-        for row in rows:
-            stats.append(dict(zip([column[0] for column in cursor.description], row)))
-        
-        return stats
+        return leave_stats.employee_stats(employee_id, year)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        cursor.close()
-        conn.close()
\ No newline at end of file
@@ -1,28 +1,29 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
+from fastapi import APIRouter, HTTPException, Response
+from typing import List, Optional
 import pyodbc
-from database import get_db_connection
+from database import get_db_connection, run_in_db_executor
+from query_utils import update_returning, build_page_query, set_next_cursor, row_dicts
 from login_models import Login, LoginCreate, LoginUpdate
 
 router = APIRouter(prefix="/logins", tags=["Logins"])
 
 # ✅ Create
 @router.post("/", response_model=Login)
-async def create_login(user: LoginCreate):
+@run_in_db_executor
+def create_login(user: LoginCreate):
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
         query = """
         INSERT INTO Tbl_login (UserID, Username, Password, Role)
+        OUTPUT INSERTED.*
         VALUES (?, ?, ?, ?)
         """
         cursor.execute(query, (
             user.UserID, user.Username, user.Password, user.Role
         ))
-        conn.commit()
-
-        cursor.execute("SELECT * FROM Tbl_login WHERE uid = @@IDENTITY")
         row = cursor.fetchone()
+        conn.commit()
         if row:
             return dict(zip([column[0] for column in cursor.description], row))
         else:
@@ -36,13 +37,17 @@ async def create_login(user: LoginCreate):
 
 # ✅ Read All
 @router.get("/", response_model=List[Login])
-async def get_all_logins(skip: int = 0, limit: int = 100):
+@run_in_db_executor
+def get_all_logins(response: Response, skip: int = 0, limit: int = 100, after: Optional[str] = None):
+    query, params = build_page_query("Tbl_login", "uid", skip, limit, after)
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute(f"SELECT * FROM Tbl_login ORDER BY uid OFFSET {skip} ROWS FETCH NEXT {limit} ROWS ONLY")
+        cursor.execute(query, params)
         rows = cursor.fetchall()
-        return [dict(zip([column[0] for column in cursor.description], row)) for row in rows]
+        results = row_dicts(cursor, rows)
+        set_next_cursor(response, results, "uid", limit)
+        return results
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
@@ -52,7 +57,8 @@ async def get_all_logins(skip: int = 0, limit: int = 100):
 
 # ✅ Read One
 @router.get("/{uid}", response_model=Login)
-async def get_login(uid: int):
+@run_in_db_executor
+def get_login(uid: int):
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
@@ -70,42 +76,21 @@ async def get_login(uid: int):
 
 
 # ✅ Update
-@router.put("/{uid}", response_model=Login)
-async def update_login(uid: int, user: LoginUpdate):
+def _update_login(uid: int, fields: dict):
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute("SELECT uid FROM Tbl_login WHERE uid = ?", uid)
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="User not found")
-
-        update_fields = []
-        params = []
-
-        if user.Username is not None:
-            update_fields.append("Username = ?")
-            params.append(user.Username)
-        if user.Password is not None:
-            update_fields.append("Password = ?")
-            params.append(user.Password)
-        if user.Role is not None:
-            update_fields.append("Role = ?")
-            params.append(user.Role)
-
-        if not update_fields:
+        if not fields:
             raise HTTPException(status_code=400, detail="No fields to update")
 
-        params.append(uid)
-        query = f"UPDATE Tbl_login SET {', '.join(update_fields)} WHERE uid = ?"
-        cursor.execute(query, params)
-        conn.commit()
+        row = update_returning(cursor, "Tbl_login", "uid", uid, fields)
+        if not row:
+            raise HTTPException(status_code=404, detail="User not found")
 
-        cursor.execute("SELECT * FROM Tbl_login WHERE uid = ?", uid)
-        row = cursor.fetchone()
-        if row:
-            return dict(zip([column[0] for column in cursor.description], row))
-        else:
-            raise HTTPException(status_code=404, detail="User not found after update")
+        conn.commit()
+        return row
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
@@ -113,9 +98,22 @@ async def update_login(uid: int, user: LoginUpdate):
         conn.close()
 
 
+@router.put("/{uid}", response_model=Login)
+@run_in_db_executor
+def update_login(uid: int, user: LoginUpdate):
+    return _update_login(uid, user.dict(exclude_none=True))
+
+
+@router.patch("/{uid}", response_model=Login)
+@run_in_db_executor
+def patch_login(uid: int, user: LoginUpdate):
+    return _update_login(uid, user.dict(exclude_unset=True))
+
+
 # ✅ Delete
 @router.delete("/{uid}")
-async def delete_login(uid: int):
+@run_in_db_executor
+def delete_login(uid: int):
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
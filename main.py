@@ -1,5 +1,19 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+import pyodbc
+from database import init_pool, close_pool, get_pool, init_db_executor, shutdown_db_executor, get_db_executor, run_db
+from cache import reference_cache
+from json_utils import FastJSONResponse
+from configuration_service import configuration_service
+from invalidation_bus import invalidation_bus
+from holiday_calendar import holiday_calendar
+from taxslab_index import tax_slab_index
+from leave_index import leave_index
+from leave_coverage import leave_coverage
+from leave_balance import leave_balance
+from leave_stats import leave_stats
 
 # Import routers
 from employees_routes import router as employees_router
@@ -17,9 +31,47 @@ from employee_tax_routes import router as employee_tax_router
 from gazetted_holidays_routes import router as gazetted_holidays_router
 from leave_quota_routes import router as leave_quota_router
 from promotion_routes import router as promotion_router
+from payroll_routes import router as payroll_router
+from leave_balance_routes import router as leave_balance_router
 
 
-app = FastAPI(title="Employee Management API", version="1.0.0")
+# Caches each worker must drop when another worker (or a direct SQL write) changes the table
+CACHE_SUBSCRIPTIONS = {
+    "Employee": [leave_coverage.invalidate, leave_balance.invalidate, leave_stats.invalidate],
+    "EmployeeLeaves": [leave_index.invalidate, leave_coverage.invalidate, leave_balance.invalidate, leave_stats.invalidate],
+    "TaxSlabs": [reference_cache["TaxSlabs"].invalidate, tax_slab_index.invalidate],
+    "LeaveQuota": [reference_cache["LeaveQuota"].invalidate, leave_balance.invalidate_quotas],
+    "GazettedHolidays": [reference_cache["GazettedHolidays"].invalidate, holiday_calendar.invalidate],
+    "Departments": [reference_cache["dbo.Departments"].invalidate],
+    "Configuration": [reference_cache["dbo.Configuration"].invalidate],
+}
+
+for table, callbacks in CACHE_SUBSCRIPTIONS.items():
+    for callback in callbacks:
+        invalidation_bus.subscribe(table, callback)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One connection pool per worker process
+    init_pool()
+    init_db_executor()
+    # Baseline the version counters before anything is cached against them
+    await run_db(invalidation_bus.poll)
+    try:
+        await run_db(configuration_service.load)
+    except pyodbc.Error:
+        pass  # Database not reachable yet; the first read loads the settings instead
+    poller = asyncio.create_task(invalidation_bus.run())
+    yield
+    poller.cancel()
+    shutdown_db_executor()
+    close_pool()
+
+
+app = FastAPI(
+    title="Employee Management API", version="1.0.0", lifespan=lifespan, default_response_class=FastJSONResponse
+)
 
 # Configure CORS middleware
 origins = [
@@ -35,7 +87,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["*"]
+    # Browsers ignore the "*" wildcard on credentialed requests, so headers the front-end reads are named
+    expose_headers=["*", "X-Next-Cursor", "ETag", "Content-Disposition"]
 )
 
 # Include routers
@@ -54,6 +107,8 @@ app.include_router(employee_tax_router)
 app.include_router(gazetted_holidays_router)
 app.include_router(leave_quota_router)
 app.include_router(promotion_router)
+app.include_router(payroll_router)
+app.include_router(leave_balance_router)
 
 
 @app.get("/")
@@ -71,8 +126,10 @@ async def root():
             "employee-tax": "/employee-tax",
             "gazetted-holidays": "/gazetted-holidays",
             "leave-quota": "/leave-quota",
+            "leave-balance": "/leave-balance",
             "promotions": "/promotions",
             "salary-payments": "/salary-payments",
+            "payroll": "/payroll",
             "taxslabs": "/taxslabs",  
             "logins": "/logins",
             "users": "/users",
@@ -80,6 +137,15 @@ async def root():
         }
     }
 
+@app.get("/health/db")
+async def db_health():
+    return {
+        "pool": get_pool().stats(),
+        "executor": get_db_executor().stats(),
+        "cache": reference_cache.stats(),
+        "invalidation": invalidation_bus.stats()
+    }
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
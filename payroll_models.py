@@ -0,0 +1,31 @@
+from pydantic import BaseModel
+from typing import List, Optional
+from datetime import date
+
+class PayrollRunRequest(BaseModel):
+    SalaryYear: int
+    SalaryMonth: str
+    PaymentDate: Optional[date] = None
+    Department: Optional[str] = None
+    DryRun: bool = False
+
+class PayrollLine(BaseModel):
+    EmployeeID: str
+    BasicSalary: float
+    TotalAllowances: float
+    TotalDeductions: float
+    GrossSalary: float
+    TaxAmount: float
+    SlabID: Optional[int] = None
+    NetSalary: float
+
+class PayrollRunResult(BaseModel):
+    SalaryYear: int
+    SalaryMonth: str
+    DryRun: bool
+    EmployeesProcessed: int
+    EmployeesSkipped: int
+    TotalGross: float
+    TotalTax: float
+    TotalNet: float
+    Lines: List[PayrollLine]
@@ -0,0 +1,175 @@
+import calendar
+from datetime import date
+from fastapi import APIRouter, HTTPException
+from database import get_db_connection, run_in_db_executor
+from payroll_models import PayrollRunRequest, PayrollRunResult
+from taxslab_index import tax_slab_index
+
+router = APIRouter(prefix="/payroll", tags=["Payroll"])
+
+# Values in Employee.EmployeeStatus / IsActive columns that switch a row off
+INACTIVE_VALUES = ("0", "N", "NO", "FALSE", "INACTIVE", "RESIGNED", "TERMINATED", "LEFT")
+TAXABLE_VALUES = ("1", "Y", "YES", "TRUE")
+
+_MONTHS = {name.lower(): number for number, name in enumerate(calendar.month_name) if name}
+_MONTHS.update({name.lower(): number for number, name in enumerate(calendar.month_abbr) if name})
+
+_INACTIVE_PLACEHOLDERS = ", ".join("?" for _ in INACTIVE_VALUES)
+
+# Monthly equivalent of each pay component, grouped per employee in SQL
+_COMPONENT_TOTALS_QUERY = """
+SELECT EmployeeID,
+       SUM(Amount / CASE UPPER(COALESCE(Frequency, 'MONTHLY'))
+                        WHEN 'YEARLY' THEN 12 WHEN 'ANNUAL' THEN 12 WHEN 'ANNUALLY' THEN 12
+                        WHEN 'QUARTERLY' THEN 3
+                        ELSE 1 END) AS MonthlyTotal
+FROM {table}
+WHERE UPPER(COALESCE(IsActive, '')) NOT IN ({placeholders})
+GROUP BY EmployeeID
+"""
+
+
+def _month_number(salary_month: str) -> int:
+    value = salary_month.strip().lower()
+    if value.isdigit() and 1 <= int(value) <= 12:
+        return int(value)
+    if value in _MONTHS:
+        return _MONTHS[value]
+    raise HTTPException(status_code=400, detail=f"Invalid SalaryMonth: {salary_month}")
+
+
+def _month_spellings(month: int):
+    # Every way a month may already be stored, so earlier rows still block a second payment
+    return (calendar.month_name[month].upper(), calendar.month_abbr[month].upper(), str(month), f"{month:02d}")
+
+
+def _load_employees(cursor, run: PayrollRunRequest, month: int):
+    spellings = _month_spellings(month)
+    query = f"""
+    SELECT e.EmployeeID, e.BasicSalary, e.ApplyTax,
+           CASE WHEN EXISTS (
+               SELECT 1 FROM dbo.SalaryPayments p WITH (UPDLOCK, HOLDLOCK)
+               WHERE p.EmployeeID = e.EmployeeID AND p.SalaryYear = ?
+                 AND UPPER(LTRIM(RTRIM(p.SalaryMonth))) IN ({', '.join('?' for _ in spellings)})
+           ) THEN 1 ELSE 0 END AS AlreadyPaid
+    FROM Employee e
+    WHERE e.BasicSalary IS NOT NULL
+      AND UPPER(COALESCE(e.EmployeeStatus, '')) NOT IN ({_INACTIVE_PLACEHOLDERS})
+    """
+    params = [run.SalaryYear, *spellings, *INACTIVE_VALUES]
+    if run.Department:
+        query += " AND e.Department = ?"
+        params.append(run.Department)
+    cursor.execute(query + " ORDER BY e.EmployeeID", params)
+    return cursor.fetchall()
+
+
+def _load_component_totals(cursor, table):
+    cursor.execute(_COMPONENT_TOTALS_QUERY.format(table=table, placeholders=_INACTIVE_PLACEHOLDERS), INACTIVE_VALUES)
+    return {row[0]: float(row[1] or 0) for row in cursor.fetchall()}
+
+
+def _find_slab(fiscal_year, annual_income):
+    slab = fiscal_year.lookup(annual_income) if fiscal_year else None
+    if slab is None:
+        return None, 0.0
+    return slab[0], slab[3]
+
+
+def compute_payroll(employee_ids, basic, taxable, allowances, deductions, fiscal_year):
+    # Column-wise arithmetic over the whole run; one list per pay component
+    total_allowances = [round(allowances.get(employee_id, 0.0), 2) for employee_id in employee_ids]
+    total_deductions = [round(deductions.get(employee_id, 0.0), 2) for employee_id in employee_ids]
+    gross = [round(b + a, 2) for b, a in zip(basic, total_allowances)]
+
+    brackets = [_find_slab(fiscal_year, g * 12) if t else (None, 0.0) for g, t in zip(gross, taxable)]
+    slab_ids = [slab_id for slab_id, _ in brackets]
+    tax = [round(g * rate / 100, 2) for g, (_, rate) in zip(gross, brackets)]
+    net = [round(g - d - t, 2) for g, d, t in zip(gross, total_deductions, tax)]
+
+    return [
+        {
+            "EmployeeID": employee_id, "BasicSalary": b, "TotalAllowances": a, "TotalDeductions": d,
+            "GrossSalary": g, "TaxAmount": t, "SlabID": s, "NetSalary": n
+        }
+        for employee_id, b, a, d, g, t, s, n in zip(
+            employee_ids, basic, total_allowances, total_deductions, gross, tax, slab_ids, net
+        )
+    ]
+
+
+def _insert_payroll(cursor, run: PayrollRunRequest, lines, payment_date):
+    cursor.fast_executemany = True
+    cursor.executemany(
+        """
+        INSERT INTO dbo.SalaryPayments
+        (EmployeeID, SalaryYear, SalaryMonth, BasicSalary, TotalAllowances,
+         TotalDeductions, TaxAmount, PaymentDate, SlabID, GrossSalary)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        [
+            (line["EmployeeID"], run.SalaryYear, run.SalaryMonth, line["BasicSalary"], line["TotalAllowances"],
+             line["TotalDeductions"], line["TaxAmount"], payment_date, line["SlabID"], line["GrossSalary"])
+            for line in lines
+        ]
+    )
+
+    tax_rows = [
+        (line["EmployeeID"], run.SalaryYear, run.SalaryMonth, line["SlabID"], line["TaxAmount"])
+        for line in lines if line["TaxAmount"]
+    ]
+    if tax_rows:
+        cursor.executemany(
+            "INSERT INTO EmployeeTax (EmployeeID, SalaryYear, SalaryMonth, SlabID, TaxAmount) VALUES (?, ?, ?, ?, ?)",
+            tax_rows
+        )
+
+
+# ✅ Run monthly payroll
+@router.post("/run", response_model=PayrollRunResult)
+@run_in_db_executor
+def run_payroll(run: PayrollRunRequest):
+    month = _month_number(run.SalaryMonth)
+    # "Jan", "January" and "1" are one period; new rows always store the full month name
+    run.SalaryMonth = calendar.month_name[month]
+    period = date(run.SalaryYear, month, 1)
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        employees = _load_employees(cursor, run, month)
+        pending = [row for row in employees if not row[3]]
+        allowances = _load_component_totals(cursor, "dbo.Allowances")
+        deductions = _load_component_totals(cursor, "dbo.Deductions")
+        fiscal_year = tax_slab_index.for_date(period, cursor)
+
+        lines = compute_payroll(
+            [row[0] for row in pending],
+            [float(row[1]) for row in pending],
+            [(row[2] or "").strip().upper() in TAXABLE_VALUES for row in pending],
+            allowances,
+            deductions,
+            fiscal_year
+        )
+
+        if lines and not run.DryRun:
+            _insert_payroll(cursor, run, lines, run.PaymentDate or date.today())
+            conn.commit()
+
+        return {
+            "SalaryYear": run.SalaryYear,
+            "SalaryMonth": run.SalaryMonth,
+            "DryRun": run.DryRun,
+            "EmployeesProcessed": len(lines),
+            "EmployeesSkipped": len(employees) - len(pending),
+            "TotalGross": round(sum(line["GrossSalary"] for line in lines), 2),
+            "TotalTax": round(sum(line["TaxAmount"] for line in lines), 2),
+            "TotalNet": round(sum(line["NetSalary"] for line in lines), 2),
+            "Lines": lines
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        cursor.close()
+        conn.close()
@@ -1,19 +1,30 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
+from fastapi import APIRouter, HTTPException, Response
+from typing import Dict, List, Optional
 import pyodbc
-from database import get_db_connection
+from datetime import date
+from database import get_db_connection, run_in_db_executor
+from query_utils import (
+    update_returning, build_page_query, set_next_cursor, parse_ids, fetch_by_ids, filter_conditions, parse_sort,
+    row_dicts
+)
+from json_utils import model_response
 from promotion_models import Promotion, PromotionCreate, PromotionUpdate
 
 router = APIRouter(prefix="/promotions", tags=["Promotions"])
 
+# Columns ?sort= accepts besides the primary key
+SORT_COLUMNS = ("EmployeeID", "EffectiveDate", "NewSalary")
+
 # ✅ Create
 @router.post("/", response_model=Promotion)
-async def create_promotion(promotion: PromotionCreate):
+@run_in_db_executor
+def create_promotion(promotion: PromotionCreate):
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
         query = """
         INSERT INTO Promotions (EmployeeID, Title, EffectiveDate, NewSalary, Remarks)
+        OUTPUT INSERTED.*
         VALUES (?, ?, ?, ?, ?)
         """
         cursor.execute(query, (
@@ -23,10 +34,8 @@ async def create_promotion(promotion: PromotionCreate):
             promotion.NewSalary,
             promotion.Remarks
         ))
-        conn.commit()
-
-        cursor.execute("SELECT TOP 1 * FROM Promotions ORDER BY PromotionID DESC")
         row = cursor.fetchone()
+        conn.commit()
         if row:
             return dict(zip([column[0] for column in cursor.description], row))
         raise HTTPException(status_code=500, detail="Failed to insert promotion")
@@ -36,21 +45,49 @@ async def create_promotion(promotion: PromotionCreate):
 
 # ✅ Read All
 @router.get("/", response_model=List[Promotion])
-async def get_all_promotions(skip: int = 0, limit: int = 100):
+@run_in_db_executor
+def get_all_promotions(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[str] = None,
+    sort: Optional[str] = None,
+    employee_id: Optional[str] = None,
+    effective_from: Optional[date] = None,
+    effective_to: Optional[date] = None
+):
+    order = parse_sort(sort, SORT_COLUMNS, "PromotionID")
+    conditions, params = filter_conditions({"EmployeeID": employee_id}, {"EffectiveDate": (effective_from, effective_to)})
+    query, params = build_page_query("Promotions", "PromotionID", skip, limit, after, conditions, params, sort=order)
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        query = "SELECT * FROM Promotions ORDER BY PromotionID OFFSET ? ROWS FETCH NEXT ? ROWS ONLY"
-        cursor.execute(query, (skip, limit))
+        cursor.execute(query, params)
         rows = cursor.fetchall()
-        return [dict(zip([column[0] for column in cursor.description], row)) for row in rows]
+        results = row_dicts(cursor, rows)
+        set_next_cursor(response, results, "PromotionID", limit, order)
+        return model_response(results, List[Promotion], response)
+    finally:
+        cursor.close()
+        conn.close()
+
+# ✅ Read Batch
+@router.get("/batch", response_model=Dict[str, Promotion])
+@run_in_db_executor
+def get_promotions_batch(ids: str):
+    keys = parse_ids(ids, int)
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        return model_response(fetch_by_ids(cursor, "Promotions", "PromotionID", keys), Dict[str, Promotion])
     finally:
         cursor.close()
         conn.close()
 
 # ✅ Read One
 @router.get("/{promotion_id}", response_model=Promotion)
-async def get_promotion(promotion_id: int):
+@run_in_db_executor
+def get_promotion(promotion_id: int):
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
@@ -64,35 +101,37 @@ async def get_promotion(promotion_id: int):
         conn.close()
 
 # ✅ Update
-@router.put("/{promotion_id}", response_model=Promotion)
-async def update_promotion(promotion_id: int, promotion: PromotionUpdate):
+def _update_promotion(promotion_id: int, fields: dict):
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        fields = promotion.dict(exclude_unset=True)
         if not fields:
             raise HTTPException(status_code=400, detail="No fields to update")
 
-        update_fields = ", ".join([f"{key} = ?" for key in fields.keys()])
-        params = list(fields.values())
-        params.append(promotion_id)
+        row = update_returning(cursor, "Promotions", "PromotionID", promotion_id, fields)
+        if not row:
+            raise HTTPException(status_code=404, detail="Promotion not found")
 
-        query = f"UPDATE Promotions SET {update_fields} WHERE PromotionID = ?"
-        cursor.execute(query, params)
         conn.commit()
-
-        cursor.execute("SELECT * FROM Promotions WHERE PromotionID = ?", promotion_id)
-        row = cursor.fetchone()
-        if row:
-            return dict(zip([column[0] for column in cursor.description], row))
-        raise HTTPException(status_code=404, detail="Promotion not found after update")
+        return row
     finally:
         cursor.close()
         conn.close()
 
+@router.put("/{promotion_id}", response_model=Promotion)
+@run_in_db_executor
+def update_promotion(promotion_id: int, promotion: PromotionUpdate):
+    return _update_promotion(promotion_id, promotion.dict(exclude_unset=True))
+
+@router.patch("/{promotion_id}", response_model=Promotion)
+@run_in_db_executor
+def patch_promotion(promotion_id: int, promotion: PromotionUpdate):
+    return _update_promotion(promotion_id, promotion.dict(exclude_unset=True))
+
 # ✅ Delete
 @router.delete("/{promotion_id}")
-async def delete_promotion(promotion_id: int):
+@run_in_db_executor
+def delete_promotion(promotion_id: int):
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
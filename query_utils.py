@@ -0,0 +1,183 @@
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+
+from json_utils import FastJSONResponse, model_response
+
+# Upper bound on ?ids= for batch reads; keeps the IN list under SQL Server's 2100 parameters
+MAX_BATCH_IDS = 1000
+
+
+def update_returning(cursor, table, key_column, key, fields):
+    # Existence check, UPDATE and re-read in one round trip; None when no row matched
+    assignments = ", ".join(f"{column} = ?" for column in fields)
+    cursor.execute(
+        f"UPDATE {table} SET {assignments} OUTPUT INSERTED.* WHERE {key_column} = ?",
+        [*fields.values(), key]
+    )
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    return dict(zip([column[0] for column in cursor.description], row))
+
+
+def row_dicts(cursor, rows):
+    # Column names are read once per result set instead of once per row
+    names = [column[0] for column in cursor.description]
+    return [dict(zip(names, row)) for row in rows]
+
+
+def cursor_value(value):
+    # JSON-safe, order-preserving form of a key, as carried in ?after= cursors
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def encode_cursor(value):
+    if isinstance(value, (list, tuple)):
+        value = [cursor_value(item) for item in value]
+    else:
+        value = cursor_value(value)
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+
+def filter_conditions(equals=None, ranges=None, conditions=None, params=None):
+    # Parameterized WHERE terms for the supplied filters; None means "not filtered"
+    conditions = list(conditions or [])
+    params = list(params or [])
+    for column, value in (equals or {}).items():
+        if value is not None:
+            conditions.append(f"{column} = ?")
+            params.append(value)
+    for column, (low, high) in (ranges or {}).items():
+        if low is not None:
+            conditions.append(f"{column} >= ?")
+            params.append(low)
+        if high is not None:
+            conditions.append(f"{column} <= ?")
+            params.append(high)
+    return conditions, params
+
+
+def parse_sort(sort, allowed, key_column):
+    # ?sort=Column or ?sort=-Column against a whitelist; returns (column, descending)
+    if not sort:
+        return None
+    descending = sort.strip().startswith("-")
+    column = sort.strip().lstrip("+-")
+    if column != key_column and column not in allowed:
+        raise HTTPException(
+            status_code=400, detail=f"Cannot sort by {column}; allowed: {', '.join([key_column, *allowed])}"
+        )
+    return column, descending
+
+
+def _seek_condition(sort_column, key_column, descending, value, key):
+    # Rows after (value, key) in ORDER BY sort_column, key_column; SQL Server puts NULLs first ascending
+    if not descending:
+        if value is None:
+            return f"(({sort_column} IS NULL AND {key_column} > ?) OR {sort_column} IS NOT NULL)", [key]
+        return f"({sort_column} > ? OR ({sort_column} = ? AND {key_column} > ?))", [value, value, key]
+    if value is None:
+        return f"({sort_column} IS NULL AND {key_column} < ?)", [key]
+    return f"({sort_column} < ? OR ({sort_column} = ? AND {key_column} < ?) OR {sort_column} IS NULL)", [value, value, key]
+
+
+def build_page_query(table, key_column, skip, limit, after=None, conditions=None, params=None, columns=None, sort=None):
+    # Keyset mode seeks past the cursor on the sort and key columns, so every page costs the same
+    conditions = list(conditions or [])
+    params = list(params or [])
+    sort_column, descending = sort or (key_column, False)
+
+    if after is not None:
+        position = decode_cursor(after)
+        if sort_column == key_column:
+            conditions.append(f"{key_column} {'<' if descending else '>'} ?")
+            params.append(position)
+        else:
+            if not isinstance(position, list) or len(position) != 2:
+                raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+            condition, seek_params = _seek_condition(sort_column, key_column, descending, *position)
+            conditions.append(condition)
+            params.extend(seek_params)
+        skip = 0
+
+    if columns and sort_column not in columns:
+        columns = [*columns, sort_column]
+    direction = " DESC" if descending else ""
+    order_by = f"{sort_column}{direction}" if sort_column == key_column else f"{sort_column}{direction}, {key_column}{direction}"
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    query = f"SELECT {select_list(columns)} FROM {table}{where} ORDER BY {order_by} OFFSET ? ROWS FETCH NEXT ? ROWS ONLY"
+    return query, params + [skip, limit]
+
+
+def set_next_cursor(response, rows, key_column, limit, sort=None):
+    if rows and len(rows) == limit:
+        last = rows[-1]
+        if sort and sort[0] != key_column:
+            response.headers["X-Next-Cursor"] = encode_cursor([last[sort[0]], last[key_column]])
+        else:
+            response.headers["X-Next-Cursor"] = encode_cursor(last[key_column])
+
+
+def parse_fields(fields, model, key_column):
+    # Validated column projection for ?fields=; the key column is always included
+    if not fields:
+        return None
+    requested = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in requested if name not in model.model_fields]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return [key_column] + [name for name in dict.fromkeys(requested) if name != key_column]
+
+
+def parse_ids(ids, cast=str):
+    # Comma-separated ?ids= for batch reads, de-duplicated in request order
+    values = [value.strip() for value in ids.split(",") if value.strip()]
+    if not values:
+        raise HTTPException(status_code=400, detail="No IDs supplied")
+    if len(values) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_IDS} IDs per request")
+    try:
+        return list(dict.fromkeys(cast(value) for value in values))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid ID in ids")
+
+
+def fetch_by_ids(cursor, table, key_column, ids, columns=None):
+    # One IN (...) lookup for a batch of keys; missing keys are simply absent from the map
+    placeholders = ", ".join("?" for _ in ids)
+    cursor.execute(f"SELECT {select_list(columns)} FROM {table} WHERE {key_column} IN ({placeholders})", ids)
+    return {str(row[key_column]): row for row in row_dicts(cursor, cursor.fetchall())}
+
+
+def select_list(columns):
+    return ", ".join(columns) if columns else "*"
+
+
+def shape_response(content, columns, response=None, model=None):
+    # Projected rows are partial models, so they bypass response_model validation;
+    # full rows go through the model's prebuilt TypeAdapter when one is given
+    if not columns:
+        return content if model is None else model_response(content, model, response)
+    shaped = FastJSONResponse(jsonable_encoder(content))
+    if response is not None:
+        for name, value in response.headers.items():
+            if name != "content-length":
+                shaped.headers[name] = value
+    return shaped
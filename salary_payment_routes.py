@@ -1,14 +1,24 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
+from fastapi import APIRouter, HTTPException, Query, Response
+from typing import Dict, List, Optional
 import pyodbc
-from database import get_db_connection
+from datetime import date
+from database import get_db_connection, run_in_db_executor
+from export_utils import export_response, EXPORT_FORMAT_PATTERN
+from query_utils import (
+    update_returning, build_page_query, set_next_cursor, parse_fields, select_list, shape_response,
+    parse_ids, fetch_by_ids, filter_conditions, parse_sort, row_dicts
+)
 from salary_payment_models import SalaryPayment, SalaryPaymentCreate, SalaryPaymentUpdate
 
 router = APIRouter(prefix="/salary-payments", tags=["Salary Payments"])
 
+# Columns ?sort= accepts besides the primary key
+SORT_COLUMNS = ("EmployeeID", "SalaryYear", "PaymentDate", "GrossSalary", "TaxAmount")
+
 # Create
 @router.post("/", response_model=SalaryPayment)
-async def create_salary_payment(payment: SalaryPaymentCreate):
+@run_in_db_executor
+def create_salary_payment(payment: SalaryPaymentCreate):
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
@@ -16,6 +26,7 @@ async def create_salary_payment(payment: SalaryPaymentCreate):
         INSERT INTO dbo.SalaryPayments
         (EmployeeID, SalaryYear, SalaryMonth, BasicSalary, TotalAllowances, 
          TotalDeductions, TaxAmount, PaymentDate, SlabID, GrossSalary)
+        OUTPUT INSERTED.*
         VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """
         cursor.execute(query, (
@@ -30,10 +41,8 @@ async def create_salary_payment(payment: SalaryPaymentCreate):
             payment.SlabID,
             payment.GrossSalary
         ))
-        conn.commit()
-
-        cursor.execute("SELECT TOP 1 * FROM dbo.SalaryPayments ORDER BY PaymentID DESC")
         row = cursor.fetchone()
+        conn.commit()
         if row:
             return dict(zip([column[0] for column in cursor.description], row))
         raise HTTPException(status_code=500, detail="Failed to create salary payment")
@@ -46,17 +55,71 @@ async def create_salary_payment(payment: SalaryPaymentCreate):
 
 # Read all
 @router.get("/", response_model=List[SalaryPayment])
-async def get_all_salary_payments(skip: int = 0, limit: int = 100):
+@run_in_db_executor
+def get_all_salary_payments(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[str] = None,
+    fields: Optional[str] = None,
+    sort: Optional[str] = None,
+    employee_id: Optional[str] = None,
+    salary_year: Optional[int] = None,
+    salary_month: Optional[str] = None,
+    paid_from: Optional[date] = None,
+    paid_to: Optional[date] = None
+):
+    columns = parse_fields(fields, SalaryPayment, "PaymentID")
+    order = parse_sort(sort, SORT_COLUMNS, "PaymentID")
+    conditions, params = filter_conditions(
+        {"EmployeeID": employee_id, "SalaryYear": salary_year, "SalaryMonth": salary_month},
+        {"PaymentDate": (paid_from, paid_to)}
+    )
+    query, params = build_page_query("dbo.SalaryPayments", "PaymentID", skip, limit, after, conditions, params, columns, order)
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute(f"""
-            SELECT * FROM dbo.SalaryPayments
-            ORDER BY PaymentID
-            OFFSET {skip} ROWS FETCH NEXT {limit} ROWS ONLY
-        """)
+        cursor.execute(query, params)
         rows = cursor.fetchall()
-        return [dict(zip([column[0] for column in cursor.description], row)) for row in rows]
+        results = row_dicts(cursor, rows)
+        set_next_cursor(response, results, "PaymentID", limit, order)
+        return shape_response(results, columns, response, List[SalaryPayment])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        cursor.close()
+        conn.close()
+
+
+# Export
+@router.get("/export")
+async def export_salary_payments(
+    fmt: str = Query("ndjson", alias="format", pattern=EXPORT_FORMAT_PATTERN),
+    salary_year: Optional[int] = None,
+    salary_month: Optional[str] = None
+):
+    conditions = []
+    params = []
+    if salary_year is not None:
+        conditions.append("SalaryYear = ?")
+        params.append(salary_year)
+    if salary_month:
+        conditions.append("SalaryMonth = ?")
+        params.append(salary_month)
+    return export_response("dbo.SalaryPayments", "PaymentID", fmt, "salary_payments", conditions, params)
+
+
+# Read batch
+@router.get("/batch", response_model=Dict[str, SalaryPayment])
+@run_in_db_executor
+def get_salary_payments_batch(ids: str, fields: Optional[str] = None):
+    keys = parse_ids(ids, int)
+    columns = parse_fields(fields, SalaryPayment, "PaymentID")
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        rows = fetch_by_ids(cursor, "dbo.SalaryPayments", "PaymentID", keys, columns)
+        return shape_response(rows, columns, model=Dict[str, SalaryPayment])
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
@@ -66,14 +129,16 @@ async def get_all_salary_payments(skip: int = 0, limit: int = 100):
 
 # Read single
 @router.get("/{payment_id}", response_model=SalaryPayment)
-async def get_salary_payment(payment_id: int):
+@run_in_db_executor
+def get_salary_payment(payment_id: int, fields: Optional[str] = None):
+    columns = parse_fields(fields, SalaryPayment, "PaymentID")
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute("SELECT * FROM dbo.SalaryPayments WHERE PaymentID = ?", payment_id)
+        cursor.execute(f"SELECT {select_list(columns)} FROM dbo.SalaryPayments WHERE PaymentID = ?", payment_id)
         row = cursor.fetchone()
         if row:
-            return dict(zip([column[0] for column in cursor.description], row))
+            return shape_response(dict(zip([column[0] for column in cursor.description], row)), columns)
         raise HTTPException(status_code=404, detail="Salary payment not found")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -83,35 +148,21 @@ async def get_salary_payment(payment_id: int):
 
 
 # Update
-@router.put("/{payment_id}", response_model=SalaryPayment)
-async def update_salary_payment(payment_id: int, payment: SalaryPaymentUpdate):
+def _update_salary_payment(payment_id: int, fields: dict):
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute("SELECT PaymentID FROM dbo.SalaryPayments WHERE PaymentID = ?", payment_id)
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="Salary payment not found")
-
-        update_fields = []
-        params = []
-
-        for field, value in payment.dict(exclude_unset=True).items():
-            update_fields.append(f"{field} = ?")
-            params.append(value)
-
-        if not update_fields:
+        if not fields:
             raise HTTPException(status_code=400, detail="No fields to update")
 
-        params.append(payment_id)
-        query = f"UPDATE dbo.SalaryPayments SET {', '.join(update_fields)} WHERE PaymentID = ?"
-        cursor.execute(query, params)
-        conn.commit()
+        row = update_returning(cursor, "dbo.SalaryPayments", "PaymentID", payment_id, fields)
+        if not row:
+            raise HTTPException(status_code=404, detail="Salary payment not found")
 
-        cursor.execute("SELECT * FROM dbo.SalaryPayments WHERE PaymentID = ?", payment_id)
-        row = cursor.fetchone()
-        if row:
-            return dict(zip([column[0] for column in cursor.description], row))
-        raise HTTPException(status_code=404, detail="Salary payment not found after update")
+        conn.commit()
+        return row
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
@@ -119,9 +170,22 @@ async def update_salary_payment(payment_id: int, payment: SalaryPaymentUpdate):
         conn.close()
 
 
+@router.put("/{payment_id}", response_model=SalaryPayment)
+@run_in_db_executor
+def update_salary_payment(payment_id: int, payment: SalaryPaymentUpdate):
+    return _update_salary_payment(payment_id, payment.dict(exclude_unset=True))
+
+
+@router.patch("/{payment_id}", response_model=SalaryPayment)
+@run_in_db_executor
+def patch_salary_payment(payment_id: int, payment: SalaryPaymentUpdate):
+    return _update_salary_payment(payment_id, payment.dict(exclude_unset=True))
+
+
 # Delete
 @router.delete("/{payment_id}")
-async def delete_salary_payment(payment_id: int):
+@run_in_db_executor
+def delete_salary_payment(payment_id: int):
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
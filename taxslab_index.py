@@ -0,0 +1,98 @@
+import threading
+from bisect import bisect_right
+from datetime import date
+from typing import List, Optional, Tuple
+
+from database import get_db_connection
+
+
+class FiscalYearSlabs:
+    """Slabs of one fiscal year, sorted by LowerLimit for O(log n) bracket lookup."""
+
+    def __init__(self, start: date, end: date, slabs: List[Tuple[int, float, Optional[float], float]]):
+        self.start = start
+        self.end = end
+        self.slabs = sorted(slabs, key=lambda slab: slab[1])
+        self.lower_limits = [slab[1] for slab in self.slabs]
+
+    def lookup(self, annual_income: float):
+        # Covering slab is the last one starting at or below the income (gaps between limits fall down)
+        position = bisect_right(self.lower_limits, annual_income) - 1
+        if position < 0:
+            return None
+        return self.slabs[position]
+
+
+class TaxSlabIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None  # (fiscal years sorted by start, their start dates)
+        self._generation = 0
+
+    def invalidate(self):
+        with self._lock:
+            self._snapshot = None
+            self._generation += 1
+
+    def _load(self, cursor):
+        cursor.execute(
+            "SELECT SlabID, FiscalYearStart, FiscalYearEnd, LowerLimit, UpperLimit, TaxRate "
+            "FROM TaxSlabs ORDER BY FiscalYearStart, LowerLimit"
+        )
+        grouped = {}
+        for slab_id, start, end, lower, upper, rate in cursor.fetchall():
+            if start is None or end is None:
+                continue
+            grouped.setdefault((start, end), []).append(
+                (slab_id, float(lower or 0), None if upper is None else float(upper), float(rate or 0))
+            )
+        years = [FiscalYearSlabs(start, end, slabs) for (start, end), slabs in sorted(grouped.items())]
+        return years, [year.start for year in years]
+
+    def _ensure_loaded(self, cursor=None):
+        with self._lock:
+            if self._snapshot is not None:
+                return self._snapshot
+            generation = self._generation
+
+        if cursor is not None:
+            snapshot = self._load(cursor)
+        else:
+            conn = get_db_connection()
+            own_cursor = conn.cursor()
+            try:
+                snapshot = self._load(own_cursor)
+            finally:
+                own_cursor.close()
+                conn.close()
+
+        with self._lock:
+            # A write that landed while we were loading wins; don't cache what may be stale
+            if generation == self._generation:
+                self._snapshot = snapshot
+        return snapshot
+
+    def for_date(self, on_date: date, cursor=None) -> Optional[FiscalYearSlabs]:
+        years, starts = self._ensure_loaded(cursor)
+        position = bisect_right(starts, on_date) - 1
+        if position < 0 or years[position].end < on_date:
+            return None
+        return years[position]
+
+
+tax_slab_index = TaxSlabIndex()
+
+
+def compute_tax(fiscal_year: Optional[FiscalYearSlabs], annual_income: float):
+    slab = fiscal_year.lookup(annual_income) if fiscal_year else None
+    if slab is None:
+        return {"AnnualIncome": annual_income, "SlabID": None, "TaxRate": 0.0, "AnnualTax": 0.0, "MonthlyTax": 0.0}
+    slab_id, _, _, rate = slab
+    annual_tax = round(annual_income * rate / 100, 2)
+    return {
+        "AnnualIncome": annual_income,
+        "SlabID": slab_id,
+        "TaxRate": rate,
+        "AnnualTax": annual_tax,
+        "MonthlyTax": round(annual_tax / 12, 2)
+    }
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import date
 
 class TaxSlabBase(BaseModel):
@@ -20,3 +20,14 @@ class TaxSlab(TaxSlabBase):
 
     class Config:
         from_attributes = True
+
+class TaxComputeRequest(BaseModel):
+    Incomes: List[float]
+    OnDate: Optional[date] = None
+
+class TaxComputation(BaseModel):
+    AnnualIncome: float
+    SlabID: Optional[int] = None
+    TaxRate: float
+    AnnualTax: float
+    MonthlyTax: float
@@ -1,29 +1,39 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
+from fastapi import APIRouter, HTTPException, Response
+from typing import List, Optional
+from datetime import date
 import pyodbc
-from database import get_db_connection
-from taxslab_models import TaxSlab, TaxSlabCreate, TaxSlabUpdate
+from database import get_db_connection, run_in_db_executor
+from invalidation_bus import invalidation_bus
+from query_utils import update_returning, set_next_cursor
+from cache import reference_cache
+from taxslab_models import TaxSlab, TaxSlabCreate, TaxSlabUpdate, TaxComputeRequest, TaxComputation
+from taxslab_index import tax_slab_index, compute_tax
 
 router = APIRouter(prefix="/taxslabs", tags=["TaxSlabs"])
 
+taxslab_cache = reference_cache["TaxSlabs"]
+
 # ✅ Create
 @router.post("/", response_model=TaxSlab)
-async def create_taxslab(taxslab: TaxSlabCreate):
+@run_in_db_executor
+def create_taxslab(taxslab: TaxSlabCreate):
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
         query = """
         INSERT INTO TaxSlabs (FiscalYearStart, FiscalYearEnd, LowerLimit, UpperLimit, TaxRate)
+        OUTPUT INSERTED.*
         VALUES (?, ?, ?, ?, ?)
         """
         cursor.execute(query, (
             taxslab.FiscalYearStart, taxslab.FiscalYearEnd,
             taxslab.LowerLimit, taxslab.UpperLimit, taxslab.TaxRate
         ))
-        conn.commit()
-
-        cursor.execute("SELECT * FROM TaxSlabs WHERE SlabID = @@IDENTITY")
         row = cursor.fetchone()
+        conn.commit()
+        taxslab_cache.invalidate()
+        tax_slab_index.invalidate()
+        invalidation_bus.publish("TaxSlabs", conn)
         if row:
             return dict(zip([column[0] for column in cursor.description], row))
         else:
@@ -37,82 +47,72 @@ async def create_taxslab(taxslab: TaxSlabCreate):
 
 # ✅ Read All
 @router.get("/", response_model=List[TaxSlab])
-async def get_all_taxslabs(skip: int = 0, limit: int = 100):
-    conn = get_db_connection()
-    cursor = conn.cursor()
+@run_in_db_executor
+def get_all_taxslabs(response: Response, skip: int = 0, limit: int = 100, after: Optional[str] = None):
     try:
-        cursor.execute(f"SELECT * FROM TaxSlabs ORDER BY SlabID OFFSET {skip} ROWS FETCH NEXT {limit} ROWS ONLY")
-        rows = cursor.fetchall()
-        return [dict(zip([column[0] for column in cursor.description], row)) for row in rows]
+        results = taxslab_cache.page(skip, limit, after)
+        set_next_cursor(response, results, "SlabID", limit)
+        return results
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# ✅ Compute tax (single income)
+@router.get("/compute", response_model=TaxComputation)
+@run_in_db_executor
+def compute_taxslab(income: float, on_date: Optional[date] = None):
+    try:
+        fiscal_year = tax_slab_index.for_date(on_date or date.today())
+        return compute_tax(fiscal_year, income)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# ✅ Compute tax (batch of incomes)
+@router.post("/compute", response_model=List[TaxComputation])
+@run_in_db_executor
+def compute_taxslab_batch(request: TaxComputeRequest):
+    try:
+        fiscal_year = tax_slab_index.for_date(request.OnDate or date.today())
+        return [compute_tax(fiscal_year, income) for income in request.Incomes]
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        cursor.close()
-        conn.close()
 
 
 # ✅ Read One
 @router.get("/{slab_id}", response_model=TaxSlab)
-async def get_taxslab(slab_id: int):
-    conn = get_db_connection()
-    cursor = conn.cursor()
+@run_in_db_executor
+def get_taxslab(slab_id: int):
     try:
-        cursor.execute("SELECT * FROM TaxSlabs WHERE SlabID = ?", slab_id)
-        row = cursor.fetchone()
-        if row:
-            return dict(zip([column[0] for column in cursor.description], row))
-        else:
-            raise HTTPException(status_code=404, detail="Tax slab not found")
+        row = taxslab_cache.get(slab_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        cursor.close()
-        conn.close()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Tax slab not found")
+    return row
 
 
 # ✅ Update
-@router.put("/{slab_id}", response_model=TaxSlab)
-async def update_taxslab(slab_id: int, taxslab: TaxSlabUpdate):
+def _update_taxslab(slab_id: int, fields: dict):
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute("SELECT SlabID FROM TaxSlabs WHERE SlabID = ?", slab_id)
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="Tax slab not found")
-
-        update_fields = []
-        params = []
-
-        if taxslab.FiscalYearStart is not None:
-            update_fields.append("FiscalYearStart = ?")
-            params.append(taxslab.FiscalYearStart)
-        if taxslab.FiscalYearEnd is not None:
-            update_fields.append("FiscalYearEnd = ?")
-            params.append(taxslab.FiscalYearEnd)
-        if taxslab.LowerLimit is not None:
-            update_fields.append("LowerLimit = ?")
-            params.append(taxslab.LowerLimit)
-        if taxslab.UpperLimit is not None:
-            update_fields.append("UpperLimit = ?")
-            params.append(taxslab.UpperLimit)
-        if taxslab.TaxRate is not None:
-            update_fields.append("TaxRate = ?")
-            params.append(taxslab.TaxRate)
-
-        if not update_fields:
+        if not fields:
             raise HTTPException(status_code=400, detail="No fields to update")
 
-        params.append(slab_id)
-        query = f"UPDATE TaxSlabs SET {', '.join(update_fields)} WHERE SlabID = ?"
-        cursor.execute(query, params)
-        conn.commit()
+        row = update_returning(cursor, "TaxSlabs", "SlabID", slab_id, fields)
+        if not row:
+            raise HTTPException(status_code=404, detail="Tax slab not found")
 
-        cursor.execute("SELECT * FROM TaxSlabs WHERE SlabID = ?", slab_id)
-        row = cursor.fetchone()
-        if row:
-            return dict(zip([column[0] for column in cursor.description], row))
-        else:
-            raise HTTPException(status_code=404, detail="Tax slab not found after update")
+        conn.commit()
+        taxslab_cache.invalidate()
+        tax_slab_index.invalidate()
+        invalidation_bus.publish("TaxSlabs", conn)
+        return row
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
@@ -120,14 +120,30 @@ async def update_taxslab(slab_id: int, taxslab: TaxSlabUpdate):
         conn.close()
 
 
+@router.put("/{slab_id}", response_model=TaxSlab)
+@run_in_db_executor
+def update_taxslab(slab_id: int, taxslab: TaxSlabUpdate):
+    return _update_taxslab(slab_id, taxslab.dict(exclude_none=True))
+
+
+@router.patch("/{slab_id}", response_model=TaxSlab)
+@run_in_db_executor
+def patch_taxslab(slab_id: int, taxslab: TaxSlabUpdate):
+    return _update_taxslab(slab_id, taxslab.dict(exclude_unset=True))
+
+
 # ✅ Delete
 @router.delete("/{slab_id}")
-async def delete_taxslab(slab_id: int):
+@run_in_db_executor
+def delete_taxslab(slab_id: int):
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
         cursor.execute("DELETE FROM TaxSlabs WHERE SlabID = ?", slab_id)
         conn.commit()
+        taxslab_cache.invalidate()
+        tax_slab_index.invalidate()
+        invalidation_bus.publish("TaxSlabs", conn)
         if cursor.rowcount == 0:
             raise HTTPException(status_code=404, detail="Tax slab not found")
         return {"message": "Tax slab deleted successfully"}
@@ -0,0 +1,51 @@
+from datetime import date, datetime
+
+import pytest
+from fastapi import HTTPException
+
+from cache import TableCache
+from query_utils import encode_cursor
+
+
+class FakeCursor:
+    description = [("DepartmentID",), ("DepartmentName",)]
+
+    def execute(self, query, *params):
+        pass
+
+    def fetchall(self):
+        return [(1, "Accounts"), (2, "Admin"), (3, "IT")]
+
+
+def test_page_seeks_past_the_cursor():
+    cache = TableCache("dbo.Departments", "DepartmentID")
+
+    rows = cache.page(0, 10, encode_cursor(1), cursor=FakeCursor())
+
+    assert [row["DepartmentID"] for row in rows] == [2, 3]
+
+
+def test_page_rejects_a_cursor_of_the_wrong_type():
+    cache = TableCache("dbo.Departments", "DepartmentID")
+
+    with pytest.raises(HTTPException) as error:
+        cache.page(0, 10, encode_cursor("2024-01-01"), cursor=FakeCursor())
+
+    assert error.value.status_code == 400
+
+
+class HolidayCursor:
+    description = [("HolidayDate",), ("Description",)]
+
+    def execute(self, query, *params):
+        pass
+
+    def fetchall(self):
+        return [(datetime(2024, 8, 14), "Independence Day")]
+
+
+def test_get_matches_datetime_keys_by_date():
+    cache = TableCache("GazettedHolidays", "HolidayDate")
+
+    assert cache.get("2024-08-14", cursor=HolidayCursor())["Description"] == "Independence Day"
+    assert cache.get(date(2024, 8, 14), cursor=HolidayCursor())["Description"] == "Independence Day"
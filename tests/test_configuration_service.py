@@ -0,0 +1,30 @@
+import pytest
+
+from configuration_service import ConfigurationSnapshot
+
+
+def _snapshot(**values):
+    return ConfigurationSnapshot(
+        [{"UID": uid, "ConfigKey": key, "ConfigValue": value} for uid, (key, value) in enumerate(values.items())]
+    )
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("1", True), ("0", False), (" 1 ", True),
+    ("true", True), ("False", False), ("yes", True), ("NO", False), ("on", True), ("off", False),
+])
+def test_get_bool_accepts_bit_and_word_values(raw, expected):
+    assert _snapshot(Flag=raw).get_bool("Flag", default=None) is expected
+
+
+@pytest.mark.parametrize("raw", ["2", "-1", "1.0", "maybe", None])
+def test_get_bool_falls_back_to_default(raw):
+    assert _snapshot(Flag=raw).get_bool("Flag", default="unset") == "unset"
+
+
+def test_get_bool_missing_key_returns_default():
+    assert _snapshot().get_bool("Flag", default=True) is True
+
+
+def test_bit_values_stay_ints_for_get_int():
+    assert _snapshot(Limit="1").get_int("Limit") == 1
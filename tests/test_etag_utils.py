@@ -0,0 +1,119 @@
+from datetime import date
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+import leaves_routes
+from etag_utils import etag_for, require_match
+
+LEAVE = {
+    "uid": 7, "EmployeeID": "E1", "LeaveTypeName": "Annual", "StartDate": date(2024, 3, 4),
+    "EndDate": date(2024, 3, 5), "TotalDays": 2.0, "Status": "Approved"
+}
+
+
+class FakeCursor:
+    def execute(self, query, *params):
+        # SELECT * or SELECT <column list>, as built by select_list()
+        selected = query.split("SELECT", 1)[1].split("FROM", 1)[0].strip()
+        columns = list(LEAVE) if selected == "*" else [column.strip() for column in selected.split(",")]
+        self.description = [(column,) for column in columns]
+        self.row = tuple(LEAVE[column] for column in columns)
+
+    def fetchone(self):
+        return self.row
+
+    def fetchall(self):
+        return [self.row]
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def cursor(self):
+        return FakeCursor()
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(leaves_routes, "get_db_connection", FakeConnection)
+    app = FastAPI()
+    app.include_router(leaves_routes.router)
+    return TestClient(app)
+
+
+def test_matching_if_none_match_returns_304(client):
+    etag = client.get("/leaves/7").headers["ETag"]
+
+    response = client.get("/leaves/7", headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["ETag"] == etag
+
+
+def test_stale_if_none_match_returns_the_row(client):
+    response = client.get("/leaves/7", headers={"If-None-Match": '"stale"'})
+
+    assert response.status_code == 200
+    assert response.json()["uid"] == 7
+
+
+def test_projection_is_tagged_weak_and_still_revalidates(client):
+    etag = client.get("/leaves/7", params={"fields": "Status"}).headers["ETag"]
+
+    assert etag.startswith("W/")
+    assert client.get("/leaves/7", params={"fields": "Status"}, headers={"If-None-Match": etag}).status_code == 304
+
+
+def test_full_row_etag_round_trips_through_if_match(client):
+    etag = client.get("/leaves/7").headers["ETag"]
+
+    require_match(FakeCursor(), "EmployeeLeaves", "uid", 7, etag)
+
+
+def test_stale_if_match_returns_412(client):
+    response = client.patch("/leaves/7", json={"Status": "Rejected"}, headers={"If-Match": '"stale"'})
+
+    assert response.status_code == 412
+
+
+def test_projection_etag_is_refused_by_if_match(client):
+    etag = client.get("/leaves/7", params={"fields": "Status"}).headers["ETag"]
+
+    with pytest.raises(HTTPException) as error:
+        require_match(FakeCursor(), "EmployeeLeaves", "uid", 7, etag)
+
+    assert error.value.status_code == 412
+
+
+def test_list_is_tagged_from_its_body_and_revalidates(client):
+    first = client.get("/leaves/")
+    etag = first.headers["ETag"]
+
+    response = client.get("/leaves/", headers={"If-None-Match": etag})
+
+    assert first.json()[0]["uid"] == 7
+    assert response.status_code == 304
+    assert response.content == b""
+
+
+def test_projected_list_is_tagged_weak(client):
+    response = client.get("/leaves/", params={"fields": "Status"})
+
+    assert response.headers["ETag"].startswith("W/")
+    assert response.json() == [{"uid": 7, "Status": "Approved"}]
+
+
+def test_etag_for_is_stable_and_ignores_key_order():
+    reordered = dict(reversed(list(LEAVE.items())))
+
+    assert etag_for(LEAVE) == etag_for(dict(LEAVE))
+    assert etag_for(reordered) == etag_for(LEAVE)
+    assert etag_for({**LEAVE, "Status": "Rejected"}) != etag_for(LEAVE)
+    assert etag_for(LEAVE).startswith('"') and etag_for(LEAVE).endswith('"')
@@ -0,0 +1,73 @@
+import asyncio
+import threading
+
+import export_utils
+
+
+class SlowCursor:
+    description = [("uid",), ("EmployeeID",)]
+
+    def __init__(self, log, release):
+        self.log = log
+        self.release = release
+
+    def execute(self, query, params):
+        pass
+
+    def fetchmany(self, size):
+        self.log.append("fetch started")
+        self.release.wait(5)
+        self.log.append("fetch finished")
+        return [(1, "E1")]
+
+    def close(self):
+        self.log.append(("cursor closed", threading.current_thread().name))
+
+
+class FakeConnection:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def cursor(self):
+        return self._cursor
+
+    def close(self):
+        self._cursor.log.append("connection closed")
+
+
+def test_disconnect_waits_for_the_running_fetch_before_releasing(monkeypatch):
+    log, release = [], threading.Event()
+    monkeypatch.setattr(export_utils, "get_db_connection", lambda: FakeConnection(SlowCursor(log, release)))
+
+    async def disconnect_mid_fetch():
+        rows = export_utils._stream_rows("SELECT * FROM Employee", [], "ndjson")
+        consumer = asyncio.ensure_future(rows.__anext__())
+        while "fetch started" not in log:
+            await asyncio.sleep(0.01)
+        consumer.cancel()
+        await asyncio.sleep(0.05)
+        # Still fetching: nothing may be closed underneath it
+        assert log == ["fetch started"]
+        release.set()
+        await asyncio.gather(*export_utils._cleanups)
+
+    asyncio.run(disconnect_mid_fetch())
+
+    assert log[:2] == ["fetch started", "fetch finished"]
+    assert log[2][0] == "cursor closed" and log[2][1].startswith("db")
+    assert log[3] == "connection closed"
+
+
+def test_export_streams_rows_and_releases_the_connection(monkeypatch):
+    log, release = [], threading.Event()
+    release.set()
+    cursor = SlowCursor(log, release)
+    batches = iter([[(1, "E1")], []])
+    cursor.fetchmany = lambda size: next(batches)
+    monkeypatch.setattr(export_utils, "get_db_connection", lambda: FakeConnection(cursor))
+
+    async def collect():
+        return [chunk async for chunk in export_utils._stream_rows("SELECT * FROM Employee", [], "csv")]
+
+    assert asyncio.run(collect()) == ["uid,EmployeeID\r\n", "1,E1\r\n"]
+    assert log[-1] == "connection closed"
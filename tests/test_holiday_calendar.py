@@ -0,0 +1,43 @@
+from datetime import date
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import gazetted_holidays_routes
+from holiday_calendar import HolidayCalendar
+
+
+class FakeCursor:
+    def execute(self, query, *params):
+        pass
+
+    def fetchall(self):
+        return [(date(2024, 8, 14),)]
+
+
+def test_working_days_skip_weekends_and_holidays():
+    calendar = HolidayCalendar()
+
+    # Mon 12 Aug .. Sun 18 Aug 2024, with Wednesday 14 Aug a holiday
+    assert calendar.working_days(date(2024, 8, 12), date(2024, 8, 18), FakeCursor()) == 4
+
+
+def test_year_calendars_are_bounded():
+    calendar = HolidayCalendar(max_years=3)
+
+    calendar.working_days(date(2000, 1, 1), date(2009, 12, 31), FakeCursor())
+    calendar.working_days(date(2008, 6, 1), date(2008, 6, 30), FakeCursor())
+
+    # 2008 was just used again, so 2007 is next to go
+    assert list(calendar._years) == [2007, 2009, 2008]
+
+
+def test_working_days_rejects_unbounded_ranges():
+    app = FastAPI()
+    app.include_router(gazetted_holidays_routes.router)
+
+    response = TestClient(app).get(
+        "/gazetted-holidays/working-days", params={"start_date": "0001-01-01", "end_date": "9999-12-31"}
+    )
+
+    assert response.status_code == 400
@@ -0,0 +1,135 @@
+import io
+import re
+import sqlite3
+
+import pyodbc
+import pytest
+
+import import_utils
+from allowance_models import AllowanceCreate
+
+SCHEMA = """
+CREATE TABLE Employee (EmployeeID TEXT PRIMARY KEY);
+CREATE TABLE Allowances (
+    AllowanceID INTEGER PRIMARY KEY,
+    EmployeeID TEXT NOT NULL REFERENCES Employee (EmployeeID),
+    AllowanceType TEXT NOT NULL,
+    Amount REAL NOT NULL,
+    IsActive TEXT,
+    Frequency TEXT
+);
+INSERT INTO Employee VALUES ('E1'), ('E3');
+"""
+
+# T-SQL the import issues, rewritten to SQLite's spelling of the same thing
+DIALECT = [
+    (re.compile(r"^SELECT TOP 0 (.+) FROM (\w+)$"), r"SELECT \1 FROM \2 LIMIT 0"),
+    (re.compile(r"^SAVE TRANSACTION (\w+)$"), r"SAVEPOINT \1"),
+    (re.compile(r"^ROLLBACK TRANSACTION (\w+)$"), r"ROLLBACK TO \1"),
+]
+
+
+def _sqlite(query):
+    for pattern, replacement in DIALECT:
+        query = pattern.sub(replacement, query)
+    return query
+
+
+class SqliteCursor:
+    def __init__(self, conn):
+        self._cursor = conn.cursor()
+        self.fast_executemany = False
+
+    def execute(self, query, *params):
+        try:
+            self._cursor.execute(_sqlite(query), params[0] if len(params) == 1 else params)
+        except sqlite3.Error as e:
+            raise pyodbc.Error(str(e))
+
+    def executemany(self, query, rows):
+        try:
+            self._cursor.executemany(_sqlite(query), rows)
+        except sqlite3.Error as e:
+            raise pyodbc.Error(str(e))
+
+    def close(self):
+        self._cursor.close()
+
+
+class SqliteConnection:
+    """Pool-like connection: close() rolls back whatever was not committed, as ConnectionPool.release does."""
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA foreign_keys = ON")
+
+    def cursor(self):
+        return SqliteCursor(self._conn)
+
+    def commit(self):
+        self._conn.commit()
+
+    def close(self):
+        self._conn.rollback()
+        self._conn.close()
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    path = str(tmp_path / "payroll.db")
+    with sqlite3.connect(path) as conn:
+        conn.executescript(SCHEMA)
+    monkeypatch.setattr(import_utils, "get_db_connection", lambda: SqliteConnection(path))
+    return path
+
+
+def _import(body):
+    return import_utils._import_file(io.BytesIO(body.encode()), "csv", AllowanceCreate, "Allowances")
+
+
+def _stored(path):
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT EmployeeID, Amount FROM Allowances ORDER BY AllowanceID").fetchall()
+
+
+def test_import_is_committed(database):
+    result = _import("EmployeeID,AllowanceType,Amount\nE1,Fuel,100\nE3,Fuel,200\n")
+
+    assert result == {"Inserted": 2, "Failed": 0, "Errors": []}
+    assert _stored(database) == [("E1", 100.0), ("E3", 200.0)]
+
+
+def test_rejected_row_falls_back_to_row_by_row(database):
+    result = _import("EmployeeID,AllowanceType,Amount\nE1,Fuel,100\nBAD,Fuel,200\nE3,Fuel,300\n")
+
+    assert result["Inserted"] == 2
+    assert result["Failed"] == 1
+    assert [error["Row"] for error in result["Errors"]] == [3]
+    assert result["Errors"][0]["Detail"].startswith("Database error:")
+    # The partial batch was rolled back before the retry, so E1 is stored once
+    assert _stored(database) == [("E1", 100.0), ("E3", 300.0)]
+
+
+def test_failed_import_is_rolled_back(database, monkeypatch):
+    def unreadable_after_first_row(spool):
+        yield ["EmployeeID", "AllowanceType", "Amount"]
+        yield ["E1", "Fuel", "100"]
+        raise UnicodeDecodeError("utf-8", b"\xff", 0, 1, "invalid start byte")
+
+    monkeypatch.setattr(import_utils, "IMPORT_BATCH_SIZE", 1)
+    monkeypatch.setattr(import_utils, "_csv_rows", unreadable_after_first_row)
+
+    # The first batch was already inserted when the file turned out to be unreadable
+    with pytest.raises(UnicodeDecodeError):
+        _import("")
+
+    assert _stored(database) == []
+
+
+def test_invalid_rows_are_reported_without_reaching_the_database(database):
+    result = _import("EmployeeID,AllowanceType,Amount\nE1,Fuel,lots\n")
+
+    assert result["Inserted"] == 0
+    assert result["Failed"] == 1
+    assert result["Errors"][0]["Row"] == 2
+    assert _stored(database) == []
@@ -0,0 +1,113 @@
+import asyncio
+
+import invalidation_bus as bus_module
+from invalidation_bus import InvalidationBus, SqliteVersionSource
+
+
+class PoolTimeoutError(Exception):
+    pass
+
+
+class FlakySource:
+    def __init__(self, versions):
+        self.versions = versions
+
+    def fetch(self):
+        version = self.versions.pop(0)
+        if isinstance(version, Exception):
+            raise version
+        return version
+
+    def bump(self, table, conn=None):
+        raise PoolTimeoutError("no connection available")
+
+
+def test_poll_counts_any_failure_and_keeps_the_baseline():
+    evicted = []
+    bus = InvalidationBus(FlakySource([{"Employee": 1}, PoolTimeoutError("pool exhausted"), {"Employee": 2}]))
+    bus.subscribe("Employee", lambda: evicted.append("Employee"))
+
+    bus.poll()
+    bus.poll()
+    bus.poll()
+
+    assert bus.stats()["failures"] == 1
+    assert bus.stats()["polls"] == 2
+    assert evicted == ["Employee"]
+
+
+def test_publish_failure_is_counted_not_raised():
+    bus = InvalidationBus(FlakySource([]))
+
+    bus.publish("Employee")
+
+    assert bus.stats()["publish_failures"] == 1
+
+
+def test_run_survives_a_failed_poll(monkeypatch):
+    calls = []
+
+    async def failing_run_db(function):
+        calls.append(function)
+        if len(calls) == 1:
+            raise RuntimeError("executor is shutting down")
+        raise asyncio.CancelledError
+
+    monkeypatch.setattr(bus_module, "run_db", failing_run_db)
+    bus = InvalidationBus(FlakySource([]), interval=0)
+
+    try:
+        asyncio.run(bus.run())
+    except asyncio.CancelledError:
+        pass
+
+    assert len(calls) == 2
+    assert bus.stats()["failures"] == 1
+
+
+
+def test_publish_reaches_another_worker(tmp_path):
+    path = str(tmp_path / "versions.db")
+    evicted = []
+    writer = InvalidationBus(SqliteVersionSource(path))
+    reader = InvalidationBus(SqliteVersionSource(path))
+    reader.subscribe("EmployeeLeaves", lambda: evicted.append("EmployeeLeaves"))
+    reader.poll()
+
+    writer.publish("EmployeeLeaves")
+    reader.poll()
+
+    assert evicted == ["EmployeeLeaves"]
+
+
+def _workers(tmp_path):
+    path = str(tmp_path / "versions.db")
+    evicted = {"writer": [], "reader": []}
+    buses = {}
+    for name in evicted:
+        buses[name] = InvalidationBus(SqliteVersionSource(path))
+        buses[name].subscribe("EmployeeLeaves", lambda name=name: evicted[name].append("EmployeeLeaves"))
+        buses[name].poll()
+    return buses["writer"], buses["reader"], evicted
+
+
+def test_own_write_does_not_evict_the_writer(tmp_path):
+    writer, reader, evicted = _workers(tmp_path)
+
+    writer.publish("EmployeeLeaves")
+    writer.publish("EmployeeLeaves")
+    writer.poll()
+    reader.poll()
+
+    assert evicted == {"writer": [], "reader": ["EmployeeLeaves"]}
+    assert writer.stats()["own_writes"] == 2
+
+
+def test_write_from_another_worker_in_between_still_evicts(tmp_path):
+    writer, reader, evicted = _workers(tmp_path)
+
+    reader.publish("EmployeeLeaves")
+    writer.publish("EmployeeLeaves")
+    writer.poll()
+
+    assert evicted["writer"] == ["EmployeeLeaves"]
@@ -0,0 +1,56 @@
+from datetime import date, datetime
+from decimal import Decimal
+from typing import List, Optional
+
+import pytest
+from pydantic import BaseModel
+
+import json_utils
+from export_utils import _encode_ndjson
+
+
+class Payment(BaseModel):
+    PaidOn: date
+    PostedAt: Optional[datetime] = None
+    Amount: Optional[float] = None
+    Remarks: Optional[str] = None
+
+
+ROW = {"PaidOn": date(2024, 3, 4), "PostedAt": datetime(2024, 3, 4, 5, 6, 7), "Amount": Decimal("1E+16")}
+
+
+def test_model_response_encoding():
+    response = json_utils.model_response([ROW, {"PaidOn": date(2024, 3, 4), "Amount": Decimal("12.50")}], List[Payment])
+
+    assert response.body == (
+        b'[{"PaidOn":"2024-03-04","PostedAt":"2024-03-04T05:06:07","Amount":1e+16,"Remarks":null},'
+        b'{"PaidOn":"2024-03-04","PostedAt":null,"Amount":12.5,"Remarks":null}]'
+    )
+
+
+def test_dumps_stdlib_encoding(monkeypatch):
+    monkeypatch.setattr(json_utils, "orjson", None)
+
+    assert json_utils.dumps({**ROW, "Rate": Decimal("12.50"), 1: "x"}) == (
+        b'{"PaidOn":"2024-03-04","PostedAt":"2024-03-04T05:06:07","Amount":1e+16,"Rate":12.5,"1":"x"}'
+    )
+
+
+def test_dumps_orjson_encoding():
+    pytest.importorskip("orjson")
+
+    # orjson drops the exponent sign, so this path differs textually from the two above
+    assert json_utils.dumps({**ROW, "Rate": Decimal("12.50"), 1: "x"}) == (
+        b'{"PaidOn":"2024-03-04","PostedAt":"2024-03-04T05:06:07","Amount":1e16,"Rate":12.5,"1":"x"}'
+    )
+
+
+def test_ndjson_export_shares_the_encoder_default():
+    assert _encode_ndjson(["PaidOn", "Amount"], [(date(2024, 3, 4), Decimal("12.50"))]) == (
+        '{"PaidOn": "2024-03-04", "Amount": 12.5}\n'
+    )
+
+
+def test_json_default_rejects_unknown_types():
+    with pytest.raises(TypeError):
+        json_utils.json_default(object())
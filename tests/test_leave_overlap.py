@@ -0,0 +1,41 @@
+from datetime import date
+
+import pytest
+from fastapi import HTTPException
+
+import leaves_routes
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+
+    def execute(self, query, *params):
+        self.queries.append(query)
+
+    def fetchall(self):
+        return self.rows
+
+
+@pytest.fixture
+def stale_index(monkeypatch):
+    # Another worker's leave the local index has not seen yet
+    monkeypatch.setattr(leaves_routes.leave_index, "conflicts", lambda *args: [])
+
+
+def test_overlap_missed_by_the_index_is_caught_under_lock(stale_index):
+    cursor = FakeCursor([(9, "E1", "Annual", date(2024, 3, 1), date(2024, 3, 8), "Approved")])
+
+    with pytest.raises(HTTPException) as error:
+        leaves_routes._raise_on_overlap(cursor, "E1", date(2024, 3, 4), date(2024, 3, 5), "Pending")
+
+    assert error.value.status_code == 409
+    assert "uid 9" in error.value.detail
+    assert "WITH (UPDLOCK, HOLDLOCK)" in cursor.queries[0]
+
+
+def test_released_leaves_do_not_block(stale_index):
+    cursor = FakeCursor([(9, "E1", "Annual", date(2024, 3, 1), date(2024, 3, 8), "Rejected")])
+
+    leaves_routes._raise_on_overlap(cursor, "E1", date(2024, 3, 4), date(2024, 3, 5), "Pending")